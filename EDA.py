@@ -1,8 +1,12 @@
+import hashlib
+import json
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 
+import sketches
+
 def simple_eda(df_or_path):
     if isinstance(df_or_path, str):
         df = pd.read_csv(df_or_path)
@@ -23,12 +27,191 @@ def simple_eda(df_or_path):
 
 
 
-def eda(df_or_path, output_dir='03_reports_and_results/charts'):
+# Name of the file in the output directory that records what each chart was rendered from
+CHART_MANIFEST = '.chart_manifest.json'
+# Bump when the chart rendering changes, so that all charts are redrawn once
+RENDER_VERSION = 1
+# Number of grid points for the binned KDE
+KDE_GRID_SIZE = 512
+
+
+def binned_kde(values, grid_size=KDE_GRID_SIZE):
+    """
+    Gaussian KDE evaluated on a regular grid by binning the data and convolving
+    the bin counts with the kernel (Scott's bandwidth, as seaborn uses).
+    Cost is O(n + grid_size * kernel width) instead of O(n * grid_size).
+
+    Returns:
+        tuple: (grid, density) with the density integrating to 1.
+    """
+    values = values[np.isfinite(values)]
+    n = len(values)
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if n < 2 or std == 0:
+        return None, None
+
+    bandwidth = std * n ** (-1 / 5)
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=grid_size, range=(low, high))
+    return _smooth_counts(counts, edges, bandwidth, values.min(), values.max())
+
+
+def _smooth_counts(counts, edges, bandwidth, data_min, data_max):
+    """Convolves bin counts on a regular grid with a Gaussian kernel; see `binned_kde`."""
+    grid_size = len(counts)
+    grid = (edges[:-1] + edges[1:]) / 2
+    step = edges[1] - edges[0]
+
+    # The kernel is truncated at 4 bandwidths, where it is effectively zero
+    half_width = min(grid_size - 1, int(np.ceil(4 * bandwidth / step)))
+    kernel = np.exp(-0.5 * (np.arange(-half_width, half_width + 1) * step / bandwidth) ** 2)
+    density = np.convolve(counts, kernel, mode='full')[half_width:half_width + grid_size]
+    density /= density.sum() * step
+
+    # Only report the data range, like seaborn's default (cut=0)
+    inside = (grid >= data_min) & (grid <= data_max)
+    return grid[inside], density[inside]
+
+
+def _auto_bin_edges(n, data_min, data_max, iqr):
+    """The bin edges of `np.histogram(bins='auto')`, from the count, range and IQR alone."""
+    if data_max <= data_min:
+        return np.array([data_min - 0.5, data_max + 0.5])
+    sturges = (data_max - data_min) / (np.log2(n) + 1)
+    freedman_diaconis = 2 * iqr * n ** (-1 / 3)
+    width = min(freedman_diaconis, sturges) if freedman_diaconis > 0 else sturges
+    return np.linspace(data_min, data_max, int(np.ceil((data_max - data_min) / width)) + 1)
+
+
+def _sketch_chart_data(sketch, feature, grid_size=KDE_GRID_SIZE):
+    """
+    What the distribution and boxplot of a column are drawn from, computed from its
+    moments and quantile sketch instead of the values: histogram counts, the binned
+    KDE, and the box statistics (whiskers at 1.5 IQR, and the retained values
+    beyond them as fliers).
+    """
+    i = (sketch.numeric_columns + sketch.datetime_columns).index(feature)
+    quantiles = sketch.quantiles[feature]
+    n, std = sketch.moments.n[i], sketch.moments.std[i]
+    data_min, data_max = sketch.moments.min[i], sketch.moments.max[i]
+    q1, median, q3 = quantiles.quantile([0.25, 0.5, 0.75])
+
+    edges = _auto_bin_edges(n, data_min, data_max, q3 - q1)
+    distribution = {'counts': quantiles.histogram(edges), 'edges': edges}
+    if n > 1 and std > 0:
+        bandwidth = std * n ** (-1 / 5)
+        kde_edges = np.linspace(data_min - 3 * bandwidth, data_max + 3 * bandwidth, grid_size + 1)
+        distribution['kde_grid'], distribution['kde_density'] = _smooth_counts(
+            quantiles.histogram(kde_edges), kde_edges, bandwidth, data_min, data_max
+        )
+
+    # The sketch keeps few values in sparse tails, so the whiskers end at the 1.5 IQR
+    # limits (or the exact extremes) rather than at the last value inside them
+    whislo, whishi = max(q1 - 1.5 * (q3 - q1), data_min), min(q3 + 1.5 * (q3 - q1), data_max)
+    values = np.r_[data_min, quantiles.values(), data_max]
+    boxplot = {
+        'stats': np.array([whislo, q1, median, q3, whishi]),
+        'fliers': np.unique(values[(values < whislo) | (values > whishi)]),
+    }
+    return distribution, boxplot
+
+
+def _render_chart(job):
+    """
+    Draws and saves a single chart. Uses a bare matplotlib Figure (no pyplot
+    state) so it runs headless on the Agg canvas in worker processes.
+    """
+    # Plotting libraries are imported here, in the render workers, so that
+    # importing this module (e.g. for simple_eda) stays cheap
+    from matplotlib.figure import Figure
+    import seaborn as sns
+
+    kind, feature, data, path = job['kind'], job['feature'], job['data'], job['path']
+    with sns.axes_style("whitegrid"):
+        color = sns.color_palette()[0]
+
+        if kind == 'distribution':
+            fig = Figure(figsize=(10, 6))
+            ax = fig.subplots()
+            if isinstance(data, dict): # Drawn from a sketch, see _sketch_chart_data
+                counts, edges = data['counts'], data['edges']
+                grid, density = data.get('kde_grid'), data.get('kde_density')
+            else:
+                values = data[np.isfinite(data)]
+                counts, edges = np.histogram(values, bins='auto')
+                grid, density = binned_kde(values)
+            # One filled step patch instead of one rectangle per bin
+            ax.stairs(counts, edges, fill=True, alpha=0.75, color=color)
+            if grid is not None:
+                # Scale the density to the histogram's counts, like histplot(kde=True)
+                ax.plot(grid, density * counts.sum() * (edges[1] - edges[0]), color=color)
+            ax.set_title(f'Distribution of {feature}')
+            ax.set_xlabel(feature)
+            ax.set_ylabel('Frequency')
+        elif kind == 'boxplot':
+            fig = Figure(figsize=(10, 6))
+            ax = fig.subplots()
+            if isinstance(data, dict):
+                whislo, q1, median, q3, whishi = data['stats']
+                stats = {'whislo': whislo, 'q1': q1, 'med': median, 'q3': q3, 'whishi': whishi, 'fliers': data['fliers']}
+                ax.bxp([stats], orientation='horizontal', patch_artist=True, widths=0.8,
+                       boxprops={'facecolor': sns.desaturate(color, 0.75), 'edgecolor': '0.25'},
+                       whiskerprops={'color': '0.25'}, capprops={'color': '0.25'}, medianprops={'color': '0.25'},
+                       flierprops={'marker': 'o', 'markerfacecolor': 'none', 'markeredgecolor': '0.25'})
+                ax.set_yticks([])
+                ax.set_xlabel(feature)
+            else:
+                sns.boxplot(x=pd.Series(data, name=feature), ax=ax)
+            ax.set_title(f'Boxplot of {feature}')
+        elif kind == 'countplot':
+            fig = Figure(figsize=(10, 6))
+            ax = fig.subplots()
+            sns.barplot(x=data.to_numpy(), y=data.index.astype(str), orient='h', ax=ax)
+            ax.set_title(f'Count Plot of {feature}')
+            ax.set_xlabel('Count')
+            ax.set_ylabel(feature)
+        else: # heatmap
+            fig = Figure(figsize=(12, 8))
+            ax = fig.subplots()
+            sns.heatmap(data, annot=True, fmt=".2f", cmap='coolwarm', ax=ax)
+            ax.set_title('Correlation Heatmap')
+
+        fig.tight_layout()
+        fig.savefig(path)
+    return path
+
+
+def _init_render_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _content_hash(kind, data):
+    h = hashlib.sha256(f'{RENDER_VERSION}:{kind}'.encode())
+    if isinstance(data, dict):
+        for key in sorted(data):
+            h.update(key.encode())
+            h.update(np.ascontiguousarray(data[key]).tobytes())
+    elif isinstance(data, (pd.Series, pd.DataFrame)):
+        h.update(pd.util.hash_pandas_object(data).to_numpy().tobytes())
+        h.update(repr(list(data.index)).encode())
+    else:
+        h.update(np.ascontiguousarray(data).tobytes())
+    return h.hexdigest()
+
+
+def eda(df_or_path, output_dir='03_reports_and_results/charts', n_jobs=None, skip_unchanged=True):
     """
     Perform Exploratory Data Analysis (EDA) on the given DataFrame or CSV file path.
+
+    Charts are rendered in a pool of worker processes on the headless Agg backend.
+    A chart is skipped when the data it is drawn from has not changed since the
+    last render (tracked in CHART_MANIFEST inside `output_dir`).
     
     Parameters:
     df_or_path (pd.DataFrame or str): The DataFrame to analyze or path to CSV file.
+    n_jobs (int): Number of worker processes (default: one per CPU, up to 4). 1 renders in-process.
+    skip_unchanged (bool): Skip charts whose input data is unchanged.
     
     Returns:
     None
@@ -42,50 +225,114 @@ def eda(df_or_path, output_dir='03_reports_and_results/charts'):
     os.makedirs(output_dir, exist_ok=True)
     print("Performing Exploratory Data Analysis on cleaned dataset(EDA)...")
 
-    # Set seaborn style
-    sns.set_style(style="whitegrid")
-    
-    # Plot distribution of numerical features
-    numerical_features = df.select_dtypes(include=['float64', 'int64']).columns
-    for feature in numerical_features:
-        plt.figure(figsize=(10, 6))
-        sns.histplot(df[feature], kde=True)
-        plt.title(f'Distribution of {feature}')
-        plt.xlabel(feature)
-        plt.ylabel('Frequency')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, f'distribution_{feature}.png'))
-        plt.close()
-
-
-    # Correlation heatmap
-    plt.figure(figsize=(12, 8))
-    numeric_df = df.select_dtypes(include=['number'])  # Only numeric columns
-    sns.heatmap(numeric_df.corr(), annot=True, fmt=".2f", cmap='coolwarm')
-    plt.title('Correlation Heatmap')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'correlation_heatmap.png'))
-    plt.close()
-
-    # Boxplots
+    # Any width (compact frames use int8/int16/float32 and categoricals)
+    numerical_features = df.select_dtypes(include='number').columns
+    categorical_features = df.select_dtypes(include=['object', 'str', 'category']).columns
+
+    # Collect every chart with the (small) data it is drawn from
+    jobs = []
     for feature in numerical_features:
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x=df[feature])
-        plt.title(f'Boxplot of {feature}')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, f'boxplot_{feature}.png'))
-        plt.close()
-
-    # Count plots for categorical features
-    categorical_features = df.select_dtypes(include=['object']).columns
+        values = df[feature].to_numpy(dtype=np.float64)
+        jobs.append({'kind': 'distribution', 'feature': feature, 'data': values,
+                     'path': os.path.join(output_dir, f'distribution_{feature}.png')})
+        jobs.append({'kind': 'boxplot', 'feature': feature, 'data': values,
+                     'path': os.path.join(output_dir, f'boxplot_{feature}.png')})
+    jobs.append({'kind': 'heatmap', 'feature': None, 'data': df.select_dtypes(include=['number']).corr(),
+                 'path': os.path.join(output_dir, 'correlation_heatmap.png')})
     for feature in categorical_features:
-        plt.figure(figsize=(10, 6))
-        sns.countplot(y=df[feature], order=df[feature].value_counts().index)
-        plt.title(f'Count Plot of {feature}')
-        plt.xlabel('Count')
-        plt.ylabel(feature)
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, f'countplot_{feature}.png'))
-        plt.close()
-    
-    print(f"EDA charts and summary saved to '{output_dir}'.")
\ No newline at end of file
+        jobs.append({'kind': 'countplot', 'feature': feature, 'data': df[feature].value_counts(),
+                     'path': os.path.join(output_dir, f'countplot_{feature}.png')})
+
+    _render_jobs(jobs, output_dir, n_jobs, skip_unchanged)
+    print(f"EDA charts and summary saved to '{output_dir}'.")
+
+
+def _render_jobs(jobs, output_dir, n_jobs=None, skip_unchanged=True):
+    """Renders the chart jobs whose data changed since the last run, in a process pool."""
+    manifest_path = os.path.join(output_dir, CHART_MANIFEST)
+    manifest = {}
+    if skip_unchanged and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    to_render = []
+    for job in jobs:
+        job['hash'] = _content_hash(job['kind'], job['data'])
+        name = os.path.basename(job['path'])
+        if skip_unchanged and manifest.get(name) == job['hash'] and os.path.exists(job['path']):
+            continue
+        to_render.append(job)
+    print(f"Rendering {len(to_render)} of {len(jobs)} charts ({len(jobs) - len(to_render)} unchanged).")
+
+    n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+    if n_jobs <= 1 or len(to_render) <= 1:
+        for job in to_render:
+            _render_chart(job)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_render_worker) as pool:
+            list(pool.map(_render_chart, to_render, chunksize=max(1, len(to_render) // (4 * n_jobs))))
+
+    manifest.update({os.path.basename(job['path']): job['hash'] for job in to_render})
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def streaming_simple_eda(frames, n_jobs=None):
+    """
+    `simple_eda` for inputs that do not fit in memory. Summarizes an iterable of
+    chunks (e.g. `data_loader.iter_raw_chunks(path)`) in one pass with mergeable
+    sketches, in parallel, and prints the summary statistics and missing values.
+
+    Returns:
+        sketches.FrameSketch: The summary, which `sketch_eda` can draw the charts from.
+    """
+    n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+    sketch = sketches.sketch_frames(frames, n_jobs=n_jobs)
+    summary = sketch.summary()
+
+    print("Performing Basic Exploratory Data Analysis (EDA) in one pass...")
+    print(f"Dataset: {sketch.rows} rows, {len(sketch.columns)} columns")
+    print("Summary Statistics (quantiles and unique counts are approximate):")
+    print(summary.drop(columns='missing'))
+    print("\nMissing Values:")
+    print(summary['missing'])
+    return sketch
+
+
+def sketch_eda(frames_or_sketch, output_dir='03_reports_and_results/charts', n_jobs=None, skip_unchanged=True):
+    """
+    `eda` for inputs that do not fit in memory: draws the same charts from a
+    `sketches.FrameSketch` instead of the values, so only one chunk is held in
+    memory at a time. Histograms, KDEs and boxplots are approximate (quantile
+    sketch); the correlation heatmap and the count plots are exact.
+
+    Parameters:
+    frames_or_sketch: An iterable of dataframes (e.g. `data_split.iter_table_batches`)
+        or an already computed FrameSketch.
+    n_jobs (int): Worker processes for sketching and rendering (default: one per CPU, up to 4).
+    skip_unchanged (bool): Skip charts whose input data is unchanged.
+    """
+    n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+    if isinstance(frames_or_sketch, sketches.FrameSketch):
+        sketch = frames_or_sketch
+    else:
+        sketch = sketches.sketch_frames(frames_or_sketch, n_jobs=n_jobs)
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Performing Exploratory Data Analysis from sketches of {sketch.rows} rows (EDA)...")
+
+    jobs = []
+    for feature in sketch.numeric_columns:
+        distribution, boxplot = _sketch_chart_data(sketch, feature)
+        jobs.append({'kind': 'distribution', 'feature': feature, 'data': distribution,
+                     'path': os.path.join(output_dir, f'distribution_{feature}.png')})
+        jobs.append({'kind': 'boxplot', 'feature': feature, 'data': boxplot,
+                     'path': os.path.join(output_dir, f'boxplot_{feature}.png')})
+    jobs.append({'kind': 'heatmap', 'feature': None, 'data': sketch.corr(),
+                 'path': os.path.join(output_dir, 'correlation_heatmap.png')})
+    for feature in sketch.categorical_columns:
+        jobs.append({'kind': 'countplot', 'feature': feature, 'data': sketch.value_counts(feature),
+                     'path': os.path.join(output_dir, f'countplot_{feature}.png')})
+
+    _render_jobs(jobs, output_dir, n_jobs, skip_unchanged)
+    print(f"EDA charts saved to '{output_dir}'.")
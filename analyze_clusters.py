@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd
 import os
+import report_writer
 
 # Defines user-friendly names for columns in reports
 COLUMN_DECODER = {
@@ -19,8 +21,67 @@ COLUMN_DECODER = {
     'Is_Parent': 'Is a Parent', 'Days_Enrolled': 'Days Enrolled',
     'Cluster_Size': 'Number of Customers'
 }
+# Columns whose cluster means make up the summary table of every report
+SUMMARY_COLUMNS = ['Income', 'Spent', 'Age', 'Children', 'Family_Size', 'Days_Enrolled', 'Recency']
 
-def analyze_and_interpret_clusters(df_split, df_full_unscaled, cols_for_this_split, base_name, output_dir='03_reports_and_results/cluster_profiles'):
+
+def report_columns(cols_for_this_split, available_columns):
+    """
+    The lookup columns a split's report uses: 'ID', the split's columns and
+    SUMMARY_COLUMNS, in the order of `available_columns` (the profile's row order).
+    """
+    wanted = {'ID', *cols_for_this_split, *SUMMARY_COLUMNS}
+    return [col for col in available_columns if col in wanted]
+
+def profile_clusters(df_split, df_full_unscaled, cols_for_this_split, sample_size=15,
+                     quantiles=(0.25, 0.5, 0.75), random_state=42):
+    """
+    Computes cluster sizes, means, quantiles and per-cluster samples in a single
+    groupby pass over the full unscaled frame.
+
+    Cluster labels are looked up by 'ID' instead of merging, and samples are drawn
+    from the group row positions, so no per-cluster copies of the frame are made.
+
+    Returns:
+        dict: 'profile' (mean per column and cluster, plus 'Cluster_Size'),
+        'sizes', 'quantiles' (one row per cluster and quantile) and 'samples'
+        (one dataframe per cluster).
+    """
+    labels = df_split.drop_duplicates('ID').set_index('ID')['Cluster']
+    cluster = df_full_unscaled['ID'].map(labels)
+    in_split = cluster.notna().to_numpy()
+
+    # Usually every customer is in the split: keep the (memory-mapped) columns instead of copying them
+    df_analysis = df_full_unscaled if in_split.all() else df_full_unscaled.loc[in_split]
+    df_analysis = df_analysis.assign(Cluster=cluster[in_split].astype(labels.dtype))
+    # Every numeric column, whatever its width (compact frames use int8/int16/float32); not the one-hot booleans
+    cols_to_profile = [
+        col for col in df_analysis.columns
+        if pd.api.types.is_numeric_dtype(df_analysis[col]) and not pd.api.types.is_bool_dtype(df_analysis[col])
+    ]
+
+    grouped = df_analysis.groupby('Cluster', sort=True)
+    cluster_sizes = grouped.size()
+    cluster_profile = grouped[cols_to_profile].mean().T
+    cluster_profile.loc['Cluster_Size'] = cluster_sizes
+    cluster_quantiles = grouped[cols_to_profile].quantile(list(quantiles))
+
+    # Reorder columns for clarity
+    priority_cols = ['ID', 'Cluster'] + [c for c in cols_for_this_split if c not in ['ID', 'Cluster']]
+    other_cols = [col for col in df_analysis.columns if col not in priority_cols]
+    ordered_cols = priority_cols + other_cols
+
+    # Same draw as DataFrame.sample(n, random_state) on each cluster's rows, kept in frame order
+    samples = {}
+    for cluster_id, positions in grouped.indices.items():
+        rng = np.random.RandomState(random_state)
+        picked = positions[rng.choice(len(positions), size=min(sample_size, len(positions)), replace=False)]
+        samples[cluster_id] = df_analysis.iloc[np.sort(picked)][ordered_cols].reset_index(drop=True)
+
+    return {'profile': cluster_profile, 'sizes': cluster_sizes, 'quantiles': cluster_quantiles, 'samples': samples}
+
+
+def analyze_and_interpret_clusters(df_split, df_full_unscaled, cols_for_this_split, base_name, output_dir='03_reports_and_results/cluster_profiles', report_format='xlsx'):
     os.makedirs(output_dir, exist_ok=True)
     
     print(f"--- Analyzing Clusters for: {base_name.upper()} ---")
@@ -29,46 +90,23 @@ def analyze_and_interpret_clusters(df_split, df_full_unscaled, cols_for_this_spl
         print("Error: 'Cluster' column not found.")
         return
 
-    # Merge cluster labels onto the full dataset for a complete analysis frame
-    df_analysis = pd.merge(df_full_unscaled, df_split[['ID', 'Cluster']], on='ID')
-    
-    # Generate summary statistics
-    cols_to_profile = [col for col in df_analysis.columns if df_analysis[col].dtype in ['int64', 'float64', 'uint8']]
-    cluster_profile = df_analysis.groupby('Cluster')[cols_to_profile].mean().T
-    cluster_sizes = df_analysis['Cluster'].value_counts().sort_index()
-    cluster_profile.loc['Cluster_Size'] = cluster_sizes
-    readable_profile = cluster_profile.rename(index=COLUMN_DECODER)
+    # Generate summary statistics, sizes, quantiles and samples in one pass
+    profiles = profile_clusters(df_split, df_full_unscaled, cols_for_this_split)
+    readable_profile = profiles['profile'].rename(index=COLUMN_DECODER)
     readable_profile = readable_profile.iloc[[-1] + list(range(len(readable_profile)-1))]
 
     # Print a concise, holistic summary to the console
     print("Profile Summary:")
-    key_features = ['Annual Income', 'Spent', 'Age', 'Children', 'Family_Size', 'Days_Enrolled', 'Recency']
-    display_cols = [col for col in readable_profile.index if col in [COLUMN_DECODER.get(k, k) for k in key_features]]
+    display_cols = [col for col in readable_profile.index if col in [COLUMN_DECODER.get(k, k) for k in SUMMARY_COLUMNS]]
     summary_table = readable_profile.loc[['Number of Customers'] + display_cols].round(0)
     print(summary_table.to_string())
 
-    # Save a detailed, multi-sheet Excel report for interactive analysis
-    excel_output_path = os.path.join(output_dir, f'{base_name}_cluster_analysis.xlsx')
-    
-    with pd.ExcelWriter(excel_output_path, engine='openpyxl') as writer:
-        summary_table.to_excel(writer, sheet_name='Summary_Metrics')
-
-        # Save samples for each cluster to its own sheet in the Excel file
-        unique_clusters = sorted(df_analysis['Cluster'].unique())
-        for cluster_id in unique_clusters:
-            sample_ids = df_analysis[df_analysis['Cluster'] == cluster_id].sample(
-                n=min(15, len(df_analysis[df_analysis['Cluster'] == cluster_id])),
-                random_state=42
-            )['ID']
-            
-            sample_full_profiles = df_full_unscaled[df_full_unscaled['ID'].isin(sample_ids)]
-            sample_full_profiles = pd.merge(sample_full_profiles, df_split[['ID', 'Cluster']], on='ID')
-
-            # Reorder columns for clarity
-            priority_cols = ['ID', 'Cluster'] + [c for c in cols_for_this_split if c not in ['ID', 'Cluster']]
-            other_cols = [col for col in sample_full_profiles.columns if col not in priority_cols]
-            final_sample_table = sample_full_profiles[priority_cols + other_cols]
-            final_sample_table.to_excel(writer, sheet_name=f'Cluster_{cluster_id}_Samples', index=False)
+    # Save a detailed report: a multi-sheet Excel workbook for interactive analysis
+    # by default, or lightweight Parquet/CSV/JSON tables
+    report_output_path = report_writer.write_cluster_report(
+        summary_table, profiles['samples'], base_name, output_dir, report_format=report_format
+    )
             
-    print(f"\nFull interactive analysis saved to Excel file:\n--> {excel_output_path}")
-    print("-" * 60)
\ No newline at end of file
+    print(f"\nFull interactive analysis saved to {report_format.upper()} report:\n--> {report_output_path}")
+    print("-" * 60)
+    return profiles
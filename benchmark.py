@@ -0,0 +1,853 @@
+"""
+Benchmarks for the Customer Personality pipeline.
+
+Every measured run happens in a fresh process so that peak RSS belongs to that
+run alone. Usage:
+
+    python benchmark.py loader --rows 1000000 --chunksize 100000
+    python benchmark.py processing --rows 1000000
+    python benchmark.py memory --rows 1000000
+    python benchmark.py eda --rows 100000 --jobs 4
+    python benchmark.py sketch --rows 1000000 --jobs 4
+    python benchmark.py distributed --rows 1000000 --clusters 5 --workers 4
+    python benchmark.py reports --rows 200000 --clusters 10 --sample-size 10000
+    python benchmark.py scoring --requests 2000 --concurrency 32
+    python benchmark.py incremental --sizes 100000 1000000 5000000 --delta 1000
+    python benchmark.py pipeline --sizes 10000 100000 1000000 10000000
+    python benchmark.py startup --repeats 5
+    python benchmark.py compare bench_results/pipeline-<old>.json bench_results/pipeline-<new>.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import data_processing
+import instrumentation
+
+RAW_DATA_PATH = '00_raw_data/marketing_campaign.csv'
+BENCH_RESULTS_DIR = 'bench_results'
+PIPELINE_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+# Cold-start commands timed by `bench_startup`, each in a fresh interpreter
+STARTUP_COMMANDS = {
+    'import pandas (floor)': ['-c', 'import pandas'],
+    'import main': ['-c', 'import main'],
+    'main.py --help': ['main.py', '--help'],
+    'main.py cluster --help': ['main.py', 'cluster', '--help'],
+    'model_registry.py --help': ['model_registry.py', '--help'],
+    'scoring_server.py --help': ['scoring_server.py', '--help'],
+    'import main + clustering': ['-c', 'import main, data_clustering, projection'],
+}
+# Libraries no command should import before it needs them
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'sklearn', 'scipy', 'openpyxl', 'mpl_toolkits')
+
+
+def _isolated_worker(queue, fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    wall = time.perf_counter() - start
+    queue.put({'wall_s': wall, 'peak_rss_mb': instrumentation.peak_rss_mb(), 'result': result})
+
+
+def run_isolated(fn, *args):
+    """Runs `fn(*args)` in a fresh process and returns its wall time, peak RSS and result."""
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_isolated_worker, args=(queue, fn, args))
+    proc.start()
+    stats = queue.get()
+    proc.join()
+    return stats
+
+
+def make_benchmark_file(n_rows, output_path, source_path=RAW_DATA_PATH):
+    """
+    Writes a raw-format file with `n_rows` rows by tiling the original dataset.
+    IDs are renumbered so that they stay unique.
+    """
+    df = pd.read_csv(source_path, sep='\t')
+    reps = int(np.ceil(n_rows / len(df)))
+    big = pd.concat([df] * reps, ignore_index=True).iloc[:n_rows]
+    big['ID'] = np.arange(n_rows)
+    big.to_csv(output_path, sep='\t', index=False)
+    return output_path
+
+
+def _load_eager(path):
+    df = data_processing.processing(data_loader.load_raw_data(path), verbose=False)
+    return len(df)
+
+
+def _load_streaming(path, chunksize):
+    return sum(len(chunk) for chunk in data_processing.processing_in_chunks(path, chunksize=chunksize))
+
+
+def bench_loader(n_rows, chunksize):
+    """Compares the in-memory loader + `processing` with the chunked streaming path."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        print(f"Benchmark file: {n_rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        results = {
+            'eager': run_isolated(_load_eager, path),
+            f'streaming (chunksize={chunksize})': run_isolated(_load_streaming, path, chunksize),
+        }
+
+    print(f"\n{'mode':<32}{'rows out':>12}{'wall [s]':>12}{'peak RSS [MB]':>16}")
+    for mode, stats in results.items():
+        print(f"{mode:<32}{stats['result']:>12}{stats['wall_s']:>12.2f}{stats['peak_rss_mb']:>16.1f}")
+    return results
+
+
+def _reference_processing(df, income_median=None):
+    """The previous `processing` (in-place dict replaces, inferred dates, two filter copies), for comparison."""
+    mnt_cols = ['MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts', 'MntGoldProds']
+    df['Spent'] = df[mnt_cols].sum(axis=1)
+    df['Living_With'] = df['Marital_Status'].astype(object).replace({
+        "Married": "Partner", "Together": "Partner",
+        "Absurd": "Single", "Widow": "Single", "YOLO": "Single",
+        "Divorced": "Single", "Single": "Single", "Alone": "Single"
+    })
+    df['Children'] = df['Kidhome'] + df['Teenhome']
+    df['Family_Size'] = df['Living_With'].replace({"Single": 1, "Partner": 2}) + df['Children']
+    df['Is_Parent'] = (df['Children'] > 0).astype(int)
+    df['Age'] = pd.Timestamp.now().year - df['Year_Birth']
+    df['Dt_Customer'] = pd.to_datetime(df['Dt_Customer'], dayfirst=True)
+    df['Days_Enrolled'] = (pd.Timestamp.now() - df['Dt_Customer']).dt.days
+    if income_median is None:
+        income_median = df['Income'].median()
+    df['Income'] = df['Income'].fillna(income_median)
+    df = df[df['Income'] < 600000]
+    df = df[df['Age'] < 90]
+    return df.drop(columns=['Year_Birth', 'Dt_Customer', 'Z_CostContact', 'Z_Revenue', 'Marital_Status'], errors='ignore')
+
+
+def _process_once(path, reference):
+    """Loads `path` and times only the processing step, with its own peak RSS above the loaded frame."""
+    df = data_loader.load_raw_data(path)
+    sampler = instrumentation.RssSampler(interval=0.001)
+    sampler.start()
+    start = time.perf_counter()
+    if reference:
+        processed = _reference_processing(df)
+    else:
+        processed = data_processing.processing(df, verbose=False)
+    wall = time.perf_counter() - start
+    return {'rows': len(processed), 'wall_s': wall, 'extra_mb': sampler.stop() - sampler.start_rss}
+
+
+def bench_processing(n_rows):
+    """Compares the previous `processing` with the vectorized one: output, time and extra memory."""
+    sample = data_loader.load_raw_data(RAW_DATA_PATH)
+    expected = _reference_processing(sample.copy())
+    expected['Family_Size'] = expected['Family_Size'].astype(np.int64) # object dtype under pandas >= 3
+    pd.testing.assert_frame_equal(data_processing.processing(sample, verbose=False), expected)
+    print("Outputs are identical.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        results = {
+            'previous': run_isolated(_process_once, path, True)['result'],
+            'vectorized': run_isolated(_process_once, path, False)['result'],
+        }
+
+    print(f"\n{'implementation':<32}{'rows out':>12}{'wall [s]':>12}{'extra RSS [MB]':>16}")
+    for name, stats in results.items():
+        print(f"{name:<32}{stats['rows']:>12}{stats['wall_s']:>12.2f}{stats['extra_mb']:>16.1f}")
+    return results
+
+
+def _reference_eda(df, output_dir):
+    """The previous sequential EDA loop (seaborn histplot with per-point KDE), for comparison."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    for feature in df.select_dtypes(include=['float64', 'int64']).columns:
+        plt.figure(figsize=(10, 6))
+        sns.histplot(df[feature], kde=True)
+        plt.savefig(os.path.join(output_dir, f'distribution_{feature}.png'))
+        plt.close()
+        plt.figure(figsize=(10, 6))
+        sns.boxplot(x=df[feature])
+        plt.savefig(os.path.join(output_dir, f'boxplot_{feature}.png'))
+        plt.close()
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_eda(n_rows, n_jobs):
+    """Times chart rendering: previous sequential loop vs. pooled binned-KDE rendering and cached re-runs."""
+    import EDA
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        df = data_processing.processing(data_loader.load_raw_data(path), verbose=False)
+
+        timings = {}
+        os.makedirs(os.path.join(tmp, 'reference'))
+        timings['previous sequential loop'] = _timed(_reference_eda, df, os.path.join(tmp, 'reference'))
+        timings['eda, n_jobs=1'] = _timed(EDA.eda, df, os.path.join(tmp, 'serial'), n_jobs=1)
+        timings[f'eda, n_jobs={n_jobs}'] = _timed(EDA.eda, df, os.path.join(tmp, 'parallel'), n_jobs=n_jobs)
+        timings['eda, unchanged re-run'] = _timed(EDA.eda, df, os.path.join(tmp, 'parallel'), n_jobs=n_jobs)
+
+    print(f"\n{'mode':<32}{'wall [s]':>12}")
+    for mode, wall in timings.items():
+        print(f"{mode:<32}{wall:>12.2f}")
+    return timings
+
+
+def _output_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def _write_with_excelwriter(summary_table, samples, path):
+    """The previous in-memory pd.ExcelWriter report, for comparison."""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        summary_table.to_excel(writer, sheet_name='Summary_Metrics')
+        for cluster_id, sample in samples.items():
+            sample.to_excel(writer, sheet_name=f'Cluster_{cluster_id}_Samples', index=False)
+
+
+def bench_reports(n_rows, n_clusters, sample_size):
+    """Times and sizes the cluster report in every output format."""
+    import report_writer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        df = data_processing.processing(data_loader.load_raw_data(path), verbose=False)
+        df['Cluster'] = np.arange(len(df)) % n_clusters
+        samples = {
+            cluster_id: group.head(sample_size).reset_index(drop=True)
+            for cluster_id, group in df.groupby('Cluster')
+        }
+        summary_table = df.groupby('Cluster').mean(numeric_only=True).T.round(0)
+
+        results = {}
+        legacy_path = os.path.join(tmp, 'legacy.xlsx')
+        wall = _timed(_write_with_excelwriter, summary_table, samples, legacy_path)
+        results['pd.ExcelWriter (previous)'] = (wall, _output_size(legacy_path))
+        for report_format in report_writer.REPORT_FORMATS:
+            output_dir = os.path.join(tmp, report_format)
+            wall = _timed(report_writer.write_cluster_report, summary_table, samples, 'bench', output_dir,
+                          report_format=report_format)
+            results[report_format] = (wall, _output_size(report_writer.report_path('bench', output_dir, report_format)))
+
+    print(f"\n{'format':<32}{'wall [s]':>12}{'size [MB]':>12}")
+    for report_format, (wall, size) in results.items():
+        print(f"{report_format:<32}{wall:>12.2f}{size / 1e6:>12.2f}")
+    return results
+
+
+def _raw_records(n_rows):
+    """Customers from the raw file as JSON-ready dicts (missing values become None)."""
+    df = pd.read_csv(RAW_DATA_PATH, sep='\t')
+    df = df.loc[np.resize(np.arange(len(df)), n_rows)]
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+async def _http_request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+    )
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    status = int(head.split(' ', 2)[1])
+    length = int(next(line.split(':', 1)[1] for line in head.split('\r\n') if line.lower().startswith('content-length')))
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _load_test(host, port, records, n_requests, concurrency, customers_per_request):
+    """Sends `n_requests` POST /score requests over `concurrency` keep-alive connections."""
+    latencies, errors = [], 0
+    counter = iter(range(n_requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in counter:
+            start = (i * customers_per_request) % len(records)
+            batch = records[start:start + customers_per_request] or records[:customers_per_request]
+            t0 = time.perf_counter()
+            status, _ = await _http_request(reader, writer, 'POST', '/score', batch)
+            latencies.append(time.perf_counter() - t0)
+            errors += status != 200
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, health = await _http_request(reader, writer, 'GET', '/health')
+    writer.close()
+    return wall, np.array(latencies), errors, health
+
+
+def _wait_for_server(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Scoring server did not start on {host}:{port} within {timeout} s.")
+
+
+def bench_scoring(n_requests, concurrency, customers_per_request, host='127.0.0.1', port=8765,
+                  start_server=True, max_wait_ms=None):
+    """
+    Load-tests the scoring server: throughput and latency percentiles of POST /score
+    under concurrent clients, compared with scoring each request on its own in-process.
+    Needs fitted models in 04_models (run main.py first).
+    """
+    import model_registry
+
+    records = _raw_records(max(1000, customers_per_request))
+    server = None
+    if start_server:
+        cmd = [sys.executable, 'scoring_server.py', '--host', host, '--port', str(port)]
+        if max_wait_ms is not None:
+            cmd += ['--max-wait-ms', str(max_wait_ms)]
+        server = subprocess.Popen(cmd)
+    try:
+        _wait_for_server(host, port)
+        wall, latencies, errors, health = asyncio.run(
+            _load_test(host, port, records, n_requests, concurrency, customers_per_request)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    # Baseline: the same requests scored one call at a time, without batching
+    registry = model_registry.load_registry()
+    n_baseline = min(n_requests, 200)
+    t0 = time.perf_counter()
+    for i in range(n_baseline):
+        start = (i * customers_per_request) % len(records)
+        model_registry.score(pd.DataFrame.from_records(records[start:start + customers_per_request] or records[:customers_per_request]), registry=registry)
+    baseline_per_request = (time.perf_counter() - t0) / n_baseline
+
+    ms = latencies * 1000
+    print(f"\n{n_requests} requests x {customers_per_request} customers, {concurrency} concurrent connections, {errors} errors")
+    print(f"Throughput: {n_requests / wall:,.0f} requests/s, {n_requests * customers_per_request / wall:,.0f} customers/s")
+    print(f"Latency [ms]: p50 {np.percentile(ms, 50):.1f}, p95 {np.percentile(ms, 95):.1f}, "
+          f"p99 {np.percentile(ms, 99):.1f}, max {ms.max():.1f}")
+    print(f"Server batches: {health['batches']}, {health['customers'] / max(health['batches'], 1):.1f} customers per batch")
+    print(f"Unbatched in-process baseline: {1 / baseline_per_request:,.0f} requests/s "
+          f"({baseline_per_request * 1000:.1f} ms per request)")
+    return {'wall_s': wall, 'latencies_s': latencies, 'errors': errors, 'health': health,
+            'baseline_s_per_request': baseline_per_request}
+
+
+class StageRecorder:
+    """Records wall time, CPU time, peak RSS and row counts per pipeline stage."""
+
+    def __init__(self):
+        instrumentation.configure(enabled=True)
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        with instrumentation.stage(name) as record:
+            yield record
+        event = instrumentation.collect()[-1]
+        self.stages[name] = {key: value for key, value in event.items() if key not in ('name', 'pid', 'tid')}
+        print(f"[benchmark] {name:<32} {event['wall_s']:>9.2f}s {event['peak_rss_mb']:>9.1f} MB")
+
+
+def _frame_mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def _memory_worker(raw_path, workdir, compact, n_clusters):
+    """
+    Runs load, processing, encoding/scaling, the split and the clustering of every
+    split as main.py does, with default or compact frames, and records their sizes.
+    """
+    os.chdir(workdir)
+    import matplotlib
+    matplotlib.use('Agg')
+    import data_clustering
+    import data_split
+    import projection
+
+    recorder = StageRecorder()
+    frames = {}
+    with recorder.stage('load'):
+        df_raw = data_loader.load_raw_data(raw_path, compact=compact)
+    frames['raw'] = _frame_mb(df_raw)
+    with recorder.stage('processing'):
+        df_processed = data_processing.processing(df_raw, verbose=False, compact=compact)
+    frames['processed'] = _frame_mb(df_processed)
+    del df_raw
+    with recorder.stage('encode_and_scale'):
+        df_unscaled, df_scaled, _, _ = data_processing.encode_and_scale(df_processed, compact=compact)
+    frames['unscaled'] = _frame_mb(df_unscaled)
+    frames['scaled'] = _frame_mb(df_scaled)
+    with recorder.stage('split'):
+        data_split.split_by_marketing_4ps(df_unscaled, output_dir='split/unscaled')
+        del df_unscaled
+        data_split.split_by_marketing_4ps(df_scaled, output_dir='split/scaled')
+        del df_scaled
+    del df_processed
+
+    for split_name in data_split.COL_DEFINITIONS:
+        with recorder.stage(f'cluster[{split_name}]'):
+            df_split = data_split.load_split('split/scaled', split_name)
+            split_projection = projection.fit_projection(df_split, split_name, report=False)
+            data_clustering.cluster_with_pca(
+                df_split, split_name, n_clusters, n_components=2, silhouette='simplified', projection=split_projection
+            )
+        frames[f'{split_name} model matrix'] = split_projection['X_pca'].nbytes / (1024 * 1024)
+        del df_split, split_projection
+    return {'frames_mb': frames, 'stages': recorder.stages}
+
+
+def bench_memory(n_rows, n_clusters=5):
+    """
+    Compares peak memory of the pipeline stages with default (int64/float64/string)
+    and compact frames (main.COMPACT_FRAMES), each mode in a fresh process.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        for mode, compact in [('default', False), ('compact', True)]:
+            print(f"\n--- {mode} frames ---")
+            workdir = os.path.join(tmp, mode)
+            os.makedirs(workdir)
+            results[mode] = run_isolated(_memory_worker, path, workdir, compact, n_clusters)
+
+    default, compact = results['default']['result'], results['compact']['result']
+    print(f"\n{n_rows} rows\n{'frame':<28}{'default [MB]':>14}{'compact [MB]':>14}")
+    for name, size in default['frames_mb'].items():
+        print(f"{name:<28}{size:>14.1f}{compact['frames_mb'][name]:>14.1f}")
+    print(f"\n{'stage (peak RSS)':<28}{'default [MB]':>14}{'compact [MB]':>14}")
+    for name, stats in default['stages'].items():
+        print(f"{name:<28}{stats['peak_rss_mb']:>14.1f}{compact['stages'][name]['peak_rss_mb']:>14.1f}")
+    print(f"{'process peak':<28}{results['default']['peak_rss_mb']:>14.1f}{results['compact']['peak_rss_mb']:>14.1f}")
+    return results
+
+
+def _eda_statistics(quartiles, unique, corr):
+    return {'quartiles': quartiles, 'unique': unique, 'corr': corr}
+
+
+def _exact_eda_worker(raw_path, output_dir):
+    import EDA
+
+    df = data_processing.processing(data_loader.load_raw_data(raw_path, compact=True), verbose=False, compact=True)
+    numeric = df.select_dtypes(include='number')
+    numeric.describe()
+    EDA.eda(df, output_dir=output_dir, skip_unchanged=False)
+    return _eda_statistics(numeric.quantile([0.25, 0.5, 0.75]), df.nunique(), numeric.corr())
+
+
+def _sketch_eda_worker(raw_path, output_dir, n_jobs):
+    import EDA
+    import sketches
+
+    sketch = sketches.sketch_frames(data_processing.processing_in_chunks(raw_path), n_jobs=n_jobs)
+    sketch.summary()
+    EDA.sketch_eda(sketch, output_dir=output_dir, n_jobs=n_jobs, skip_unchanged=False)
+    quartiles = pd.DataFrame({col: sketch.quantiles[col].quantile([0.25, 0.5, 0.75]) for col in sketch.numeric_columns},
+                             index=[0.25, 0.5, 0.75])
+    unique = pd.Series({col: sketch.distinct[col].count() for col in sketch.columns})
+    return _eda_statistics(quartiles, unique, sketch.corr())
+
+
+def bench_sketch(n_rows, n_jobs):
+    """
+    Exact in-memory EDA (summary and charts) vs. one pass over chunks with mergeable
+    sketches: wall time, peak RSS of the main process and the error of the sketches.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        results = {
+            'exact': run_isolated(_exact_eda_worker, path, os.path.join(tmp, 'exact')),
+            f'sketch, n_jobs={n_jobs}': run_isolated(_sketch_eda_worker, path, os.path.join(tmp, 'sketch'), n_jobs),
+        }
+
+    print(f"\n{n_rows} rows\n{'mode':<32}{'wall [s]':>12}{'peak RSS [MB]':>16}")
+    for mode, stats in results.items():
+        print(f"{mode:<32}{stats['wall_s']:>12.2f}{stats['peak_rss_mb']:>16.1f}")
+
+    exact, sketch = (stats['result'] for stats in results.values())
+    columns = exact['quartiles'].columns
+    # Quartile errors in units of the column's interquartile range (or 1 for constant quartiles)
+    iqr = (exact['quartiles'].loc[0.75] - exact['quartiles'].loc[0.25]).replace(0, 1)
+    quartile_error = ((sketch['quartiles'][columns] - exact['quartiles']).abs() / iqr).max().max()
+    unique_error = ((sketch['unique'] - exact['unique']).abs() / exact['unique']).max()
+    corr_error = (sketch['corr'].loc[columns, columns] - exact['corr']).abs().max().max()
+    print(f"\nlargest quartile error: {quartile_error:.2%} of the IQR, largest distinct count error: "
+          f"{unique_error:.2%}, largest correlation difference: {corr_error:.1e}")
+    return results
+
+
+def _split_projection_matrix(raw_path, split_name):
+    """The PCA-projected rows of one scaled split, as the clustering step sees them."""
+    import data_split
+    import projection
+
+    df = data_processing.processing(data_loader.load_raw_data(raw_path, compact=True), verbose=False, compact=True)
+    _, df_scaled, _, _ = data_processing.encode_and_scale(df, compact=True)
+    df_split = df_scaled[data_split.split_columns(split_name, df_scaled.columns)]
+    return projection.fit_projection(df_split, split_name, report=False)['X_pca']
+
+
+def bench_distributed(n_rows, n_clusters, n_workers, split_name='products'):
+    """
+    Validates distributed k-means against single-node KMeans on one split: with the
+    same initial centers the results must agree, and with k-means|| the inertia
+    should match KMeans (k-means++, n_init=10). Also times both.
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+    import distributed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_benchmark_file(n_rows, os.path.join(tmp, 'benchmark_campaign.csv'))
+        X = _split_projection_matrix(path, split_name).astype(np.float64)
+    print(f"'{split_name}' split: {X.shape[0]} rows, {X.shape[1]} PCA components, k={n_clusters}")
+
+    init = X[np.random.default_rng(42).choice(len(X), n_clusters, replace=False)]
+    reference = KMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=42).fit(X)
+    same_init = distributed.DistributedKMeans(n_clusters, init=init, n_workers=n_workers).fit(X)
+    print(f"Same initial centers: labels identical: {np.array_equal(same_init.labels_, reference.labels_)}, "
+          f"largest center difference: {np.abs(same_init.cluster_centers_ - reference.cluster_centers_).max():.1e}, "
+          f"iterations: {same_init.n_iter_} vs. {reference.n_iter_}")
+
+    models = {
+        'KMeans (k-means++, n_init=10)': KMeans(n_clusters=n_clusters, n_init=10, random_state=42),
+        'distributed (serial, 1 worker)': distributed.DistributedKMeans(n_clusters, executor='serial'),
+        f'distributed (local, {n_workers} workers)': distributed.DistributedKMeans(n_clusters, n_workers=n_workers),
+    }
+    results = {name: (model, _timed(model.fit, X)) for name, model in models.items()}
+
+    baseline = models['KMeans (k-means++, n_init=10)']
+    print(f"\n{'mode':<36}{'wall [s]':>10}{'inertia / KMeans':>18}{'ARI vs. KMeans':>16}")
+    for name, (model, wall) in results.items():
+        print(f"{name:<36}{wall:>10.2f}{model.inertia_ / baseline.inertia_:>18.5f}"
+              f"{adjusted_rand_score(baseline.labels_, model.labels_):>16.4f}")
+    return results
+
+
+def bench_incremental(sizes, delta_rows, n_columns=34, seed=42):
+    """
+    Time of one incremental update of a stored table (reading the stored version of
+    the changed rows and storing the new ones) for growing populations: appending a
+    delta file vs. rewriting the whole table, as updates did before delta files.
+    """
+    import data_split
+
+    rng = np.random.default_rng(seed)
+    print(f"{'rows':>12}{'rewrite [s]':>14}{'delta file [s]':>16}")
+    results = {}
+    for n_rows in sizes:
+        df = pd.DataFrame(rng.standard_normal((n_rows, n_columns)), columns=[f'x{i}' for i in range(n_columns)])
+        df.insert(0, 'ID', np.arange(n_rows))
+        ids = rng.choice(n_rows, size=delta_rows, replace=False)
+        df_rows = df.iloc[ids].copy()
+        df_rows[df_rows.columns[1:]] += 1.0
+        with tempfile.TemporaryDirectory() as tmp:
+            rewrite_dir, delta_dir = os.path.join(tmp, 'rewrite'), os.path.join(tmp, 'delta')
+            data_split.save_table(df, rewrite_dir)
+            data_split.save_table(df, delta_dir)
+            del df
+            rewrite = _timed(lambda: (data_split.load_table(rewrite_dir).loc[lambda t: t['ID'].isin(ids)],
+                                      data_split._merge_rows(df_rows, ids, rewrite_dir)))
+            delta = _timed(lambda: (data_split.load_rows(delta_dir, ids),
+                                    data_split.append_rows(df_rows, ids, delta_dir)))
+        results[n_rows] = {'rewrite_s': rewrite, 'delta_s': delta}
+        print(f"{n_rows:>12}{rewrite:>14.3f}{delta:>16.3f}")
+    return results
+
+
+def _pipeline_worker(raw_path, workdir, run_eda, silhouette):
+    """Runs every pipeline stage once on `raw_path`, with all outputs going to `workdir`."""
+    os.chdir(workdir)
+    import matplotlib
+    matplotlib.use('Agg')
+    import EDA
+    import data_clustering
+    import data_split
+    from analyze_clusters import analyze_and_interpret_clusters
+
+    recorder = StageRecorder()
+    with recorder.stage('load') as rec:
+        df_raw = data_loader.load_raw_data(raw_path)
+        rec['rows_out'] = len(df_raw)
+    with recorder.stage('processing') as rec:
+        rec['rows_in'] = len(df_raw)
+        df_processed = data_processing.processing(df_raw, verbose=False)
+        rec['rows_out'] = len(df_processed)
+    del df_raw
+    if run_eda:
+        with recorder.stage('eda'):
+            EDA.eda(df_processed, output_dir='charts', skip_unchanged=False)
+    with recorder.stage('scaling'):
+        df_unscaled, df_scaled, _, _ = data_processing.encode_and_scale(df_processed)
+    with recorder.stage('split'):
+        data_split.split_by_marketing_4ps(df_unscaled, output_dir='split/unscaled')
+        data_split.split_by_marketing_4ps(df_scaled, output_dir='split/scaled')
+    del df_unscaled, df_scaled
+
+    n_rows = len(df_processed)
+    if silhouette == 'auto': # Resolved here so the results record the method used
+        silhouette = 'exact' if n_rows <= data_clustering.EXACT_SILHOUETTE_MAX_ROWS else 'sampled'
+    for split_name in data_split.COL_DEFINITIONS:
+        df_split_scaled = data_split.load_split('split/scaled', split_name)
+        df_split_unscaled = data_split.load_split('split/unscaled', split_name)
+        with recorder.stage(f'evaluate_k_range[{split_name}]'):
+            k = data_clustering.evaluate_k_range(
+                df_split_scaled, split_name, algorithm='auto', silhouette=silhouette, output_dir='k_evaluation'
+            )
+        with recorder.stage(f'cluster_with_pca[{split_name}]'):
+            labels = data_clustering.cluster_with_pca(
+                df_split_scaled, split_name, n_clusters=k, n_components=2, silhouette=silhouette
+            )
+        with recorder.stage(f'analysis[{split_name}]'):
+            analyze_and_interpret_clusters(
+                pd.merge(df_split_unscaled, labels, on='ID'), df_processed,
+                data_split.COL_DEFINITIONS[split_name], split_name, output_dir='profiles'
+            )
+    return {'rows': n_rows, 'silhouette': silhouette, 'stages': recorder.stages}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_pipeline(sizes, results_dir=BENCH_RESULTS_DIR, run_eda=True, silhouette='auto', seed=42):
+    """
+    Times and memory-profiles every pipeline stage on synthetic data of each size.
+    Each size runs in a fresh process. Results are written as JSON to `results_dir`,
+    tagged with the git commit, so they can be compared across commits.
+    """
+    import synthetic_data
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sizes': {}
+    }
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = synthetic_data.write_synthetic_file(n_rows, os.path.join(tmp, 'synthetic_campaign.csv'), seed=seed)
+            print(f"\n--- Benchmarking pipeline on {n_rows} rows ---")
+            stats = run_isolated(_pipeline_worker, raw_path, tmp, run_eda, silhouette)
+        results['sizes'][str(n_rows)] = dict(stats['result'], total_wall_s=stats['wall_s'], peak_rss_mb=stats['peak_rss_mb'])
+
+    os.makedirs(results_dir, exist_ok=True)
+    output_path = os.path.join(results_dir, f"pipeline-{results['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nBenchmark results saved to '{output_path}'.")
+    return results
+
+
+def _import_times(code, top=10):
+    """
+    Returns the `top` modules imported directly by `code` with the largest
+    cumulative import time (ms), from `python -X importtime`.
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by two spaces per level; level 1 are the imports of the imported module
+        if len(name) - len(name.lstrip()) == 3:
+            times[name.strip()] = int(cumulative) / 1000
+    return dict(sorted(times.items(), key=lambda item: -item[1])[:top])
+
+
+def bench_startup(repeats=5, results_dir=BENCH_RESULTS_DIR):
+    """
+    Times the cold start of the pipeline entry points, each in a fresh interpreter,
+    and checks which heavy libraries `import main` loads. Results are written as
+    JSON to `results_dir` so that `compare` can track them across commits.
+    """
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'commands': {}
+    }
+    print(f"{'command':<32}{'median [s]':>12}{'min [s]':>10}")
+    for name, args in STARTUP_COMMANDS.items():
+        walls = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, capture_output=True, check=True)
+            walls.append(time.perf_counter() - start)
+        results['commands'][name] = {'wall_s': float(np.median(walls)), 'min_s': min(walls)}
+        print(f"{name:<32}{np.median(walls):>12.3f}{min(walls):>10.3f}")
+
+    check = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True, check=True).stdout.strip()
+    results['heavy_modules_on_import'] = loaded.split(',') if loaded else []
+    results['import_ms'] = _import_times('import main')
+    print(f"\nHeavy libraries loaded by 'import main': {loaded or 'none'}")
+    print("Largest imports of 'import main' (cumulative ms):")
+    for module, ms in results['import_ms'].items():
+        print(f"  {module:<30}{ms:>8.1f}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    output_path = os.path.join(results_dir, f"startup-{results['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nBenchmark results saved to '{output_path}'.")
+    return results
+
+
+def compare_results(baseline_path, candidate_path):
+    """Prints the wall time ratio (candidate / baseline) per stage or startup command of two benchmark files."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    print(f"Baseline {baseline['commit']} vs. candidate {candidate['commit']}")
+    if 'commands' in baseline:
+        print(f"\n{'command':<32}{'baseline [s]':>14}{'candidate [s]':>15}{'ratio':>8}")
+        for command, base_stats in baseline['commands'].items():
+            cand_stats = candidate['commands'].get(command)
+            if cand_stats is None:
+                continue
+            ratio = cand_stats['wall_s'] / base_stats['wall_s'] if base_stats['wall_s'] else float('nan')
+            print(f"{command:<32}{base_stats['wall_s']:>14.3f}{cand_stats['wall_s']:>15.3f}{ratio:>8.2f}")
+        return
+    for size, base_run in baseline['sizes'].items():
+        if size not in candidate['sizes']:
+            continue
+        print(f"\n{size} rows\n{'stage':<32}{'baseline [s]':>14}{'candidate [s]':>15}{'ratio':>8}")
+        for stage, base_stats in base_run['stages'].items():
+            cand_stats = candidate['sizes'][size]['stages'].get(stage)
+            if cand_stats is None:
+                continue
+            ratio = cand_stats['wall_s'] / base_stats['wall_s'] if base_stats['wall_s'] else float('nan')
+            print(f"{stage:<32}{base_stats['wall_s']:>14.2f}{cand_stats['wall_s']:>15.2f}{ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    loader_parser = subparsers.add_parser('loader', help='Eager vs. chunked loading and processing.')
+    loader_parser.add_argument('--rows', type=int, default=1_000_000)
+    loader_parser.add_argument('--chunksize', type=int, default=data_loader.DEFAULT_CHUNKSIZE)
+
+    processing_parser = subparsers.add_parser('processing', help='Previous vs. vectorized feature engineering.')
+    processing_parser.add_argument('--rows', type=int, default=1_000_000)
+
+    memory_parser = subparsers.add_parser('memory', help='Peak memory with default vs. compact frames.')
+    memory_parser.add_argument('--rows', type=int, default=1_000_000)
+    memory_parser.add_argument('--clusters', type=int, default=5)
+
+    eda_parser = subparsers.add_parser('eda', help='Sequential vs. pooled chart rendering.')
+    eda_parser.add_argument('--rows', type=int, default=100_000)
+    eda_parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+
+    sketch_parser = subparsers.add_parser('sketch', help='Exact vs. one-pass sketch EDA: time, memory and error.')
+    sketch_parser.add_argument('--rows', type=int, default=1_000_000)
+    sketch_parser.add_argument('--jobs', type=int, default=min(4, os.cpu_count() or 1))
+
+    distributed_parser = subparsers.add_parser('distributed', help='Distributed k-means vs. single-node KMeans.')
+    distributed_parser.add_argument('--rows', type=int, default=1_000_000)
+    distributed_parser.add_argument('--clusters', type=int, default=5)
+    distributed_parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    distributed_parser.add_argument('--split', default='products')
+
+    reports_parser = subparsers.add_parser('reports', help='Write time and size of the cluster report formats.')
+    reports_parser.add_argument('--rows', type=int, default=200_000)
+    reports_parser.add_argument('--clusters', type=int, default=10)
+    reports_parser.add_argument('--sample-size', type=int, default=10_000)
+
+    scoring_parser = subparsers.add_parser('scoring', help='Load test of the HTTP scoring server.')
+    scoring_parser.add_argument('--requests', type=int, default=2000)
+    scoring_parser.add_argument('--concurrency', type=int, default=32)
+    scoring_parser.add_argument('--customers-per-request', type=int, default=1)
+    scoring_parser.add_argument('--port', type=int, default=8765)
+    scoring_parser.add_argument('--max-wait-ms', type=float)
+    scoring_parser.add_argument('--no-start-server', action='store_true', help='Test an already running server.')
+
+    incremental_parser = subparsers.add_parser('incremental', help='Delta file vs. full rewrite of a stored table per update.')
+    incremental_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    incremental_parser.add_argument('--delta', type=int, default=1000)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='End-to-end stage timings on synthetic data.')
+    pipeline_parser.add_argument('--sizes', type=int, nargs='+', default=PIPELINE_SIZES)
+    pipeline_parser.add_argument('--results-dir', default=BENCH_RESULTS_DIR)
+    pipeline_parser.add_argument('--skip-eda', action='store_true')
+    pipeline_parser.add_argument('--silhouette', default='auto', choices=['auto', 'exact', 'sampled', 'simplified'])
+
+    startup_parser = subparsers.add_parser('startup', help='Cold-start time of the CLI entry points and import breakdown.')
+    startup_parser.add_argument('--repeats', type=int, default=5)
+    startup_parser.add_argument('--results-dir', default=BENCH_RESULTS_DIR)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two pipeline or startup benchmark result files.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+
+    args = parser.parse_args()
+    if args.benchmark == 'loader':
+        bench_loader(args.rows, args.chunksize)
+    elif args.benchmark == 'processing':
+        bench_processing(args.rows)
+    elif args.benchmark == 'memory':
+        bench_memory(args.rows, args.clusters)
+    elif args.benchmark == 'eda':
+        bench_eda(args.rows, args.jobs)
+    elif args.benchmark == 'sketch':
+        bench_sketch(args.rows, args.jobs)
+    elif args.benchmark == 'distributed':
+        bench_distributed(args.rows, args.clusters, args.workers, args.split)
+    elif args.benchmark == 'reports':
+        bench_reports(args.rows, args.clusters, args.sample_size)
+    elif args.benchmark == 'scoring':
+        bench_scoring(args.requests, args.concurrency, args.customers_per_request, port=args.port,
+                      start_server=not args.no_start_server, max_wait_ms=args.max_wait_ms)
+    elif args.benchmark == 'incremental':
+        bench_incremental(args.sizes, args.delta)
+    elif args.benchmark == 'pipeline':
+        bench_pipeline(args.sizes, args.results_dir, run_eda=not args.skip_eda, silhouette=args.silhouette)
+    elif args.benchmark == 'startup':
+        bench_startup(args.repeats, args.results_dir)
+    elif args.benchmark == 'compare':
+        compare_results(args.baseline, args.candidate)
+
+
+if __name__ == "__main__":
+    main()
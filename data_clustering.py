@@ -1,11 +1,16 @@
+import contextlib
 import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
-from sklearn.metrics import silhouette_score
-from mpl_toolkits.mplot3d import Axes3D
+from sklearn.cluster import KMeans, MiniBatchKMeans, Birch, DBSCAN, HDBSCAN, AgglomerativeClustering
+from sklearn.neighbors import NearestNeighbors, kneighbors_graph
+from sklearn.metrics import silhouette_score, silhouette_samples
+from joblib import Parallel, delayed
+
+import distributed
+import instrumentation
+from projection import fit_projection, model_matrix
 
 
 # Base directory for all reports and results
@@ -19,15 +24,176 @@ REPORTS_SCORES_DIR = os.path.join(REPORTS_DIR, 'scores')
 REPORTS_ALL_K_PLOTS_DIR = os.path.join(REPORTS_DIR, 'all_k_plots')
 
 
-def evaluate_k_range(df, split_name, k_range=range(2, 11)):
+# Number of rows above which algorithm='auto' switches to MiniBatchKMeans
+MINIBATCH_THRESHOLD = 100_000
+# Initial (pilot) sample size for the sampled silhouette estimate
+SILHOUETTE_PILOT_SIZE = 1000
+# Above this many rows silhouette='auto' uses the sampled estimate instead of the O(n^2) exact score
+EXACT_SILHOUETTE_MAX_ROWS = 20_000
+# Neighbours per point for the kNN-graph agglomerative backend and the DBSCAN eps estimate
+KNN_NEIGHBORS = 10
+# Parameters of the density-based backends, named when they find no clusters
+DENSITY_PARAMS = ('eps', 'min_samples', 'min_cluster_size')
+
+
+def _fit_kmeans(X, k, algorithm='kmeans', init=None, random_state=42, executor=None):
+    """
+    Fits (MiniBatch)KMeans for one k, optionally starting from given centroids.
+    'distributed' runs `distributed.DistributedKMeans` on `executor`.
+    """
+    if algorithm == 'distributed':
+        model = distributed.DistributedKMeans(
+            n_clusters=k, executor=executor or distributed.DEFAULT_EXECUTOR,
+            init='k-means||' if init is None else init, random_state=random_state
+        )
+    elif algorithm == 'minibatch':
+        model = MiniBatchKMeans(
+            n_clusters=k, init='k-means++' if init is None else init, n_init=3 if init is None else 1,
+            batch_size=1024, random_state=random_state
+        )
+    else:
+        model = KMeans(
+            n_clusters=k, init='k-means++' if init is None else init, n_init=10 if init is None else 1,
+            random_state=random_state
+        )
+    labels = model.fit_predict(X)
+    return model, labels
+
+
+def _grow_centroids(X, centers, labels, k, random_state=42):
+    """
+    Warm start for a larger k: keeps the previous centroids and splits the cluster
+    with the largest within-cluster sum of squares in two (as in bisecting k-means),
+    repeating until there are k centroids.
+    """
+    while len(centers) < k:
+        sse = np.bincount(labels, weights=((X - centers[labels]) ** 2).sum(axis=1), minlength=len(centers))
+        worst = int(np.argmax(sse))
+        members = labels == worst
+        halves = KMeans(n_clusters=2, n_init=3, random_state=random_state).fit(X[members])
+        kept = np.delete(np.arange(len(centers)), worst)
+        # Relabel: the kept clusters move down past `worst`, its rows go to the two halves
+        remap = np.zeros(len(centers), dtype=labels.dtype)
+        remap[kept] = np.arange(len(kept))
+        labels = remap[labels]
+        labels[members] = len(kept) + halves.labels_
+        centers = np.vstack([centers[kept], halves.cluster_centers_])
+    return centers
+
+
+def _stratified_sample(labels, size, rng):
+    """Draws a sample of row indices with the same cluster proportions as `labels`."""
+    n = len(labels)
+    picked = []
+    for label in np.unique(labels):
+        idx = np.flatnonzero(labels == label)
+        take = min(len(idx), max(2, int(round(size * len(idx) / n))))
+        picked.append(rng.choice(idx, size=take, replace=False))
+    return np.concatenate(picked)
+
+
+def simplified_silhouette(X, labels, centers):
+    """
+    Centroid-based silhouette in O(n*k) time: a(i) is the distance to the own centroid,
+    b(i) the distance to the nearest other centroid. Distances are computed as
+    ||x||^2 - 2*x.c + ||c||^2 in row blocks, so the temporaries are O(block*k)
+    instead of an n*k*d difference array.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    center_norms = (centers ** 2).sum(axis=1)
+    total = 0.0
+    for start in range(0, len(X), distributed.DISTANCE_BLOCK_ROWS):
+        block = np.asarray(X[start:start + distributed.DISTANCE_BLOCK_ROWS], dtype=np.float64)
+        own = labels[start:start + len(block)]
+        d2 = (block ** 2).sum(axis=1)[:, None] - 2 * block @ centers.T + center_norms
+        dists = np.sqrt(np.maximum(d2, 0.0))
+        rows = np.arange(len(block))
+        a = dists[rows, own]
+        dists[rows, own] = np.inf
+        b = dists.min(axis=1)
+        denom = np.maximum(a, b)
+        total += np.divide(b - a, denom, out=np.zeros_like(a), where=denom > 0).sum()
+    return float(total / len(X))
+
+
+def estimate_silhouette(X, labels, centers, method='exact', max_error=0.01, random_state=42):
+    """
+    Estimates the silhouette score of a clustering.
+
+    Args:
+        method (str): 'exact' (O(n^2)), 'simplified' (centroid-based, O(n*k)),
+            'sampled' (exact silhouette on a stratified sample) or 'auto' (exact up
+            to EXACT_SILHOUETTE_MAX_ROWS rows, sampled above).
+        max_error (float): For 'sampled', the target half-width of the 95%
+            confidence interval. The sample grows until it is met or covers all rows.
+
+    Returns:
+        tuple: (score, error), where error is the 95% half-width (0 for exact/simplified).
+    """
+    if method == 'auto':
+        method = 'exact' if len(X) <= EXACT_SILHOUETTE_MAX_ROWS else 'sampled'
+    if method == 'exact':
+        return float(silhouette_score(X, labels)), 0.0
+    if method == 'simplified':
+        return simplified_silhouette(X, labels, centers), 0.0
+    if method != 'sampled':
+        raise ValueError(f"Unknown silhouette method '{method}'. Choose 'exact', 'sampled', 'simplified' or 'auto'.")
+
+    rng = np.random.default_rng(random_state)
+    size = min(len(X), SILHOUETTE_PILOT_SIZE)
+    while True:
+        if size >= len(X):
+            return float(silhouette_score(X, labels)), 0.0
+        idx = _stratified_sample(labels, size, rng)
+        values = silhouette_samples(X[idx], labels[idx])
+        error = 1.96 * values.std(ddof=1) / np.sqrt(len(idx))
+        if error <= max_error:
+            return float(values.mean()), float(error)
+        # Sample size needed for the requested error, from the observed spread
+        size = int(np.ceil((1.96 * values.std(ddof=1) / max_error) ** 2))
+
+
+def _evaluate_single_k(X, k, algorithm, silhouette, silhouette_error, random_state, init=None, executor=None):
+    model, labels = _fit_kmeans(X, k, algorithm=algorithm, init=init, random_state=random_state, executor=executor)
+    score, error = estimate_silhouette(
+        X, labels, model.cluster_centers_, method=silhouette, max_error=silhouette_error, random_state=random_state
+    )
+    metrics = {'k': k, 'inertia': model.inertia_, 'silhouette': score,
+               'silhouette_error': error, 'n_iter': model.n_iter_, 'converged': model.n_iter_ < model.max_iter}
+    return metrics, model.cluster_centers_, labels
+
+
+def evaluate_k_range(df, split_name, k_range=range(2, 11), algorithm='kmeans', warm_start=False, n_jobs=1,
+                     silhouette='exact', silhouette_error=0.01, random_state=42, return_metrics=False,
+                     projection=None, output_dir=REPORTS_K_EVAL_DIR):
     """
     Calculates and plots inertia and silhouette scores for a range of k values
     to find the optimal number of clusters.
+
+    Args:
+        algorithm (str): 'kmeans', 'minibatch', 'auto' (MiniBatchKMeans above MINIBATCH_THRESHOLD
+            rows) or 'distributed' (`distributed.DistributedKMeans`: the rows are sharded once
+            across the executor's workers and every k runs map/reduce over the shards).
+        warm_start (bool): Seeds each k from the previous solution's centroids, splitting
+            its worst clusters until there are k (`k_range` must be increasing). This chains the fits, so the sweep then runs sequentially.
+        n_jobs (int): Number of parallel jobs for the k sweep (-1 uses all cores). The
+            distributed sweep runs its ks one after another, each across all workers.
+        silhouette (str): 'exact', 'sampled', 'simplified' or 'auto', see `estimate_silhouette`.
+        silhouette_error (float): Target 95% error bound for the sampled silhouette.
+        return_metrics (bool): Also return a dataframe with the per-k metrics.
+        projection (dict): A projection from `projection.fit_projection`. When given,
+            the sweep runs on its projected rows, the space `cluster_with_pca` clusters in.
+        output_dir (str): Directory of the k evaluation plot (e.g. a temporary one for tests).
+
+    Returns:
+        int: The k with the highest silhouette score, or (k, metrics) if `return_metrics`.
     """
     print(f"--- Evaluating k for '{split_name}'. Data shape: {df.shape}, Columns: {df.columns.tolist()}")
 
     # Ensure the dataframe has numeric data to evaluate
-    if 'ID' in df.columns:
+    if projection is not None:
+        X = pd.DataFrame(projection['X_pca'])
+    elif 'ID' in df.columns:
         X = df.select_dtypes(include=np.number).drop(columns=['ID'])
     else:
         X = df.select_dtypes(include=np.number)
@@ -35,98 +201,236 @@ def evaluate_k_range(df, split_name, k_range=range(2, 11)):
     # Ensure there's data to process
     if X.empty:
         print(f"Warning: No numeric data to evaluate for split '{split_name}'. Skipping.")
-        return 2 # Return a default value
+        return (2, pd.DataFrame()) if return_metrics else 2 # Return a default value
 
-    inertias = []
-    silhouettes = []
+    X = model_matrix(X) # float32 split tables are clustered in float32
+    if algorithm == 'auto':
+        algorithm = 'minibatch' if len(X) > MINIBATCH_THRESHOLD else 'kmeans'
 
-    for k in k_range:
-        kmeans = KMeans(n_clusters=k, n_init=10, random_state=42)
-        labels = kmeans.fit_predict(X)
-        inertias.append(kmeans.inertia_)
-        silhouettes.append(silhouette_score(X, labels))
-
-    os.makedirs(REPORTS_K_EVAL_DIR, exist_ok=True)
-    plot_output_path = os.path.join(REPORTS_K_EVAL_DIR, f'{split_name}_k_evaluation.png')
-
-    plt.figure(figsize=(12, 5))
-    plt.subplot(1, 2, 1)
-    plt.plot(k_range, inertias, marker='o', linestyle='--')
-    plt.title(f'Elbow Method for {split_name.capitalize()}')
-    plt.xlabel('Number of Clusters (k)')
-    plt.ylabel('Inertia')
-
-    plt.subplot(1, 2, 2)
-    plt.plot(k_range, silhouettes, marker='o', linestyle='--', color='green')
-    plt.title(f'Silhouette Scores for {split_name.capitalize()}')
-    plt.xlabel('Number of Clusters (k)')
-    plt.ylabel('Silhouette Score')
-
-    plt.tight_layout()
-    plt.savefig(plot_output_path)
-    plt.close()
+    k_values = list(k_range)
+    if warm_start and any(later <= earlier for earlier, later in zip(k_values, k_values[1:])):
+        raise ValueError(f"warm_start needs an increasing k_range, got {k_values}.")
+    if warm_start or algorithm == 'distributed':
+        results, centers, labels = [], None, None
+        # One executor for the whole distributed sweep, so the rows are sharded only once
+        pool = distributed.make_executor() if algorithm == 'distributed' else contextlib.nullcontext()
+        with pool as executor:
+            for k in k_values:
+                init = None if centers is None or not warm_start else _grow_centroids(X, centers, labels, k, random_state)
+                metrics, centers, labels = _evaluate_single_k(
+                    X, k, algorithm, silhouette, silhouette_error, random_state, init, executor
+                )
+                results.append(metrics)
+    else:
+        results = [
+            metrics for metrics, _, _ in Parallel(n_jobs=n_jobs)(
+                delayed(_evaluate_single_k)(X, k, algorithm, silhouette, silhouette_error, random_state)
+                for k in k_values
+            )
+        ]
+
+    metrics_df = pd.DataFrame(results)
+    instrumentation.annotate(algorithm=algorithm, kmeans=metrics_df[['k', 'n_iter', 'converged', 'inertia']].to_dict('list'))
+    inertias = metrics_df['inertia'].tolist()
+    silhouettes = metrics_df['silhouette'].tolist()
+
+    os.makedirs(output_dir, exist_ok=True)
+    plot_output_path = os.path.join(output_dir, f'{split_name}_k_evaluation.png')
+
+    import seaborn as sns # Only the plots need it
+
+    with sns.axes_style("whitegrid"):
+        plt.figure(figsize=(12, 5))
+        plt.subplot(1, 2, 1)
+        plt.plot(k_range, inertias, marker='o', linestyle='--')
+        plt.title(f'Elbow Method for {split_name.capitalize()}')
+        plt.xlabel('Number of Clusters (k)')
+        plt.ylabel('Inertia')
+
+        plt.subplot(1, 2, 2)
+        plt.plot(k_range, silhouettes, marker='o', linestyle='--', color='green')
+        plt.title(f'Silhouette Scores for {split_name.capitalize()}')
+        plt.xlabel('Number of Clusters (k)')
+        plt.ylabel('Silhouette Score')
+
+        plt.tight_layout()
+        plt.savefig(plot_output_path)
+        plt.close()
 
     # Determine the best k as the one with the highest silhouette score
-    optimal_k = k_range[np.argmax(silhouettes)]
+    optimal_k = k_values[np.argmax(silhouettes)]
+    if return_metrics:
+        return optimal_k, metrics_df
     return optimal_k
 
-def cluster_with_pca(df, split_name, n_clusters, n_components=3, method='kmeans'):
+def _kmeans_backend(X, n_clusters, random_state):
+    """KMeans (Lloyd): O(n*k*d) time per iteration, O(n*d) memory."""
+    return KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state)
+
+
+def _minibatch_backend(X, n_clusters, random_state):
+    """MiniBatchKMeans: O(b*k*d) time per step for batch size b, O(n*d) memory. For millions of rows."""
+    return MiniBatchKMeans(n_clusters=n_clusters, n_init=3, batch_size=1024, random_state=random_state)
+
+
+def _distributed_backend(X, n_clusters, random_state):
+    """
+    `distributed.DistributedKMeans`: k-means|| initialization and Lloyd iterations as
+    map/reduce over row shards, O(n*k*d / workers) time per iteration and O(n/workers)
+    rows per worker. Runs on the local process executor, standing in for a cluster.
+    """
+    return distributed.DistributedKMeans(n_clusters=n_clusters, random_state=random_state)
+
+
+def _birch_backend(X, n_clusters, random_state):
+    """
+    BIRCH: one pass builds a CF-tree of subclusters, O(n*log(s)) time and O(s)
+    memory for s subclusters, then the subclusters are merged to `n_clusters`.
+    """
+    return Birch(n_clusters=n_clusters, threshold=0.5)
+
+
+def _agglomerative_knn_backend(X, n_clusters, random_state):
+    """
+    Ward agglomerative clustering restricted to a kNN connectivity graph:
+    O(n*KNN_NEIGHBORS) memory instead of the O(n^2) distance matrix.
+    """
+    connectivity = kneighbors_graph(X, n_neighbors=min(KNN_NEIGHBORS, len(X) - 1), include_self=False)
+    return AgglomerativeClustering(n_clusters=n_clusters, connectivity=connectivity, linkage='ward')
+
+
+def _agglomerative_backend(X, n_clusters, random_state):
+    """Unconstrained Ward agglomerative clustering: O(n^2) memory and time. Small splits only."""
+    return AgglomerativeClustering(n_clusters=n_clusters)
+
+
+def _dbscan_backend(X, n_clusters, random_state):
+    """
+    DBSCAN with a KD-tree: O(n*log(n)) average time, O(n*m) memory for m
+    neighbours within eps. Finds its own number of clusters (`n_clusters` is
+    ignored) and labels outliers as -1. eps is the 90th percentile of the
+    distance to the KNN_NEIGHBORS-th neighbour.
+    """
+    n_neighbors = min(KNN_NEIGHBORS, len(X) - 1)
+    distances, _ = NearestNeighbors(n_neighbors=n_neighbors + 1, algorithm='kd_tree').fit(X).kneighbors(X)
+    eps = float(np.quantile(distances[:, -1], 0.9)) or 1e-6
+    return DBSCAN(eps=eps, min_samples=n_neighbors, algorithm='kd_tree')
+
+
+def _hdbscan_backend(X, n_clusters, random_state):
+    """
+    HDBSCAN with a KD-tree: about O(n*log(n)) time in low dimensions (as after PCA)
+    and O(n) memory. Finds its own number of clusters and labels outliers as -1.
+    """
+    return HDBSCAN(min_cluster_size=max(5, len(X) // 100), algorithm='kd_tree', copy=True)
+
+
+# Clustering backends for `cluster_with_pca`. Each builds an unfitted estimator
+# from the PCA-projected data; see the docstrings for time and memory complexity.
+CLUSTERING_BACKENDS = {
+    'kmeans': _kmeans_backend,
+    'minibatch': _minibatch_backend,
+    'distributed': _distributed_backend,
+    'birch': _birch_backend,
+    'agglomerative_knn': _agglomerative_knn_backend,
+    'agglomerative': _agglomerative_backend,
+    'dbscan': _dbscan_backend,
+    'hdbscan': _hdbscan_backend,
+}
+
+
+def cluster_with_pca(df, split_name, n_clusters, n_components=3, method='kmeans', return_models=False,
+                     silhouette='exact', projection=None):
     """
     Performs PCA and clustering on the given SCALED dataframe.
     Returns a dataframe with just the ID and the resulting Cluster label.
+    `method` picks one of the CLUSTERING_BACKENDS; 'dbscan' and 'hdbscan' choose
+    the number of clusters themselves and label outliers as -1.
+    The reported silhouette score is computed with `estimate_silhouette(method=silhouette)`.
+    With `return_models=True`, also returns a dict with the fitted 'pca', 'model',
+    the 'feature_columns' they were fitted on and the 'cluster_sizes'.
+    A `projection` from `projection.fit_projection` is reused instead of fitting PCA again.
     """
     if 'ID' not in df.columns:
         raise ValueError("The input dataframe for clustering must contain an 'ID' column.")
+    if method not in CLUSTERING_BACKENDS:
+        raise ValueError(f"Unknown clustering method '{method}'. Choose from {list(CLUSTERING_BACKENDS)}.")
 
-    X = df.select_dtypes(include=np.number).drop(columns=['ID'])
+    if projection is None:
+        projection = fit_projection(df, split_name, n_components=n_components, report=False)
 
-    if X.empty:
+    if projection is None:
         print(f"Warning: No numeric data to cluster for split '{split_name}'. Skipping.")
-        return pd.DataFrame({'ID': df['ID'], 'Cluster': 0})
+        cluster_labels_df = pd.DataFrame({'ID': df['ID'], 'Cluster': 0})
+        return (cluster_labels_df, None) if return_models else cluster_labels_df
 
     os.makedirs(REPORTS_CLUSTER_PLOTS_DIR, exist_ok=True)
     os.makedirs(REPORTS_SCORES_DIR, exist_ok=True)
 
-    pca = PCA(n_components=n_components, random_state=42)
-    X_pca = pca.fit_transform(X)
-
-    if method == 'kmeans':
-        model = KMeans(n_clusters=n_clusters, n_init=10, random_state=42)
-    else:
-        model = AgglomerativeClustering(n_clusters=n_clusters)
+    pca, X_pca = projection['pca'], projection['X_pca']
+    n_components = X_pca.shape[1]
 
+    model = CLUSTERING_BACKENDS[method](X_pca, n_clusters, random_state=42)
     clusters = model.fit_predict(X_pca)
-    cluster_labels_df = pd.DataFrame({'ID': df['ID'], 'Cluster': clusters})
+    cluster_labels_df = pd.DataFrame({'ID': projection['ids'], 'Cluster': clusters})
+    instrumentation.annotate(method=method, clusters_found=int(clusters.max() + 1), outliers=int((clusters < 0).sum()))
+    if clusters.max() < 0:
+        # Density-based backends can label every row as noise; there is nothing to plot or score with
+        params = {name: value for name, value in model.get_params().items() if name in DENSITY_PARAMS}
+        raise ValueError(f"'{method}' labelled all {len(clusters)} rows of split '{split_name}' as noise "
+                         f"and found no clusters with {params}. Choose another method for this split.")
+    if hasattr(model, 'n_iter_'):
+        instrumentation.annotate(n_iter=int(model.n_iter_), converged=bool(model.n_iter_ < model.max_iter),
+                                 inertia=float(model.inertia_))
 
-    if len(set(clusters)) > 1:
-        score_text = f"{silhouette_score(X_pca, clusters):.3f}"
+    score_text = 'n/a'
+    clustered = clusters >= 0 # Outliers (-1) from density-based backends are not scored
+    if len(set(clusters[clustered])) > 1:
+        centers = getattr(model, 'cluster_centers_', None)
+        if centers is None:
+            centers = np.vstack([X_pca[clusters == c].mean(axis=0) for c in range(clusters.max() + 1)])
+        score, _ = estimate_silhouette(X_pca[clustered], clusters[clustered], centers, method=silhouette)
+        score_text = f"{score:.3f}"
         score_file_path = os.path.join(REPORTS_SCORES_DIR, f'{split_name}_silhouette.txt')
         with open(score_file_path, 'w') as f:
-            f.write(f"Silhouette Score for {split_name} with {n_clusters} clusters: {score_text}\n")
+            f.write(f"Silhouette Score for {split_name} with {len(centers)} clusters: {score_text}\n")
 
     title = f'"{split_name.capitalize()}" Clusters ({n_components}D PCA)\nSilhouette Score: {score_text}'
     plot_path = os.path.join(REPORTS_CLUSTER_PLOTS_DIR, f'{split_name}_clusters_{n_components}d.png')
 
-    plt.figure(figsize=(10, 8))
-    if n_components >= 3:
-        ax = plt.axes(projection='3d')
-        scatter = ax.scatter3D(X_pca[:, 0], X_pca[:, 1], X_pca[:, 2], c=clusters, cmap='viridis', alpha=0.6)
-        ax.set_zlabel('PCA 3')
-    else:
-        ax = plt.axes()
-        scatter = ax.scatter(X_pca[:, 0], X_pca[:, 1], c=clusters, cmap='viridis', alpha=0.6)
-        plt.grid(True)
+    import seaborn as sns # Only the plots need it
+
+    with sns.axes_style("whitegrid"):
+        plt.figure(figsize=(10, 8))
+        if n_components >= 3:
+            from mpl_toolkits.mplot3d import Axes3D # Registers the '3d' projection
+            ax = plt.axes(projection='3d')
+            scatter = ax.scatter3D(X_pca[:, 0], X_pca[:, 1], X_pca[:, 2], c=clusters, cmap='viridis', alpha=0.6)
+            ax.set_zlabel('PCA 3')
+        else:
+            ax = plt.axes()
+            scatter = ax.scatter(X_pca[:, 0], X_pca[:, 1], c=clusters, cmap='viridis', alpha=0.6)
+            plt.grid(True)
     
-    ax.set_xlabel('PCA 1')
-    ax.set_ylabel('PCA 2')
-    ax.set_title(title)
-    plt.colorbar(scatter, ax=ax, label='Cluster')
-    plt.savefig(plot_path)
-    plt.close()
+        ax.set_xlabel('PCA 1')
+        ax.set_ylabel('PCA 2')
+        ax.set_title(title)
+        plt.colorbar(scatter, ax=ax, label='Cluster')
+        plt.savefig(plot_path)
+        plt.close()
 
+    if return_models:
+        models = {
+            'pca': pca, 'model': model, 'feature_columns': projection['feature_columns'],
+            'cluster_sizes': np.bincount(clusters[clustered], minlength=getattr(model, 'n_clusters', 0))
+        }
+        if not hasattr(model, 'cluster_centers_'):
+            # Models without centroids (e.g. agglomerative, DBSCAN) are scored by nearest cluster mean
+            models['centroids'] = np.vstack([X_pca[clusters == c].mean(axis=0) for c in range(clusters.max() + 1)])
+        return cluster_labels_df, models
     return cluster_labels_df
 
-def save_all_k_means_plots(df, split_name, k_range=range(2, 11), n_components=2):
+def save_all_k_means_plots(df, split_name, k_range=range(2, 11), n_components=2, projection=None):
     """
     Performs PCA and K-Means clustering for a range of k values and saves a plot for each.
 
@@ -135,16 +439,17 @@ def save_all_k_means_plots(df, split_name, k_range=range(2, 11), n_components=2)
         split_name (str): The name of the data split (e.g., 'people').
         k_range (range): The range of cluster numbers to visualize.
         n_components (int): The number of principal components to use for visualization.
+        projection (dict): A projection from `projection.fit_projection` to reuse.
     """
     print(f"--- Generating K-Means plots for k={min(k_range)} to k={max(k_range)} for '{split_name}' split ---")
     
-    X = df.select_dtypes(include=np.number)
-    
     os.makedirs(REPORTS_ALL_K_PLOTS_DIR, exist_ok=True)
 
-    # Perform PCA once
-    pca = PCA(n_components=n_components, random_state=42)
-    X_pca = pca.fit_transform(X)
+    # Perform PCA once ('ID' is not a feature)
+    if projection is None:
+        projection = fit_projection(df, split_name, n_components=n_components, report=False)
+    X_pca = projection['X_pca']
+    import seaborn as sns # Only the plots need it
 
     # Loop through each value of k
     for k in k_range:
@@ -153,17 +458,18 @@ def save_all_k_means_plots(df, split_name, k_range=range(2, 11), n_components=2)
         clusters = kmeans.fit_predict(X_pca)
         
         # Create and save the plot
-        plt.figure(figsize=(8, 6))
-        scatter = plt.scatter(X_pca[:, 0], X_pca[:, 1], c=clusters, cmap='viridis', alpha=0.7)
-        
-        plt.title(f'"{split_name.capitalize()}" Clusters (k={k})')
-        plt.xlabel('Principal Component 1')
-        plt.ylabel('Principal Component 2')
-        plt.colorbar(scatter, label='Cluster')
-        plt.grid(True)
-        
-        plot_path = os.path.join(REPORTS_ALL_K_PLOTS_DIR, f'{split_name}_k_{k}_clusters.png')
-        plt.savefig(plot_path)
-        plt.close()
+        with sns.axes_style("whitegrid"):
+            plt.figure(figsize=(8, 6))
+            scatter = plt.scatter(X_pca[:, 0], X_pca[:, 1], c=clusters, cmap='viridis', alpha=0.7)
+
+            plt.title(f'"{split_name.capitalize()}" Clusters (k={k})')
+            plt.xlabel('Principal Component 1')
+            plt.ylabel('Principal Component 2')
+            plt.colorbar(scatter, label='Cluster')
+            plt.grid(True)
+
+            plot_path = os.path.join(REPORTS_ALL_K_PLOTS_DIR, f'{split_name}_k_{k}_clusters.png')
+            plt.savefig(plot_path)
+            plt.close()
         
     print(f"All plots for '{split_name}' saved to {REPORTS_ALL_K_PLOTS_DIR}")
\ No newline at end of file
@@ -1,19 +1,45 @@
 import pandas as pd
 
-def load_raw_data(filepath, sep='\t'):
+# Default number of rows per chunk for the streaming loader
+DEFAULT_CHUNKSIZE = 100_000
+
+# Explicit column schema for the raw marketing campaign file.
+# Counts and flags use the smallest integer type that fits them, the two
+# free-text columns are categoricals and 'Dt_Customer' is parsed on read.
+RAW_SCHEMA = {
+    'ID': 'int32', 'Year_Birth': 'int16', 'Education': 'category',
+    'Marital_Status': 'category', 'Income': 'float32',
+    'Kidhome': 'int8', 'Teenhome': 'int8', 'Recency': 'int16',
+    'MntWines': 'int32', 'MntFruits': 'int32', 'MntMeatProducts': 'int32',
+    'MntFishProducts': 'int32', 'MntSweetProducts': 'int32', 'MntGoldProds': 'int32',
+    'NumDealsPurchases': 'int16', 'NumWebPurchases': 'int16',
+    'NumCatalogPurchases': 'int16', 'NumStorePurchases': 'int16',
+    'NumWebVisitsMonth': 'int16',
+    'AcceptedCmp1': 'int8', 'AcceptedCmp2': 'int8', 'AcceptedCmp3': 'int8',
+    'AcceptedCmp4': 'int8', 'AcceptedCmp5': 'int8',
+    'Complain': 'int8', 'Z_CostContact': 'int8', 'Z_Revenue': 'int8', 'Response': 'int8'
+}
+DATE_COLUMNS = ['Dt_Customer']
+DATE_FORMAT = '%d-%m-%Y'
+
+
+def load_raw_data(filepath, sep='\t', compact=False):
     """
     Loads raw data from a CSV file.
 
     Args:
         filepath (str): The path to the CSV file.
         sep (str): The separator used in the CSV file (default is tab).
+        compact (bool): Read with RAW_SCHEMA (small integer types, categoricals,
+            parsed dates) instead of the inferred int64/float64/string columns.
 
     Returns:
         pd.DataFrame: The loaded DataFrame, or None if loading fails.
     """
     print(f"Loading data from {filepath}...")
+    typed = dict(dtype=RAW_SCHEMA, parse_dates=DATE_COLUMNS, date_format=DATE_FORMAT) if compact else {}
     try:
-        df = pd.read_csv(filepath, sep=sep)
+        df = pd.read_csv(filepath, sep=sep, **typed)
         print(f"Data loaded successfully. Shape: {df.shape}")
         return df
     except FileNotFoundError:
@@ -21,4 +47,64 @@ def load_raw_data(filepath, sep='\t'):
         return None
     except Exception as e:
         print(f"Error loading data: {e}")
-        return
\ No newline at end of file
+        return
+
+
+def iter_raw_chunks(filepath, sep='\t', chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Streams the raw data file in chunks using the explicit RAW_SCHEMA.
+
+    Only one chunk is held in memory at a time, so peak memory is bounded by
+    the chunk size rather than by the size of the file.
+
+    Args:
+        filepath (str): The path to the CSV file.
+        sep (str): The separator used in the CSV file (default is tab).
+        chunksize (int): Number of rows per chunk.
+
+    Yields:
+        pd.DataFrame: One typed chunk of the raw data.
+    """
+    print(f"Streaming data from {filepath} in chunks of {chunksize} rows...")
+    reader = pd.read_csv(
+        filepath, sep=sep, dtype=RAW_SCHEMA, parse_dates=DATE_COLUMNS,
+        date_format=DATE_FORMAT, chunksize=chunksize
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def read_income_median(filepath, sep='\t', chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Computes the median 'Income' of the raw file without loading the other columns.
+
+    The median is a global statistic, so it has to be known before the chunks are
+    processed. Only the float32 'Income' column is kept in memory for this.
+
+    Returns:
+        float: The median of the non-missing 'Income' values.
+    """
+    reader = pd.read_csv(
+        filepath, sep=sep, usecols=['Income'], dtype={'Income': 'float32'}, chunksize=chunksize
+    )
+    with reader:
+        incomes = pd.concat([chunk['Income'].dropna() for chunk in reader], ignore_index=True)
+    return float(incomes.median())
+
+
+def read_raw_incomes(filepath, sep='\t', chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Reads the raw 'Income' (with missing values) of every customer, indexed by 'ID',
+    without loading the other columns.
+
+    Returns:
+        pd.Series: float64 incomes indexed by 'ID'.
+    """
+    reader = pd.read_csv(
+        filepath, sep=sep, usecols=['ID', 'Income'], dtype={'ID': RAW_SCHEMA['ID'], 'Income': 'float64'},
+        chunksize=chunksize
+    )
+    with reader:
+        incomes = pd.concat([chunk.set_index('ID')['Income'] for chunk in reader])
+    return incomes
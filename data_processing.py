@@ -1,55 +1,188 @@
 import os
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import data_loader
 
 
-#Unecessary data drop 
-import pandas as pd
+# Spending columns summed into 'Spent'
+MNT_COLS = ['MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts', 'MntGoldProds']
+# Household lookup: each marital status maps to a 'Living_With' code (0 = Partner, 1 = Single)
+MARITAL_STATUSES = ['Married', 'Together', 'Absurd', 'Widow', 'YOLO', 'Divorced', 'Single', 'Alone']
+LIVING_WITH_CODES = np.array([0, 0, 1, 1, 1, 1, 1, 1], dtype=np.int8)
+LIVING_WITH_LABELS = np.array(['Partner', 'Single'], dtype=object)
+ADULTS_PER_HOUSEHOLD = np.array([2, 1], dtype=np.int64)
+# Original columns that are redundant after feature engineering
+DROPPED_COLS = ['Year_Birth', 'Dt_Customer', 'Z_CostContact', 'Z_Revenue', 'Marital_Status']
+# Columns that processing adds; with the raw columns minus DROPPED_COLS they make up its output
+DERIVED_COLS = ['Spent', 'Living_With', 'Children', 'Family_Size', 'Is_Parent', 'Age', 'Days_Enrolled']
+PROCESSED_COLUMNS = [col for col in data_loader.RAW_SCHEMA if col not in DROPPED_COLS] + DERIVED_COLS
+# Outlier limits: rows at or above these are removed
+MAX_INCOME = 600000
+MAX_AGE = 90
+# Rows per StandardScaler.partial_fit call when scaling compact frames
+SCALE_BATCH_ROWS = 100_000
+
+
+def _enrolment_days(dates, reference_date):
+    """Whole days from each 'Dt_Customer' to `reference_date`, parsing strings with the fixed raw format."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=data_loader.DATE_FORMAT)
+    days = dates.to_numpy(dtype='datetime64[D]')
+    return (np.datetime64(reference_date.date(), 'D') - days).astype(np.int64)
+
+
+def compact_frame(df):
+    """
+    Returns `df` with every integer column downcast to the smallest signed type that
+    holds its values and string columns as categoricals. Floats are left as they are.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_integer_dtype(values.dtype):
+            values = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype):
+            values = values.astype('category')
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
 
-def processing(df):
+def processing(df, income_median=None, verbose=True, reference_date=None, compact=False):
     """
     Performs data cleaning and feature engineering.
     - Creates new, useful columns ('Total_Spend', 'Age', etc.).
     - Cleans up bad data.
-    - Fills missing values.
+    - Fills missing values (with `income_median` when given, e.g. for chunks).
     - Returns a clean, human-readable dataframe.
     - IMPORTANT: Does NOT scale or encode data.
+
+    The input is not modified. All derived columns are computed on NumPy arrays
+    and the outlier filter is applied once, when the output frame is built.
+    'Age' and 'Days_Enrolled' are relative to `reference_date` (default: now),
+    so passing a fixed date makes the result reproducible. With `compact`, the
+    result goes through `compact_frame` (e.g. the 'AcceptedCmp*' flags become int8).
     """
-    print("--- Starting Data Processing and Feature Engineering ---")
+    if verbose:
+        print("--- Starting Data Processing and Feature Engineering ---")
+    if reference_date is None:
+        reference_date = pd.Timestamp.now()
+    reference_date = pd.Timestamp(reference_date)
 
     # Feature Engineering: Total Spending
-    mnt_cols = ['MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts', 'MntGoldProds']
-    df['Spent'] = df[mnt_cols].sum(axis=1)
-
-    # Feature Engineering: Household Composition
-    df['Living_With'] = df['Marital_Status'].replace({
-        "Married": "Partner", "Together": "Partner",
-        "Absurd": "Single", "Widow": "Single", "YOLO": "Single",
-        "Divorced": "Single", "Single": "Single", "Alone": "Single"
-    })
-    df['Children'] = df['Kidhome'] + df['Teenhome']
-    df['Family_Size'] = df['Living_With'].replace({"Single": 1, "Partner": 2}) + df['Children']
-    df['Is_Parent'] = (df['Children'] > 0).astype(int)
+    spent = df[MNT_COLS].to_numpy().sum(axis=1)
+
+    # Feature Engineering: Household Composition, via category codes and lookup arrays
+    status_codes = pd.Categorical(df['Marital_Status'], categories=MARITAL_STATUSES).codes
+    if (status_codes < 0).any():
+        unknown = df['Marital_Status'][status_codes < 0].unique()
+        raise ValueError(f"Unknown 'Marital_Status' values: {list(unknown)}. Expected one of {MARITAL_STATUSES}.")
+    living_with_codes = LIVING_WITH_CODES[status_codes]
+    children = df['Kidhome'].to_numpy() + df['Teenhome'].to_numpy()
+    family_size = ADULTS_PER_HOUSEHOLD[living_with_codes] + children
+    is_parent = (children > 0).astype(int)
 
     # Feature Engineering: Age and Enrollment Duration
-    current_year = pd.Timestamp.now().year
-    df['Age'] = current_year - df['Year_Birth']
-    df['Dt_Customer'] = pd.to_datetime(df['Dt_Customer'], dayfirst=True)
-    df['Days_Enrolled'] = (pd.Timestamp.now() - df['Dt_Customer']).dt.days
+    age = reference_date.year - df['Year_Birth'].to_numpy()
+    days_enrolled = _enrolment_days(df['Dt_Customer'], reference_date)
 
     # Data Cleaning
-    df['Income'] = df['Income'].fillna(df['Income'].median())
-    df = df[df['Income'] < 600000] # Remove outliers
-    df = df[df['Age'] < 90] # Remove outliers
+    if income_median is None:
+        income_median = df['Income'].median()
+    income = df['Income'].fillna(income_median)
+    keep = (income.to_numpy() < MAX_INCOME) & (age < MAX_AGE) # Remove outliers
 
-    # Drop original columns that are now redundant or not useful
-    cols_to_drop = ['Year_Birth', 'Dt_Customer', 'Z_CostContact', 'Z_Revenue', 'Marital_Status']
-    df = df.drop(columns=cols_to_drop, errors='ignore')
-    
-    print("Data processing complete. New features created and data cleaned.")
+    # Build the output once, from the kept rows only (.array keeps string/categorical dtypes)
+    index = df.index[keep]
+    data = {
+        col: (income if col == 'Income' else df[col]).array[keep]
+        for col in df.columns if col not in DROPPED_COLS
+    }
+    data.update({
+        'Spent': spent[keep],
+        'Living_With': pd.Series(LIVING_WITH_LABELS[living_with_codes[keep]], index=index, dtype=object),
+        'Children': children[keep],
+        'Family_Size': family_size[keep],
+        'Is_Parent': is_parent[keep],
+        'Age': age[keep],
+        'Days_Enrolled': days_enrolled[keep],
+    })
+    df = pd.DataFrame(data, index=index, copy=False)
+    if compact:
+        df = compact_frame(df)
+
+    if verbose:
+        print("Data processing complete. New features created and data cleaned.")
     return df
 
 
+def processing_in_chunks(filepath, chunksize=data_loader.DEFAULT_CHUNKSIZE, sep='\t', reference_date=None,
+                         income_median=None, compact=False):
+    """
+    Out-of-core version of `processing` for raw files that do not fit in memory.
+
+    The 'Income' median is computed first from that single column (unless given),
+    then every typed chunk from `data_loader.iter_raw_chunks` is processed independently,
+    so only one chunk is held in memory at a time. All chunks use the same
+    `reference_date` (default: now, taken once before the first chunk), so a run
+    that crosses midnight computes 'Age' and 'Days_Enrolled' consistently.
+    The pipeline streams its raw file through here when `main.py --chunksize` is set.
+
+    Yields:
+        pd.DataFrame: One processed chunk.
+    """
+    print("--- Starting Chunked Data Processing and Feature Engineering ---")
+    reference_date = pd.Timestamp.now() if reference_date is None else pd.Timestamp(reference_date)
+    if income_median is None:
+        income_median = data_loader.read_income_median(filepath, sep=sep, chunksize=chunksize)
+    n_rows = 0
+    for chunk in data_loader.iter_raw_chunks(filepath, sep=sep, chunksize=chunksize):
+        processed = processing(
+            chunk, income_median=income_median, verbose=False, reference_date=reference_date, compact=compact
+        )
+        n_rows += len(processed)
+        yield processed
+    print(f"Chunked data processing complete. {n_rows} rows processed.")
+
+
+def encode_and_scale(df, compact=False):
+    """
+    Creates the unscaled (one-hot encoded, for analysis) and scaled (for clustering)
+    versions of the processed dataframe.
+
+    The scaled frame shares the one-hot and 'ID' columns with the unscaled one
+    (copy-on-write) instead of copying them. With `compact`, the columns are
+    scaled and stored as float32, which halves the model matrices and avoids
+    the float64 copies (scikit-learn still accumulates the statistics in float64).
+
+    Returns:
+        tuple: (df_unscaled, df_scaled, scaler, numeric_cols), where `scaler` is the
+        StandardScaler fitted on `numeric_cols`.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    df_unscaled = pd.get_dummies(df, columns=['Education', 'Living_With'], drop_first=True)
+    df_scaled = df_unscaled.copy(deep=False)
+
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    if 'ID' in numeric_cols:
+        numeric_cols = numeric_cols.drop('ID')
+
+    scaler = StandardScaler()
+    if not compact:
+        df_scaled[numeric_cols] = scaler.fit_transform(df_unscaled[numeric_cols])
+        return df_unscaled, df_scaled, scaler, numeric_cols
+
+    # Fitting in row batches keeps scikit-learn's float64 temporaries small; the float32
+    # copy (exact for the integer columns and 'Income') is then scaled in place
+    for start in range(0, len(df_unscaled), SCALE_BATCH_ROWS):
+        scaler.partial_fit(df_unscaled[numeric_cols].iloc[start:start + SCALE_BATCH_ROWS])
+    X = df_unscaled[numeric_cols].to_numpy(dtype=np.float32)
+    X -= scaler.mean_
+    X /= scaler.scale_
+    df_scaled[numeric_cols] = X
+    return df_unscaled, df_scaled, scaler, numeric_cols
+
+
 def advanced_processing(df):
     """
     Perform advanced data processing on the DataFrame.
@@ -60,6 +193,7 @@ def advanced_processing(df):
     Returns:
     pd.DataFrame: The processed DataFrame.
     """    
+    from sklearn.preprocessing import StandardScaler
     
     #Encoding categorical variables
     categorical_features = df.select_dtypes(include=['object', 'category']).columns
@@ -1,50 +1,422 @@
 import os
-import pandas as pd
-
-# Define the columns for each Marketing 4P split
-# These definitions are now on the "public workbench" and can be imported.
-
-PEOPLE_COLS = [
-    'ID', 'Age', 'Education', 'Living_With', 'Income', 'Kidhome', 'Teenhome',
-    'Children', 'Family_Size', 'Is_Parent', 'Days_Enrolled', 'Recency', 'Complain'
-]
-PRODUCTS_COLS = [
-    'ID', 'MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts',
-    'MntSweetProducts', 'MntGoldProds', 'Spent'
-]
-PROMOTION_COLS = [
-    'ID', 'NumDealsPurchases', 'AcceptedCmp1', 'AcceptedCmp2', 'AcceptedCmp3',
-    'AcceptedCmp4', 'AcceptedCmp5', 'Response'
-]
-PLACE_COLS = [
-    'ID', 'NumWebPurchases', 'NumCatalogPurchases', 'NumStorePurchases',
-    'NumWebVisitsMonth'
-]
-
-COL_DEFINITIONS = {
-    "people": PEOPLE_COLS,
-    "products": PRODUCTS_COLS,
-    "promotion": PROMOTION_COLS,
-    "place": PLACE_COLS
+import tomllib
+
+from data_processing import PROCESSED_COLUMNS
+
+# Split definitions (columns, final k, clustering method and feature weights per split),
+# read from this TOML file. Set the SPLITS_CONFIG environment variable to use another file.
+SPLITS_CONFIG_PATH = os.environ.get('SPLITS_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'splits.toml'))
+ID_COLUMN = 'ID'
+SPLIT_KEYS = {'columns', 'k', 'method', 'weights'}
+
+
+def load_split_config(path=SPLITS_CONFIG_PATH):
+    """
+    Reads and checks the split definitions, see splits.toml for the format.
+
+    Returns:
+        dict: {split_name: {'columns', 'k', 'method', 'weights'}} in file order. 'columns'
+        starts with ID_COLUMN, 'k' is None when not set and 'method' defaults to 'kmeans'.
+    """
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+
+    splits = {}
+    for split_name, spec in config.get('splits', {}).items():
+        unknown = set(spec) - SPLIT_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys {sorted(unknown)} for split '{split_name}' in '{path}'.")
+        columns = spec.get('columns')
+        if not columns or not all(isinstance(col, str) for col in columns):
+            raise ValueError(f"Split '{split_name}' in '{path}' needs a list of column names.")
+        unknown = [col for col in columns if col != ID_COLUMN and col not in PROCESSED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown} for split '{split_name}' in '{path}'. "
+                             f"Choose from the processed columns {PROCESSED_COLUMNS}.")
+        duplicates = sorted({col for col in columns if columns.count(col) > 1})
+        if duplicates:
+            raise ValueError(f"Columns {duplicates} are listed more than once for split '{split_name}' in '{path}'.")
+        k = spec.get('k')
+        if not (k is None or k == 'stable' or (isinstance(k, int) and k >= 2)):
+            raise ValueError(f"k of split '{split_name}' in '{path}' must be a number >= 2 or \"stable\", got {k!r}.")
+        weights = {col: float(weight) for col, weight in spec.get('weights', {}).items()}
+        if set(weights) - set(columns):
+            raise ValueError(f"Weights for columns outside split '{split_name}': {sorted(set(weights) - set(columns))}.")
+        splits[split_name] = {
+            'columns': [ID_COLUMN] + [col for col in columns if col != ID_COLUMN],
+            'k': k, 'method': spec.get('method', 'kmeans'), 'weights': weights
+        }
+    if not splits:
+        raise ValueError(f"No splits defined in '{path}'.")
+    return splits
+
+
+SPLITS = load_split_config()
+COL_DEFINITIONS = {split_name: spec['columns'] for split_name, spec in SPLITS.items()}
+
+# Columnar storage backends for the split stage. Arrow IPC files are written
+# uncompressed so they can be memory-mapped on read.
+STORAGE_FORMATS = {
+    "arrow": "table.arrow",
+    "parquet": "table.parquet"
 }
 
-def split_by_marketing_4ps(df, output_dir):
+# Incremental updates append delta files next to the table (rows plus the IDs they
+# replace), resolved by ID on read. The table is rewritten with its deltas merged
+# once there are more than MAX_DELTA_FILES or they hold more than MAX_DELTA_FRACTION
+# of the table's rows, which bounds the read overhead.
+MAX_DELTA_FILES = 20
+MAX_DELTA_FRACTION = 0.1
+
+
+def split_by_marketing_4ps(df, output_dir, storage_format='arrow', export_csv=False):
+    """
+    Stores the dataframe once as a single columnar table for all splits in
+    COL_DEFINITIONS (the 4Ps and any extra segmentations from the split config).
+    Each split is a column view of that table, see `ColumnStore` and `load_split`,
+    so the number of splits does not change the work done here.
+    Set `export_csv=True` to additionally write one CSV per split.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    table_path = save_table(df, output_dir, storage_format=storage_format)
+
+    if export_csv:
+        store = ColumnStore(output_dir, storage_format=storage_format)
+        for split_name in COL_DEFINITIONS:
+            if not store.split_columns(split_name):
+                print(f"Warning: No columns found for split '{split_name}'. Skipping.")
+                continue
+
+            store.view(split_name).to_csv(os.path.join(output_dir, f"{split_name}_split.csv"), index=False)
+
+    print(f"Data split and saved to '{table_path}'.")
+
+
+def split_columns(split_name, available_columns):
+    """Returns the columns of a split that actually exist in `available_columns`."""
+    available = set(available_columns)
+    return [col for col in COL_DEFINITIONS[split_name] if col in available]
+
+
+def table_path(data_dir, storage_format='arrow'):
+    """Returns the path of the stored table in `data_dir` for the given format."""
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format '{storage_format}'. Choose from {list(STORAGE_FORMATS)}.")
+    return os.path.join(data_dir, STORAGE_FORMATS[storage_format])
+
+
+def save_table(df, output_dir, storage_format='arrow'):
     """
-    Splits the dataframe into four smaller dataframes based on the Marketing 4Ps,
-    using the globally defined COL_DEFINITIONS.
+    Writes the dataframe as one columnar table and returns its path.
+    Dtypes (including boolean one-hot columns and categoricals) are preserved.
     """
+    import pyarrow as pa
+
     os.makedirs(output_dir, exist_ok=True)
+    path = table_path(output_dir, storage_format)
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+
+    # Write next to the table and swap it in, so readers that still memory-map
+    # the old file (e.g. when a table is updated in place) keep a valid copy
+    tmp_path = f'{path}.tmp'
+    if storage_format == 'arrow':
+        import pyarrow.feather as feather
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    # The table now holds every row, earlier deltas are obsolete
+    for delta_path, ids_path in delta_paths(output_dir, storage_format):
+        os.remove(delta_path)
+        os.remove(ids_path)
+    return path
+
+
+def delta_paths(data_dir, storage_format='arrow'):
+    """Returns the (rows, replaced IDs) file pairs of the table's deltas, oldest first."""
+    if not os.path.isdir(data_dir):
+        return []
+    extension = os.path.splitext(table_path(data_dir, storage_format))[1]
+    names = sorted(name for name in os.listdir(data_dir) if name.startswith('delta_') and name.endswith(extension))
+    return [
+        (os.path.join(data_dir, name), os.path.join(data_dir, name[:-len(extension)] + '.ids.npy'))
+        for name in names
+    ]
+
+
+def _read_file(path, columns=None, storage_format='arrow'):
+    if storage_format == 'arrow':
+        import pyarrow.feather as feather
+        return feather.read_table(path, columns=columns, memory_map=True)
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=columns)
+
+
+def _parts(data_dir, storage_format='arrow'):
+    """
+    Yields (path, replaced) for the table and each of its deltas, where `replaced`
+    holds the IDs of rows that a later delta replaces or removes.
+    """
+    import numpy as np
+
+    deltas = delta_paths(data_dir, storage_format)
+    replaced = [np.load(ids_path) for _, ids_path in deltas]
+    paths = [table_path(data_dir, storage_format)] + [delta_path for delta_path, _ in deltas]
+    for i, path in enumerate(paths):
+        yield path, np.concatenate(replaced[i:]) if replaced[i:] else np.empty(0, dtype=np.int64)
+
+
+def _with_id(columns):
+    return columns if columns is None or ID_COLUMN in columns else list(columns) + [ID_COLUMN]
+
+
+def _current_rows(table, replaced):
+    """Drops the rows of `table` whose ID is in `replaced`."""
+    import numpy as np
+
+    if len(replaced) == 0:
+        return table
+    return table.filter(~np.isin(table[ID_COLUMN].to_numpy(), replaced))
+
+
+def _resolved_table(data_dir, columns=None, storage_format='arrow'):
+    """
+    Returns the stored table with its deltas applied, as an Arrow table. Without
+    deltas this is the (memory-mapped) table itself.
+    """
+    import pyarrow as pa
+
+    if not delta_paths(data_dir, storage_format):
+        return _read_file(table_path(data_dir, storage_format), columns, storage_format)
+    table = pa.concat_tables([
+        _current_rows(_read_file(path, _with_id(columns), storage_format), replaced)
+        for path, replaced in _parts(data_dir, storage_format)
+    ])
+    return table if columns is None else table.select(columns)
+
+
+def load_table(data_dir, columns=None, storage_format='arrow'):
+    """
+    Reads (a column projection of) the stored table back into a dataframe, with its
+    deltas applied. Arrow IPC tables are memory-mapped, so unselected columns are never read.
+    """
+    return _resolved_table(data_dir, columns, storage_format).to_pandas()
+
+
+def load_rows(data_dir, ids, columns=None, storage_format='arrow'):
+    """
+    Reads the current rows with the given IDs. Only the 'ID' column is scanned; of
+    the other columns just the matching rows are taken (Arrow tables are memory-mapped).
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    batches = []
+    for path, replaced in _parts(data_dir, storage_format):
+        table = _read_file(path, _with_id(columns), storage_format)
+        # Per record batch: taking from the whole table would combine its chunks (a full copy)
+        for batch in table.to_batches():
+            batch_ids = batch.column(ID_COLUMN).to_numpy()
+            rows = np.flatnonzero(np.isin(batch_ids, ids) & ~np.isin(batch_ids, replaced))
+            if len(rows):
+                batches.append(batch.take(pa.array(rows)))
+    table = pa.Table.from_batches(batches, schema=table.schema)
+    return (table if columns is None else table.select(columns)).to_pandas()
+
+
+def _merge_rows(df_rows, ids, data_dir, storage_format='arrow'):
+    """Rewrites the table with its deltas and `df_rows` merged in, replacing the rows with the given IDs."""
+    import numpy as np
+    import pandas as pd
+
+    table = load_table(data_dir, storage_format=storage_format)
+    kept = table[~table[ID_COLUMN].isin(ids)]
+    updated = pd.concat([kept, df_rows[table.columns]], ignore_index=True)
+    # concat turns categoricals with different categories into strings and mixes float32
+    # with float64; keep the stored (compact) types
+    for col in table.columns:
+        if isinstance(table[col].dtype, pd.CategoricalDtype):
+            updated[col] = updated[col].astype('category')
+        elif table[col].dtype == np.float32:
+            updated[col] = updated[col].astype(np.float32)
+    save_table(updated, data_dir, storage_format=storage_format)
+
+
+def append_rows(df_rows, ids, data_dir, storage_format='arrow'):
+    """
+    Replaces the rows with the given IDs in a stored table by `df_rows`, written as a
+    delta file of the changed rows only. IDs without a row in `df_rows` (e.g. customers
+    that became outliers) are removed. Rows are cast to the table's (compact) types.
+
+    The table is rewritten with everything merged instead once the deltas would pass
+    MAX_DELTA_FILES or MAX_DELTA_FRACTION, or when a row does not fit the stored type
+    of a column (e.g. a compact int16 column).
+
+    Returns:
+        int: The number of delta rows now stored next to the table (0 after a merge).
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    schema = table_schema(data_dir, storage_format)
+    try:
+        rows = pa.Table.from_pandas(df_rows[schema.names].reset_index(drop=True), preserve_index=False)
+        rows = rows.replace_schema_metadata(schema.metadata).cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        rows = None
+
+    deltas = delta_paths(data_dir, storage_format)
+    extension = os.path.splitext(table_path(data_dir, storage_format))[1]
+    delta_rows = sum(_file_num_rows(path, storage_format) for path, _ in deltas) + len(df_rows)
+    base_rows = _file_num_rows(table_path(data_dir, storage_format), storage_format)
+    if rows is None or len(deltas) + 1 > MAX_DELTA_FILES or delta_rows > MAX_DELTA_FRACTION * base_rows:
+        _merge_rows(df_rows, ids, data_dir, storage_format)
+        return 0
+
+    name = f"delta_{len(deltas) + 1:05d}"
+    delta_path = os.path.join(data_dir, name + extension)
+    tmp_path = f'{delta_path}.tmp'
+    if storage_format == 'arrow':
+        import pyarrow.feather as feather
+        feather.write_feather(rows, tmp_path, compression='uncompressed')
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(rows, tmp_path)
+    # The IDs go first: a delta without its IDs file is never listed
+    np.save(os.path.join(data_dir, name + '.ids.npy'), np.asarray(ids))
+    os.replace(tmp_path, delta_path)
+    # Mark the table as modified, so cached stages that wrote it count as outdated
+    os.utime(table_path(data_dir, storage_format))
+    return delta_rows
+
+
+def iter_table_batches(data_dir, columns=None, batch_size=100_000, storage_format='arrow'):
+    """
+    Yields the stored table (with its deltas applied) as dataframes of at most
+    `batch_size` rows, for out-of-core passes over tables larger than memory.
+    """
+    for path, replaced in _parts(data_dir, storage_format):
+        read_columns = columns if len(replaced) == 0 else _with_id(columns)
+        if storage_format == 'arrow':
+            import pyarrow.feather as feather
+            batches = feather.read_table(path, columns=read_columns, memory_map=True).to_batches(max_chunksize=batch_size)
+        else:
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=read_columns)
+        for batch in batches:
+            batch = _current_rows(batch, replaced)
+            if columns is not None:
+                batch = batch.select(columns)
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+
+def table_schema(data_dir, storage_format='arrow'):
+    """Returns the Arrow schema of the stored table without reading its data."""
+    import pyarrow as pa
+
+    path = table_path(data_dir, storage_format)
+    if storage_format == 'arrow':
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema
+    else:
+        import pyarrow.parquet as pq
+        return pq.read_schema(path)
+
+
+def _file_num_rows(path, storage_format='arrow'):
+    import pyarrow as pa
+
+    if storage_format == 'arrow':
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    else:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+
+
+def table_num_rows(data_dir, storage_format='arrow'):
+    """
+    Returns the number of rows of the stored table from its metadata, without reading
+    its data. With deltas, only the 'ID' columns are read to resolve replaced rows.
+    """
+    if delta_paths(data_dir, storage_format):
+        return _resolved_table(data_dir, [ID_COLUMN], storage_format).num_rows
+    return _file_num_rows(table_path(data_dir, storage_format), storage_format)
+
+
+def table_columns(data_dir, storage_format='arrow'):
+    """Returns the column names of the stored table without reading its data."""
+    return table_schema(data_dir, storage_format).names
+
+
+class ColumnStore:
+    """
+    A stored table opened once and shared by all split views. Arrow tables are
+    memory-mapped: the numeric columns of a view point into the mapped file, so
+    views cost no copy and worker processes share the pages. Boolean, string and
+    nullable columns are converted per view. Parquet tables, and tables with
+    deltas, are read per view, limited to the view's columns.
+    """
+
+    def __init__(self, data_dir, storage_format='arrow'):
+        self.data_dir = data_dir
+        self.path = table_path(data_dir, storage_format)
+        self.storage_format = storage_format
+        if storage_format == 'arrow' and not delta_paths(data_dir, storage_format):
+            import pyarrow.feather as feather
+            self._table = feather.read_table(self.path, memory_map=True)
+            self.columns = self._table.column_names
+        else:
+            self._table = None
+            self.columns = table_schema(data_dir, storage_format).names
+
+    def split_columns(self, split_name):
+        return split_columns(split_name, self.columns)
+
+    def select(self, columns):
+        """Returns the given columns as a dataframe, zero-copy where Arrow allows it."""
+        if self._table is not None:
+            table = self._table.select(columns)
+        else:
+            table = _resolved_table(self.data_dir, columns, self.storage_format)
+        return table.to_pandas(split_blocks=True)
+
+    def view(self, split_name, weights=None):
+        """One split as a dataframe view, with `weights` applied (see `apply_weights`)."""
+        return apply_weights(self.select(self.split_columns(split_name)), weights)
+
+    def views(self, split_names=None, weights=None):
+        """
+        Views of several splits (default: all in COL_DEFINITIONS) over the same table.
+
+        Args:
+            weights (dict): Optional {split_name: {column: factor}}.
+        """
+        weights = weights or {}
+        return {
+            split_name: self.view(split_name, weights.get(split_name))
+            for split_name in split_names or COL_DEFINITIONS
+        }
+
+
+def apply_weights(df, weights):
+    """
+    Multiplies the given columns by their weight, e.g. a split's feature weights
+    applied to its scaled columns. Only the weighted columns are copied.
+    """
+    if not weights:
+        return df
+    df = df.copy(deep=False)
+    for col, weight in weights.items():
+        if col in df.columns:
+            df[col] = df[col] * weight
+    return df
+
 
-    
-    for split_name, cols in COL_DEFINITIONS.items():
-        # Filter for columns that actually exist in the passed dataframe
-        cols_to_keep = [col for col in cols if col in df.columns]
-        
-        if not cols_to_keep:
-            print(f"Warning: No columns found for split '{split_name}'. Skipping.")
-            continue
-            
-        split_df = df[cols_to_keep]
-        split_df.to_csv(os.path.join(output_dir, f"{split_name}_split.csv"), index=False)
-
-    print(f"Data split and saved to '{output_dir}'.")
\ No newline at end of file
+def load_split(data_dir, split_name, storage_format='arrow', weights=None):
+    """Loads one split as a column view of the stored table, see `ColumnStore`."""
+    return ColumnStore(data_dir, storage_format=storage_format).view(split_name, weights)
@@ -0,0 +1,315 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Executor used by DistributedKMeans when none is given: 'local' (worker processes
+# on this machine, standing in for a cluster) or 'serial' (in-process, for debugging)
+DEFAULT_EXECUTOR = 'local'
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Rows per block when computing distances to the centers, bounds the temporary memory
+DISTANCE_BLOCK_ROWS = 65_536
+# k-means|| (Bahmani et al., 2012): candidates sampled per round, as a multiple of k,
+# and the number of sampling rounds
+OVERSAMPLING_FACTOR = 2.0
+INIT_ROUNDS = 5
+
+
+def _load_shard(shard):
+    return np.load(shard, mmap_mode='r') if isinstance(shard, str) else shard
+
+
+def _run_task(fn, shard, args):
+    return fn(_load_shard(shard), *args)
+
+
+class SerialExecutor:
+    """
+    Runs the map tasks in this process on views of the matrix. Same interface as
+    LocalProcessExecutor, for debugging and small data.
+    """
+
+    def __init__(self, n_workers=1):
+        self.n_workers = 1
+        self._source, self._shards = None, None
+
+    def scatter(self, X, n_shards=None):
+        """Splits X into contiguous row shards (views, no copies) and returns them."""
+        if X is not self._source:
+            self._source, self._shards = X, np.array_split(X, n_shards or 1)
+        return self._shards
+
+    def map(self, fn, shards, args=()):
+        """
+        Calls `fn(shard_rows, *args)` for every shard and returns the results in shard
+        order. `args` is one tuple for all shards or a list with one tuple per shard.
+        """
+        per_shard = args if isinstance(args, list) else [args] * len(shards)
+        return [_run_task(fn, shard, shard_args) for shard, shard_args in zip(shards, per_shard)]
+
+    def close(self):
+        self._source, self._shards = None, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalProcessExecutor(SerialExecutor):
+    """
+    Stand-in for a cluster on one machine: shards are written once as .npy files
+    that the worker processes memory-map, and map tasks run in a process pool.
+    Only the task arguments (centers) and the small per-shard results travel
+    between processes, as they would between nodes. A multi-node backend only has
+    to provide `scatter`, `map` and `close`.
+    """
+
+    def __init__(self, n_workers=DEFAULT_WORKERS, shard_dir=None):
+        self.n_workers = n_workers
+        self._pool = ProcessPoolExecutor(max_workers=n_workers)
+        self._shard_dir = tempfile.mkdtemp(prefix='kmeans_shards_', dir=shard_dir)
+        self._source, self._shards = None, None
+
+    def scatter(self, X, n_shards=None):
+        """Writes X as `n_shards` (default: one per worker) shard files and returns their paths."""
+        if X is self._source:
+            return self._shards
+        for path in self._shards or []:
+            os.remove(path)
+        self._shards = []
+        for i, rows in enumerate(np.array_split(X, n_shards or self.n_workers)):
+            path = os.path.join(self._shard_dir, f'shard_{i:05d}.npy')
+            np.save(path, np.ascontiguousarray(rows))
+            self._shards.append(path)
+        self._source = X
+        return self._shards
+
+    def map(self, fn, shards, args=()):
+        per_shard = args if isinstance(args, list) else [args] * len(shards)
+        return list(self._pool.map(_run_task, [fn] * len(shards), shards, per_shard))
+
+    def close(self):
+        self._pool.shutdown()
+        shutil.rmtree(self._shard_dir, ignore_errors=True)
+        self._source, self._shards = None, None
+
+
+EXECUTORS = {
+    'serial': SerialExecutor,
+    'local': LocalProcessExecutor,
+}
+
+
+def make_executor(name=DEFAULT_EXECUTOR, n_workers=DEFAULT_WORKERS):
+    """Creates one of the EXECUTORS; use it as a context manager so its workers and shards are released."""
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{name}'. Choose from {list(EXECUTORS)}.")
+    return EXECUTORS[name](n_workers=n_workers)
+
+
+# Map tasks. Each runs on one shard and returns a small, reducible result.
+
+def _nearest(X, centers):
+    """Index of and squared distance to the nearest center for every row, in row blocks."""
+    labels = np.empty(len(X), dtype=np.int64)
+    distances = np.empty(len(X))
+    center_norms = (centers ** 2).sum(axis=1)
+    for start in range(0, len(X), DISTANCE_BLOCK_ROWS):
+        block = np.asarray(X[start:start + DISTANCE_BLOCK_ROWS], dtype=np.float64)
+        d2 = (block ** 2).sum(axis=1)[:, None] - 2 * block @ centers.T + center_norms
+        labels[start:start + len(block)] = d2.argmin(axis=1)
+        distances[start:start + len(block)] = np.maximum(d2.min(axis=1), 0.0)
+    return labels, distances
+
+
+def _shard_moments(X):
+    X = np.asarray(X, dtype=np.float64)
+    return len(X), X.sum(axis=0), (X ** 2).sum(axis=0)
+
+
+def _shard_rows(X, rows):
+    return np.asarray(X[rows], dtype=np.float64)
+
+
+def _shard_cost(X, centers):
+    return _nearest(X, centers)[1].sum()
+
+
+def _shard_sample(X, centers, factor, seed):
+    """k-means|| step: keeps each row with probability min(1, factor * d^2(row, centers))."""
+    _, distances = _nearest(X, centers)
+    keep = np.random.default_rng(seed).random(len(X)) < factor * distances
+    return np.asarray(X[keep], dtype=np.float64)
+
+
+def _shard_counts(X, centers):
+    labels, _ = _nearest(X, centers)
+    return np.bincount(labels, minlength=len(centers))
+
+
+def _shard_partial_sums(X, centers):
+    """Lloyd map step: per-center sums and counts of the assigned rows, and their inertia."""
+    labels, distances = _nearest(X, centers)
+    sums = np.column_stack([
+        np.bincount(labels, weights=X[:, j], minlength=len(centers)) for j in range(X.shape[1])
+    ])
+    return sums, np.bincount(labels, minlength=len(centers)), distances.sum()
+
+
+def _shard_assign(X, centers):
+    labels, distances = _nearest(X, centers)
+    return labels, distances.sum()
+
+
+def _random_rows(executor, shards, sizes, count, rng):
+    """Draws `count` rows uniformly from the sharded matrix."""
+    picked = np.sort(rng.choice(sizes.sum(), size=count, replace=count > sizes.sum()))
+    offsets = np.r_[0, np.cumsum(sizes)]
+    shard_of = np.searchsorted(offsets, picked, side='right') - 1
+    requests = [(picked[shard_of == i] - offsets[i],) for i in range(len(shards))]
+    return np.vstack(executor.map(_shard_rows, shards, requests))
+
+
+def kmeans_parallel_init(executor, shards, sizes, n_clusters, random_state=42,
+                         oversampling=OVERSAMPLING_FACTOR, rounds=INIT_ROUNDS):
+    """
+    k-means|| initialization: starts from one random row, then for `rounds` rounds
+    every shard samples rows with probability proportional to their squared
+    distance to the candidates (about oversampling * k rows per round). The
+    candidates are weighted by the rows nearest to them and reduced to k centers
+    with k-means++ on this machine.
+    """
+    from sklearn.cluster import KMeans
+
+    rng = np.random.default_rng(random_state)
+    candidates = _random_rows(executor, shards, sizes, 1, rng)
+    for round_ in range(rounds):
+        cost = sum(executor.map(_shard_cost, shards, (candidates,)))
+        if cost == 0:
+            break
+        factor = oversampling * n_clusters / cost
+        seeds = [([random_state, round_, i],) for i in range(len(shards))]
+        sampled = executor.map(_shard_sample, shards, [(candidates, factor) + seed for seed in seeds])
+        candidates = np.vstack([candidates] + sampled)
+
+    if len(candidates) < n_clusters: # e.g. fewer distinct rows than clusters
+        candidates = np.vstack([candidates, _random_rows(executor, shards, sizes, n_clusters - len(candidates), rng)])
+    weights = np.sum(executor.map(_shard_counts, shards, (candidates,)), axis=0)
+    local = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state)
+    return local.fit(candidates, sample_weight=weights).cluster_centers_
+
+
+def lloyd(executor, shards, centers, tol, max_iter=300):
+    """
+    Distributed Lloyd iterations: the map step returns per-shard center sums and
+    counts, the reduce step adds them up and divides. Stops when the squared center
+    shift is at most `tol` (the convergence rule of scikit-learn's KMeans).
+    A center that loses all its rows keeps its position.
+
+    Returns:
+        tuple: (centers, n_iter)
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    for n_iter in range(1, max_iter + 1):
+        partials = executor.map(_shard_partial_sums, shards, (centers,))
+        sums = np.sum([p[0] for p in partials], axis=0)
+        counts = np.sum([p[1] for p in partials], axis=0)
+        new_centers = centers.copy()
+        filled = counts > 0
+        new_centers[filled] = sums[filled] / counts[filled, None]
+        shift = ((new_centers - centers) ** 2).sum()
+        centers = new_centers
+        if shift <= tol:
+            break
+    return centers, n_iter
+
+
+class DistributedKMeans:
+    """
+    K-means over a sharded matrix through a pluggable executor (see EXECUTORS),
+    with k-means|| initialization and map/reduce Lloyd iterations. Mirrors the
+    parts of scikit-learn's KMeans the pipeline uses (`fit_predict`, `predict`,
+    `cluster_centers_`, `inertia_`, `n_iter_`) so it can serve as a backend.
+
+    Args:
+        executor (str or executor): An EXECUTORS name (a new executor per fit) or an
+            open executor, which keeps its shards across fits of the same matrix
+            (as in a k sweep).
+        n_shards (int): Shards to split the rows into (default: one per worker).
+        init (str or array): 'k-means||' or an array of initial centers of shape
+            (n_clusters, n_features).
+        n_init (int): Initializations to run; the lowest inertia wins.
+    """
+
+    def __init__(self, n_clusters=8, executor=DEFAULT_EXECUTOR, n_workers=DEFAULT_WORKERS, n_shards=None,
+                 init='k-means||', n_init=1, max_iter=300, tol=1e-4, oversampling=OVERSAMPLING_FACTOR,
+                 init_rounds=INIT_ROUNDS, random_state=42):
+        self.n_clusters = n_clusters
+        self.executor = executor
+        self.n_workers = n_workers
+        self.n_shards = n_shards
+        self.init = init
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.tol = tol
+        self.oversampling = oversampling
+        self.init_rounds = init_rounds
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        self.fit_predict(X)
+        return self
+
+    def fit_predict(self, X, y=None):
+        if isinstance(self.executor, str):
+            with make_executor(self.executor, self.n_workers) as executor:
+                return self._fit(executor, X)
+        return self._fit(self.executor, X)
+
+    def _check_params(self, X):
+        if isinstance(self.init, str):
+            if self.init != 'k-means||':
+                raise ValueError(f"init must be 'k-means||' or an array of centers, got '{self.init}'.")
+        elif np.shape(self.init) != (self.n_clusters, X.shape[1]):
+            raise ValueError(
+                f"The shape of the initial centers {np.shape(self.init)} does not match "
+                f"({self.n_clusters}, {X.shape[1]}) for n_clusters={self.n_clusters} and {X.shape[1]} features."
+            )
+        if self.n_clusters < 1:
+            raise ValueError(f"n_clusters must be at least 1, got {self.n_clusters}.")
+        if self.n_clusters > len(X):
+            raise ValueError(f"n_samples={len(X)} should be >= n_clusters={self.n_clusters}.")
+
+    def _fit(self, executor, X):
+        self._check_params(X)
+        shards = executor.scatter(X, self.n_shards)
+        moments = executor.map(_shard_moments, shards)
+        sizes = np.array([m[0] for m in moments])
+        n = sizes.sum()
+        # scikit-learn's tolerance: relative to the mean variance of the features
+        mean = np.sum([m[1] for m in moments], axis=0) / n
+        variance = np.sum([m[2] for m in moments], axis=0) / n - mean ** 2
+        tol = float(np.mean(variance)) * self.tol
+
+        best = None
+        for run in range(1 if not isinstance(self.init, str) else self.n_init):
+            if isinstance(self.init, str):
+                init = kmeans_parallel_init(executor, shards, sizes, self.n_clusters, self.random_state + run,
+                                            self.oversampling, self.init_rounds)
+            else:
+                init = self.init
+            centers, n_iter = lloyd(executor, shards, init, tol, self.max_iter)
+            assigned = executor.map(_shard_assign, shards, (centers,))
+            inertia = sum(a[1] for a in assigned)
+            if best is None or inertia < best[2]:
+                best = (centers, np.concatenate([a[0] for a in assigned]), inertia, n_iter)
+
+        self.cluster_centers_, self.labels_, self.inertia_, self.n_iter_ = best
+        return self.labels_
+
+    def predict(self, X):
+        return _nearest(np.asarray(X), self.cluster_centers_)[0]
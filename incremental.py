@@ -0,0 +1,192 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import data_processing
+import data_split
+import model_registry
+
+# Running statistics of the fitted population, stored next to the models
+STATE_FILE = 'running_stats.joblib'
+# Largest tolerated shift of a scaled column's mean or standard deviation (in
+# units of the fitted standard deviation) before the models are refitted
+DRIFT_THRESHOLD = 0.1
+
+
+class RunningMoments:
+    """
+    Per-column count, mean and variance that rows can be added to and removed from.
+
+    Sums are taken around a fixed shift (the initial mean), which keeps the
+    variance accurate for columns with large values such as 'Income'.
+    """
+
+    def __init__(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        self.shift = X.mean(axis=0)
+        self.n = 0
+        self.s1 = np.zeros(X.shape[1])
+        self.s2 = np.zeros(X.shape[1])
+        self.add(X)
+
+    def add(self, X):
+        D = np.asarray(X, dtype=np.float64) - self.shift
+        self.n += len(D)
+        self.s1 += D.sum(axis=0)
+        self.s2 += (D ** 2).sum(axis=0)
+
+    def remove(self, X):
+        D = np.asarray(X, dtype=np.float64) - self.shift
+        self.n -= len(D)
+        self.s1 -= D.sum(axis=0)
+        self.s2 -= (D ** 2).sum(axis=0)
+
+    @property
+    def mean(self):
+        return self.shift + self.s1 / self.n
+
+    @property
+    def var(self):
+        """Population variance, as used by StandardScaler."""
+        return np.maximum(self.s2 / self.n - (self.s1 / self.n) ** 2, 0.0)
+
+
+class RunningMedian:
+    """Exact median of a multiset of values, kept as a sorted array."""
+
+    def __init__(self, values):
+        self.values = np.sort(np.asarray(values, dtype=np.float64))
+
+    def add(self, values):
+        values = np.sort(np.asarray(values, dtype=np.float64))
+        self.values = np.insert(self.values, np.searchsorted(self.values, values), values)
+
+    def remove(self, values):
+        values = np.sort(np.asarray(values, dtype=np.float64))
+        if len(values) == 0:
+            return
+        positions = np.searchsorted(self.values, values)
+        # Equal values map to the same position; shift repeats onto the following copies
+        first = np.r_[True, values[1:] != values[:-1]]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(values)), 0))
+        positions += np.arange(len(values)) - group_start
+        self.values = np.delete(self.values, positions)
+
+    def median(self):
+        return float(np.median(self.values)) if len(self.values) else float('nan')
+
+
+def build_state(raw_incomes, df_unscaled, scaled_columns, reference_date):
+    """
+    Creates the running statistics of a freshly fitted population.
+
+    Args:
+        raw_incomes (pd.Series): Raw 'Income' (with missing values) indexed by 'ID',
+            for every raw customer, including the ones `processing` removes.
+        df_unscaled (pd.DataFrame): The encoded, unscaled frame the scaler was fitted on.
+        scaled_columns (list): The columns the scaler was fitted on.
+        reference_date (pd.Timestamp): The date 'Age' and 'Days_Enrolled' refer to.
+    """
+    return {
+        'raw_incomes': raw_incomes.astype(np.float64),
+        'income_median': RunningMedian(raw_incomes.dropna().to_numpy()),
+        'scaled_columns': list(scaled_columns),
+        'moments': RunningMoments(df_unscaled[list(scaled_columns)]),
+        'reference_date': pd.Timestamp(reference_date),
+        'n_updates': 0,
+    }
+
+
+def save_state(state, registry_dir=model_registry.REGISTRY_DIR):
+    os.makedirs(registry_dir, exist_ok=True)
+    joblib.dump(state, os.path.join(registry_dir, STATE_FILE))
+
+
+def load_state(registry_dir=model_registry.REGISTRY_DIR):
+    path = os.path.join(registry_dir, STATE_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No running statistics found in '{registry_dir}'. Run the full pipeline first.")
+    return joblib.load(path)
+
+
+def drift(state, preprocessing):
+    """
+    Returns how far the population has moved away from the fitted scaler: the
+    largest change of a column mean, standard deviation or the income median,
+    in units of the fitted standard deviation.
+    """
+    scaler = preprocessing['scaler']
+    moments = state['moments']
+    mean_shift = np.abs(moments.mean - scaler.mean_) / scaler.scale_
+    std_shift = np.abs(np.sqrt(moments.var) / scaler.scale_ - 1)
+    income_scale = scaler.scale_[state['scaled_columns'].index('Income')]
+    median_shift = abs(state['income_median'].median() - preprocessing['income_median']) / income_scale
+    return float(max(mean_shift.max(), std_shift.max(), median_shift))
+
+
+def apply_delta(df_delta, lookup_dir, unscaled_dir, scaled_dir, labels_dir,
+                registry_dir=model_registry.REGISTRY_DIR, storage_format='arrow', drift_threshold=DRIFT_THRESHOLD,
+                compact=False):
+    """
+    Applies a batch of new and changed customers (raw format, keyed on 'ID') to the
+    stored datasets without reprocessing the whole population.
+
+    Only the delta rows are processed, encoded, scaled and scored. The processed
+    lookup table, both split tables and the label table are updated by 'ID', with
+    the changed rows appended as delta files (see `data_split.append_rows`), so an
+    update reads and writes the delta rather than the whole population. The
+    running mean/variance of the scaled columns and the income median are
+    updated by removing the old version of each changed customer and adding
+    the new one. The scaler and models stay fixed between refits, so existing
+    labels keep their meaning.
+
+    Returns:
+        tuple: (labels, drift, needs_refit), where `labels` holds the new labels of
+        the changed customers and `needs_refit` is True once drift exceeds the threshold.
+    """
+    print(f"--- Applying delta of {len(df_delta)} customers ---")
+    registry = model_registry.load_registry(registry_dir)
+    preprocessing = registry['preprocessing']
+    state = load_state(registry_dir)
+
+    df_delta = df_delta.drop_duplicates(subset='ID', keep='last')
+    ids = df_delta['ID'].to_numpy()
+    known = np.isin(ids, state['raw_incomes'].index)
+    print(f"{(~known).sum()} new and {known.sum()} changed customers.")
+
+    # Income median over all raw customers, as in the full pipeline
+    new_incomes = df_delta.set_index('ID')['Income'].astype(np.float64)
+    state['income_median'].remove(state['raw_incomes'].reindex(ids[known]).dropna().to_numpy())
+    state['income_median'].add(new_incomes.dropna().to_numpy())
+    state['raw_incomes'] = pd.concat([state['raw_incomes'].drop(ids[known]), new_incomes])
+    income_median = state['income_median'].median()
+
+    df_processed = data_processing.processing(
+        df_delta, income_median=income_median, verbose=False, reference_date=state['reference_date'], compact=compact
+    )
+    df_unscaled = model_registry.encode_features(df_processed, preprocessing)
+    df_scaled = model_registry.scale_features(df_unscaled, preprocessing)
+
+    # Running moments: take out the stored version of changed customers, add the new rows
+    scaled_columns = state['scaled_columns']
+    stored = data_split.load_rows(unscaled_dir, ids, columns=scaled_columns, storage_format=storage_format)
+    state['moments'].remove(stored)
+    state['moments'].add(df_unscaled[scaled_columns])
+
+    for data_dir, df_rows in [(lookup_dir, df_processed), (unscaled_dir, df_unscaled), (scaled_dir, df_scaled)]:
+        delta_rows = data_split.append_rows(df_rows, ids, data_dir, storage_format=storage_format)
+    print(f"Updated stored datasets by ID. Population: {state['moments'].n} customers, "
+          f"{delta_rows} rows in delta files.")
+
+    labels = model_registry.predict_splits(df_scaled, registry)
+    data_split.append_rows(labels, ids, labels_dir, storage_format=storage_format)
+
+    state['n_updates'] += 1
+    save_state(state, registry_dir)
+    current_drift = drift(state, preprocessing)
+    needs_refit = current_drift > drift_threshold
+    print(f"Assigned clusters to {len(labels)} customers. Drift: {current_drift:.3f} "
+          f"(threshold {drift_threshold}){', refit required' if needs_refit else ''}.")
+    return labels, current_drift, needs_refit
@@ -0,0 +1,209 @@
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+# Where traces and profiles are written by default
+TRACE_DIR = 'traces'
+TRACE_FORMATS = ('chrome', 'json')
+# Opt-in profiling without code changes: PIPELINE_PROFILE=all or a comma-separated list of
+# stage names (a name also matches its per-split variants, e.g. 'evaluate_k_range').
+PROFILE_ENV_VAR = 'PIPELINE_PROFILE'
+PROFILE_DIR_ENV_VAR = 'PIPELINE_PROFILE_DIR'
+# How often the memory sampler polls the resident set size during a stage
+RSS_SAMPLE_INTERVAL = 0.01
+
+_enabled = False
+_events = []
+_local = threading.local()
+_profiler_active = False
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """Returns the current resident set size in MB (the peak so far where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+
+class RssSampler(threading.Thread):
+    """Polls the resident set size of this process to find the peak while it runs."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = self.start_rss = current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb())
+        return self.peak
+
+
+def configure(enabled=True):
+    """Turns stage tracing on or off for this process."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def frame_shape(df):
+    """Returns the row and column count of a dataframe (or array) for stage annotations."""
+    shape = getattr(df, 'shape', None)
+    if shape is None:
+        return {}
+    return {'rows': int(shape[0]), 'columns': int(shape[1]) if len(shape) > 1 else 1}
+
+
+def _profile_requested(name):
+    requested = os.environ.get(PROFILE_ENV_VAR, '').strip()
+    if not requested:
+        return False
+    if requested == 'all':
+        return True
+    base_name = name.split('[', 1)[0]
+    return any(part.strip() in (name, base_name) for part in requested.split(','))
+
+
+def _profile_path(name):
+    profile_dir = os.environ.get(PROFILE_DIR_ENV_VAR, os.path.join(TRACE_DIR, 'profiles'))
+    os.makedirs(profile_dir, exist_ok=True)
+    safe_name = name.replace('[', '_').replace(']', '')
+    return os.path.join(profile_dir, f'{safe_name}.{os.getpid()}.prof')
+
+
+@contextlib.contextmanager
+def stage(name, **attrs):
+    """
+    Records one pipeline stage: start time, wall and CPU time, peak RSS and any
+    attributes such as row/column counts in and out.
+
+    The yielded dict collects attributes while the stage runs; `annotate` adds
+    to it from code that does not hold a reference. If the stage is named in
+    the PIPELINE_PROFILE environment variable, it also runs under cProfile and
+    the stats are saved to a .prof file (view with `python -m pstats` or snakeviz).
+    """
+    global _profiler_active
+    record = dict(attrs)
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    profiler = None
+    if _profile_requested(name) and not _profiler_active:
+        # Only one cProfile can run at a time, so nested stages are covered by the outer one
+        profiler, _profiler_active = cProfile.Profile(), True
+
+    if not _enabled and profiler is None:
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+        return
+
+    sampler = RssSampler() if _enabled else None
+    if sampler is not None:
+        sampler.start()
+    start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+    stack.append(record)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiler_active = False
+            record['profile'] = _profile_path(name)
+            profiler.dump_stats(record['profile'])
+        stack.pop()
+        if sampler is not None:
+            _events.append({
+                'name': name,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'start': start,
+                'wall_s': time.perf_counter() - wall,
+                'cpu_s': time.process_time() - cpu,
+                'rss_start_mb': sampler.start_rss,
+                'peak_rss_mb': sampler.stop(),
+                **record
+            })
+
+
+def annotate(**values):
+    """Adds attributes to the innermost running stage (no-op outside of a stage)."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].update(values)
+
+
+def collect():
+    """Returns the events recorded so far in this process and clears them."""
+    events = list(_events)
+    _events.clear()
+    return events
+
+
+def extend(events):
+    """Adds events recorded in another process, e.g. a split worker."""
+    _events.extend(events)
+
+
+def _to_chrome(events):
+    """Converts stage events to the Chrome trace-event format (chrome://tracing, Perfetto)."""
+    keys = {'name', 'pid', 'tid', 'start', 'wall_s'}
+    trace_events = []
+    for event in events:
+        trace_events.append({
+            'name': event['name'], 'cat': 'stage', 'ph': 'X',
+            'ts': event['start'] * 1e6, 'dur': event['wall_s'] * 1e6,
+            'pid': event['pid'], 'tid': event['tid'],
+            'args': {key: value for key, value in event.items() if key not in keys}
+        })
+        trace_events.append({
+            'name': 'peak_rss_mb', 'ph': 'C', 'ts': (event['start'] + event['wall_s']) * 1e6,
+            'pid': event['pid'], 'args': {'MB': event['peak_rss_mb']}
+        })
+    return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+
+def write_trace(path, trace_format='chrome'):
+    """
+    Writes all recorded events to `path`.
+
+    Args:
+        trace_format (str): 'chrome' for a trace-event file that opens in
+            chrome://tracing or ui.perfetto.dev, 'json' for a plain list of stage records.
+    """
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError(f"Unknown trace format '{trace_format}'. Choose from {list(TRACE_FORMATS)}.")
+    events = sorted(_events, key=lambda event: event['start'])
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(_to_chrome(events) if trace_format == 'chrome' else events, f, indent=1, default=str)
+    print(f"Pipeline trace with {len(events)} stages saved to '{path}'.")
+    return path
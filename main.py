@@ -1,87 +1,465 @@
+import argparse
 import os
+import joblib
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
 import data_loader
 import data_processing
 import data_split
-import data_clustering
+import scheduler
+import model_registry
+import report_writer
 import EDA as eda
-from analyze_clusters import analyze_and_interpret_clusters
-from data_split import COL_DEFINITIONS
+import incremental
+import instrumentation
+from instrumentation import frame_shape
+from analyze_clusters import analyze_and_interpret_clusters, report_columns
+from data_split import COL_DEFINITIONS, SPLITS
+from stage_cache import StageCache
+# data_clustering and projection import scikit-learn and matplotlib (about 2 s),
+# so they are only imported by the commands that cluster. The modules above
+# import their plotting, scikit-learn and openpyxl dependencies on first use.
+# Check with `python benchmark.py startup` or `python -X importtime main.py --help`.
 
 # Define constants for paths
 RAW_DATA_PATH = '00_raw_data/marketing_campaign.csv'
 SPLIT_DATA_DIR = '02_data_split'
 REPORTS_DIR = '03_reports_and_results'
 REPORTS_DIR_EDA = os.path.join(REPORTS_DIR, 'charts')
+CLUSTER_PROFILES_DIR = os.path.join(REPORTS_DIR, 'cluster_profiles')
 
-def main():
-    print("Starting Customer Personality Cluster Pipeline")
-    
-    # Ensure all needed directories exist
-    os.makedirs(SPLIT_DATA_DIR, exist_ok=True)
-    os.makedirs(REPORTS_DIR_EDA, exist_ok=True)
+# Cluster report format: 'xlsx' (streamed workbook), 'parquet', 'csv' or 'json'
+REPORT_FORMAT = 'xlsx'
+
+# Stage cache: results are reused when a stage's inputs, parameters and code are unchanged
+USE_STAGE_CACHE = True
+STAGE_CACHE_DIR = '.pipeline_cache'
+STAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Storage for the 4P splits: 'arrow' (memory-mapped) or 'parquet'.
+# Set EXPORT_SPLIT_CSV to also write the per-split CSV files.
+SPLIT_STORAGE_FORMAT = 'arrow'
+EXPORT_SPLIT_CSV = False
+LOOKUP_DIR = os.path.join(SPLIT_DATA_DIR, 'lookup')
+UNSCALED_DIR = os.path.join(SPLIT_DATA_DIR, 'unscaled')
+SCALED_DIR = os.path.join(SPLIT_DATA_DIR, 'scaled')
+# Cluster label of every customer per split, updated by ID in incremental mode
+LABELS_DIR = os.path.join(SPLIT_DATA_DIR, 'labels')
+# What the `split` command needs from `process`: raw incomes and the reference date
+PROCESSING_STATE_PATH = os.path.join(SPLIT_DATA_DIR, 'processing_state.joblib')
+
+# Compact frames: typed raw columns, integers downcast to the smallest type (e.g. int8
+# flags), categorical strings and float32 scaled columns for the clustering matrices
+COMPACT_FRAMES = True
+
+# Rows per chunk when streaming the raw file through processing (`--chunksize`). None
+# loads the raw file at once. Streamed, the raw frame is never held as a whole; the
+# processed frame is still built in memory for encoding, scaling and splitting.
+PROCESSING_CHUNKSIZE = None
+
+# Summarize the raw file and draw the EDA charts from one-pass mergeable sketches
+# (sketches.py) of chunks instead of the whole frame. Quantiles, histograms and
+# boxplots become approximate; memory is bounded by the chunk size.
+SKETCH_EDA = False
+
+# The splits, their final k (None uses the suggested k, 'stable' the k recommended by
+# the stability step), clustering backend (see data_clustering.CLUSTERING_BACKENDS) and
+# feature weights are defined in splits.toml, see data_split.load_split_config
+# PCA is fitted once per split and shared by the k sweep, the clustering and the plots.
+# Solver: 'auto', 'exact', 'randomized' or 'incremental', see projection.PCA_SOLVERS.
+# 'incremental', and 'auto' above projection.OUT_OF_CORE_MIN_ROWS rows, fit batch by
+# batch from the stored split table instead of the split in memory.
+PCA_COMPONENTS = 2
+PCA_SOLVER = 'auto'
+# Silhouette for the k sweep and the final clustering: 'auto' (exact up to
+# data_clustering.EXACT_SILHOUETTE_MAX_ROWS rows, a sampled estimate with a 95% error
+# bound above), 'exact', 'sampled' or 'simplified'; and the parallel jobs of the k sweep
+SILHOUETTE_METHOD = 'auto'
+K_JOBS = max(1, (os.cpu_count() or 1) // scheduler.DEFAULT_MAX_WORKERS)
+
+FINAL_K_VALUES = {split_name: spec['k'] for split_name, spec in SPLITS.items()}
+CLUSTER_METHODS = {split_name: spec['method'] for split_name, spec in SPLITS.items()}
+FEATURE_WEIGHTS = {split_name: spec['weights'] for split_name, spec in SPLITS.items()}
+
+# Stability step (stability.py): subsample clusterings per k, compared by adjusted Rand
+# index, and their worker processes per split (the splits already run in parallel)
+STABILITY_RUNS = 20
+STABILITY_JOBS = max(1, (os.cpu_count() or 1) // scheduler.DEFAULT_MAX_WORKERS)
+
+# Number of worker processes for the per-split pipelines (1 = sequential)
+MAX_WORKERS = scheduler.DEFAULT_MAX_WORKERS
+
+# Stage trace (timings, peak memory, row counts, KMeans stats): 'chrome' or 'json'.
+# Set PIPELINE_PROFILE=all (or stage names) in the environment to also cProfile stages.
+TRACE_ENABLED = True
+TRACE_FORMAT = 'chrome'
+TRACE_PATH = os.path.join(instrumentation.TRACE_DIR, 'pipeline_trace.json')
+
+# Steps of the per-split pipeline, named after the commands that run them. `run` leaves
+# out the optional steps, except 'stability' for splits whose final k is 'stable'.
+SPLIT_STEPS = ('evaluate-k', 'cluster', 'report')
+OPTIONAL_SPLIT_STEPS = ('stability',)
+
+def process_split(split_name, final_k, method, scaled_dir, unscaled_dir, lookup_dir, registry_dir, cache_dir, use_cache,
+                  labels_dir=LABELS_DIR, steps=SPLIT_STEPS, weights=None):
+    """
+    Evaluates k, clusters and analyzes a single split. `weights` are the split's
+    feature weights, applied to its scaled columns.
+    Splits are independent of each other, so this runs as one task per split.
+
+    `steps` selects a subset of SPLIT_STEPS and OPTIONAL_SPLIT_STEPS. Without 'cluster',
+    the 'report' step uses the labels stored in `labels_dir` by an earlier run.
+
+    Returns:
+        pd.DataFrame: The 'ID' and 'Cluster' of every customer, or None if the split was not clustered.
+    """
+    print(f"\n--- Processing '{split_name}' split ---")
+    cache = StageCache(cache_dir, max_bytes=STAGE_CACHE_MAX_BYTES, enabled=use_cache)
+
+    df_split_scaled = data_split.load_split(scaled_dir, split_name, storage_format=SPLIT_STORAGE_FORMAT, weights=weights)
+    cluster_labels = None
+
+    if 'evaluate-k' in steps or 'cluster' in steps or 'stability' in steps:
+        import data_clustering
+        import projection
+        import stability
+
+        # Large splits (and the 'incremental' solver) are fitted batch by batch from the stored
+        # table. The split view then only keys the cache: it maps the Arrow file, nothing is loaded.
+        out_of_core = projection.fits_out_of_core(PCA_SOLVER, data_split.table_num_rows(scaled_dir, SPLIT_STORAGE_FORMAT))
+        if out_of_core:
+            fit, inputs, salt = projection.fit_projection_from_table, {}, {'table': df_split_scaled}
+            fit_params = {'data_dir': scaled_dir, 'storage_format': SPLIT_STORAGE_FORMAT, 'weights': weights}
+        else:
+            fit, inputs, salt = projection.fit_projection, {'df': df_split_scaled}, None
+            fit_params = {'solver': PCA_SOLVER}
+        with instrumentation.stage(f'projection[{split_name}]', input=frame_shape(df_split_scaled), solver=PCA_SOLVER,
+                                   out_of_core=out_of_core) as rec:
+            split_projection = cache.run(
+                f'projection[{split_name}]', fit, inputs=inputs,
+                params={'split_name': split_name, 'n_components': PCA_COMPONENTS, **fit_params}, salt=salt,
+                outputs=[os.path.join(projection.REPORTS_PCA_DIR, f'{split_name}_explained_variance.csv')]
+            )
+            if split_projection is not None:
+                rec['explained_variance_ratio'] = split_projection['explained_variance_ratio'].tolist()
+
+        # The cluster step needs the recommended k when the final k is 'stable'
+        if 'stability' in steps or final_k == 'stable':
+            with instrumentation.stage(f'evaluate_stability[{split_name}]', input=frame_shape(df_split_scaled), runs=STABILITY_RUNS):
+                stable_k = cache.run(
+                    f'evaluate_stability[{split_name}]', stability.evaluate_stability,
+                    inputs={'df': df_split_scaled, 'projection': split_projection},
+                    params={'split_name': split_name, 'method': method, 'n_runs': STABILITY_RUNS, 'n_jobs': STABILITY_JOBS},
+                    outputs=[os.path.join(stability.REPORTS_STABILITY_DIR, f'{split_name}_stability.csv')]
+                )
+                instrumentation.annotate(stable_k=stable_k)
+            if final_k == 'stable':
+                final_k = stable_k
+            print(f"Stability recommendation for '{split_name}' k = {stable_k}. Using final k = {final_k}.")
+
+        # The cluster step needs the suggested k when no final k is set
+        if 'evaluate-k' in steps or final_k is None:
+            with instrumentation.stage(f'evaluate_k_range[{split_name}]', input=frame_shape(df_split_scaled)):
+                # A split clustered with the distributed backend also evaluates k with it
+                k_params = {'split_name': split_name, 'silhouette': SILHOUETTE_METHOD, 'n_jobs': K_JOBS}
+                if method == 'distributed':
+                    k_params['algorithm'] = 'distributed'
+                suggested_k = cache.run(
+                    f'evaluate_k_range[{split_name}]', data_clustering.evaluate_k_range,
+                    inputs={'df': df_split_scaled, 'projection': split_projection}, params=k_params,
+                    outputs=[os.path.join(data_clustering.REPORTS_K_EVAL_DIR, f'{split_name}_k_evaluation.png')]
+                )
+                instrumentation.annotate(suggested_k=suggested_k)
+            if final_k is None:
+                final_k = suggested_k # No predefined k, fall back to the suggested one
+            print(f"Automated suggestion for '{split_name}' k = {suggested_k}. Using final k = {final_k}.")
+
+    if 'cluster' in steps:
+        with instrumentation.stage(f'cluster_with_pca[{split_name}]', input=frame_shape(df_split_scaled), k=final_k, method=method) as rec:
+            cluster_labels, models = cache.run(
+                f'cluster_with_pca[{split_name}]', data_clustering.cluster_with_pca,
+                inputs={'df': df_split_scaled, 'projection': split_projection},
+                params={
+                    'split_name': split_name, 'n_clusters': final_k, 'n_components': PCA_COMPONENTS,
+                    'method': method, 'silhouette': SILHOUETTE_METHOD, 'return_models': True
+                },
+                outputs=[os.path.join(data_clustering.REPORTS_CLUSTER_PLOTS_DIR, f'{split_name}_clusters_{PCA_COMPONENTS}d.png')]
+            )
+            rec['output'] = frame_shape(cluster_labels)
+        if models is not None:
+            model_registry.save_split_model(split_name, models, registry_dir=registry_dir, feature_weights=weights)
+
+    if 'report' in steps:
+        if cluster_labels is None:
+            cluster_labels = data_split.load_table(labels_dir, columns=['ID', split_name], storage_format=SPLIT_STORAGE_FORMAT)
+            cluster_labels = cluster_labels.dropna().astype({split_name: int}).rename(columns={split_name: 'Cluster'})
+        df_split_unscaled = data_split.load_split(unscaled_dir, split_name, storage_format=SPLIT_STORAGE_FORMAT)
+        # Only the columns the report uses, as a view of the memory-mapped table shared by all workers
+        lookup = data_split.ColumnStore(lookup_dir, storage_format=SPLIT_STORAGE_FORMAT)
+        df_unscaled_for_lookup = lookup.select(report_columns(COL_DEFINITIONS[split_name], lookup.columns))
+        final_df_split = pd.merge(df_split_unscaled, cluster_labels, on='ID')
+
+        with instrumentation.stage(f'analyze[{split_name}]', input=frame_shape(final_df_split)):
+            cache.run(
+                f'analyze[{split_name}]', analyze_and_interpret_clusters,
+                inputs={'df_split': final_df_split, 'df_full_unscaled': df_unscaled_for_lookup},
+                params={
+                    'cols_for_this_split': COL_DEFINITIONS[split_name], 'base_name': split_name,
+                    'output_dir': CLUSTER_PROFILES_DIR, 'report_format': REPORT_FORMAT
+                },
+                outputs=[report_writer.report_path(split_name, CLUSTER_PROFILES_DIR, REPORT_FORMAT)]
+            )
+    return cluster_labels if 'cluster' in steps else None
 
-    # 1. Load, Check and Process Data
-    df_raw = data_loader.load_raw_data(RAW_DATA_PATH)
-    eda.simple_eda(df_raw)
-    df_processed = data_processing.processing(df_raw)
+def run_processing(cache, raw_data_path=RAW_DATA_PATH, chunksize=PROCESSING_CHUNKSIZE):
+    """
+    1. Loads, checks and processes the raw data and stores the processed lookup table.
+    With `chunksize`, the raw file is streamed and processed chunk by chunk
+    (`data_processing.processing_in_chunks`), bypassing the stage cache.
 
-    # 2. Perform and Save Full Exploratory Data Analysis
+    Returns:
+        tuple: (df_processed, raw_incomes, reference_date), also saved for the `split` command.
+    """
+    # Age and Days_Enrolled are computed against one pinned date, which is also part of the cache key
+    reference_date = pd.Timestamp.now().normalize()
+    if chunksize:
+        eda.streaming_simple_eda(data_loader.iter_raw_chunks(raw_data_path, chunksize=chunksize))
+        with instrumentation.stage('processing', chunksize=chunksize) as rec:
+            raw_incomes = data_loader.read_raw_incomes(raw_data_path, chunksize=chunksize)
+            df_processed = pd.concat(data_processing.processing_in_chunks(
+                raw_data_path, chunksize, reference_date=reference_date,
+                income_median=raw_incomes.median(), compact=COMPACT_FRAMES
+            ))
+            if COMPACT_FRAMES:
+                # Chunks have their own categories and integer types; unify them as for one frame
+                df_processed = data_processing.compact_frame(df_processed)
+            rec['output'] = frame_shape(df_processed)
+    else:
+        with instrumentation.stage('load') as rec:
+            df_raw = data_loader.load_raw_data(raw_data_path, compact=COMPACT_FRAMES)
+            rec['output'] = frame_shape(df_raw)
+        if SKETCH_EDA:
+            eda.streaming_simple_eda(data_loader.iter_raw_chunks(raw_data_path))
+        else:
+            eda.simple_eda(df_raw)
+        with instrumentation.stage('processing', input=frame_shape(df_raw)) as rec:
+            df_processed = cache.run(
+                'processing', data_processing.processing, inputs={'df': df_raw},
+                params={'reference_date': reference_date, 'compact': COMPACT_FRAMES}
+            )
+            rec['output'] = frame_shape(df_processed)
+        raw_incomes = df_raw.set_index('ID')['Income']
+        del df_raw
+
+    # The unscaled lookup frame is stored once as a memory-mapped table that all split workers share
+    with instrumentation.stage('save_lookup', input=frame_shape(df_processed)):
+        data_split.save_table(df_processed, LOOKUP_DIR, storage_format=SPLIT_STORAGE_FORMAT)
+    joblib.dump({'raw_incomes': raw_incomes, 'reference_date': reference_date}, PROCESSING_STATE_PATH)
+    return df_processed, raw_incomes, reference_date
+
+def run_eda(df_processed):
+    """
+    2. Performs and saves the full exploratory data analysis. With SKETCH_EDA the
+    charts are drawn from sketches of the stored lookup table and `df_processed`
+    is not needed.
+    """
     print("\n--- Performing Exploratory Data Analysis ---")
-    eda.eda(df_processed, output_dir=REPORTS_DIR_EDA)
+    if SKETCH_EDA:
+        with instrumentation.stage('eda'):
+            eda.sketch_eda(
+                data_split.iter_table_batches(LOOKUP_DIR, storage_format=SPLIT_STORAGE_FORMAT),
+                output_dir=REPORTS_DIR_EDA
+            )
+        print("EDA completed. Charts saved.")
+        return
+    with instrumentation.stage('eda', input=frame_shape(df_processed)):
+        eda.eda(df_processed, output_dir=REPORTS_DIR_EDA)
     print("EDA completed. Charts saved.")
 
-    # 3. Create unscaled (for analysis) and scaled (for clustering) dataframes
-    df_unscaled_for_lookup = df_processed.copy()
-    df_unscaled = pd.get_dummies(df_processed, columns=['Education', 'Living_With'], drop_first=True)
-    df_scaled = df_unscaled.copy()
-    
-    numeric_cols = df_processed.select_dtypes(include=np.number).columns
-    if 'ID' in numeric_cols:
-        numeric_cols = numeric_cols.drop('ID')
-    
-    scaler = StandardScaler()
-    df_scaled[numeric_cols] = scaler.fit_transform(df_scaled[numeric_cols])
+def run_split(df_processed, raw_incomes, reference_date, cache):
+    """
+    3.-4. Encodes and scales the processed customers, saves the preprocessing and
+    running statistics incremental mode builds on and splits both frames into the 4Ps.
+    """
+    income_median = raw_incomes.median()
+
+    # 3. Create unscaled (for analysis) and scaled (for clustering) dataframes.
+    with instrumentation.stage('encode_and_scale', input=frame_shape(df_processed)) as rec:
+        df_unscaled, df_scaled, scaler, numeric_cols = cache.run(
+            'encode_and_scale', data_processing.encode_and_scale, inputs={'df': df_processed},
+            params={'compact': COMPACT_FRAMES}
+        )
+        rec['output'] = frame_shape(df_scaled)
+    model_registry.save_preprocessing(scaler, numeric_cols, df_unscaled.columns, income_median, reference_date)
+    incremental.save_state(incremental.build_state(raw_incomes, df_unscaled, numeric_cols, reference_date))
     print("\nCreated 'unscaled' and 'scaled' dataframes.")
 
-    # 4. Split both dataframes into 4P groups
-    unscaled_dir = os.path.join(SPLIT_DATA_DIR, 'unscaled')
-    scaled_dir = os.path.join(SPLIT_DATA_DIR, 'scaled')
-    data_split.split_by_marketing_4ps(df_unscaled, output_dir=unscaled_dir)
-    data_split.split_by_marketing_4ps(df_scaled, output_dir=scaled_dir)
+    # 4. Split both dataframes into 4P groups, releasing each one once it is stored
+    frames_to_split = [(df_unscaled, UNSCALED_DIR), (df_scaled, SCALED_DIR)]
+    del df_unscaled, df_scaled
+    while frames_to_split:
+        df_to_split, output_dir = frames_to_split.pop(0)
+        with instrumentation.stage(f'split_by_marketing_4ps[{os.path.basename(output_dir)}]', input=frame_shape(df_to_split)):
+            cache.run(
+                'split_by_marketing_4ps', data_split.split_by_marketing_4ps, inputs={'df': df_to_split},
+                params={'output_dir': output_dir, 'storage_format': SPLIT_STORAGE_FORMAT, 'export_csv': EXPORT_SPLIT_CSV},
+                outputs=[data_split.table_path(output_dir, SPLIT_STORAGE_FORMAT)]
+            )
+        del df_to_split
     print("Data split for both scaled and unscaled sets completed.")
 
-    # 5. Loop through splits, cluster, merge, and analyze
-    print("\n--- Starting Clustering and Analysis Process for all 4P Splits ---")
-    
-    final_k_values = {'people': 5, 'products': 2, 'promotion': 10, 'place': 2} 
-
-    for split_name in COL_DEFINITIONS.keys():
-        print(f"\n--- Processing '{split_name}' split ---")
-        
-        df_split_scaled = pd.read_csv(os.path.join(scaled_dir, f"{split_name}_split.csv"))
-        df_split_unscaled = pd.read_csv(os.path.join(unscaled_dir, f"{split_name}_split.csv"))
-        
-        suggested_k = data_clustering.evaluate_k_range(df=df_split_scaled, split_name=split_name)
-        final_k = final_k_values.get(split_name, suggested_k) # Use predefined k or fallback to suggested
-        print(f"Automated suggestion for '{split_name}' k = {suggested_k}. Using final k = {final_k}.")
-
-        cluster_labels = data_clustering.cluster_with_pca(
-            df=df_split_scaled, split_name=split_name, n_clusters=final_k, n_components=2
+def save_labels(split_labels):
+    """Stores the cluster label of every customer per split, keeping the stored labels of the other splits."""
+    labels = data_split.load_table(SCALED_DIR, columns=['ID'], storage_format=SPLIT_STORAGE_FORMAT)
+    if os.path.exists(data_split.table_path(LABELS_DIR, SPLIT_STORAGE_FORMAT)):
+        stored = data_split.load_table(LABELS_DIR, storage_format=SPLIT_STORAGE_FORMAT)
+        kept = [col for col in stored.columns if col != 'ID' and col not in split_labels]
+        labels = labels.merge(stored[['ID'] + kept], on='ID', how='left')
+    for split_name, cluster_labels in split_labels.items():
+        labels = labels.merge(cluster_labels.rename(columns={'Cluster': split_name}), on='ID', how='left')
+    labels = labels[['ID'] + [split_name for split_name in COL_DEFINITIONS if split_name in labels.columns]]
+    data_split.save_table(labels, LABELS_DIR, storage_format=SPLIT_STORAGE_FORMAT)
+
+def run_split_steps(split_names=None, steps=SPLIT_STEPS):
+    """5. Runs the selected steps of the per-split pipeline for each split in the process pool."""
+    split_names = split_names or list(COL_DEFINITIONS)
+    print(f"\n--- Running {', '.join(steps)} for the {', '.join(split_names)} split(s) ---")
+
+    tasks = {
+        split_name: dict(
+            split_name=split_name, final_k=FINAL_K_VALUES.get(split_name),
+            method=CLUSTER_METHODS.get(split_name, 'kmeans'),
+            scaled_dir=SCALED_DIR, unscaled_dir=UNSCALED_DIR, lookup_dir=LOOKUP_DIR,
+            registry_dir=model_registry.REGISTRY_DIR, cache_dir=STAGE_CACHE_DIR, use_cache=USE_STAGE_CACHE,
+            steps=tuple(steps), weights=FEATURE_WEIGHTS.get(split_name)
         )
-        
-        final_df_split = pd.merge(df_split_unscaled, cluster_labels, on='ID')
+        for split_name in split_names
+    }
+    with instrumentation.stage('split_tasks', max_workers=MAX_WORKERS, steps=list(steps)):
+        split_labels = scheduler.run_split_tasks(process_split, tasks, max_workers=MAX_WORKERS)
+
+    if 'cluster' in steps:
+        save_labels(split_labels)
+
+    if 'report' in steps:
+        # Combine the per-split reports, which the workers wrote concurrently, into one
+        reported = [
+            split_name for split_name in COL_DEFINITIONS
+            if os.path.exists(report_writer.report_path(split_name, CLUSTER_PROFILES_DIR, REPORT_FORMAT))
+        ]
+        with instrumentation.stage('consolidate_reports'):
+            consolidated_path = report_writer.consolidate_reports(reported, CLUSTER_PROFILES_DIR, report_format=REPORT_FORMAT)
+        print(f"Consolidated cluster report saved to '{consolidated_path}'.")
+
+def fit_pipeline(df_processed, raw_incomes, reference_date, cache):
+    """
+    Encodes, scales, splits, clusters and analyzes the processed customers and stores
+    everything incremental mode builds on. Used by the full run and for refits.
 
-        analyze_and_interpret_clusters(
-            df_split=final_df_split,
-            df_full_unscaled=df_unscaled_for_lookup,
-            cols_for_this_split=COL_DEFINITIONS[split_name],
-            base_name=split_name
+    Args:
+        raw_incomes (pd.Series): Raw 'Income' indexed by 'ID' (for the imputation median).
+        reference_date (pd.Timestamp): The date 'Age' and 'Days_Enrolled' refer to.
+    """
+    run_split(df_processed, raw_incomes, reference_date, cache)
+    run_split_steps()
+
+def run_incremental(delta_path, drift_threshold=incremental.DRIFT_THRESHOLD):
+    """
+    Applies a delta file of new and changed customers to the stored datasets and
+    labels only those customers. Refits everything on the stored population once
+    the drift exceeds `drift_threshold`.
+    """
+    print("Starting incremental update of the Customer Personality Clusters")
+    instrumentation.configure(enabled=TRACE_ENABLED)
+    with instrumentation.stage('load_delta') as rec:
+        df_delta = data_loader.load_raw_data(delta_path, compact=COMPACT_FRAMES)
+        rec['output'] = frame_shape(df_delta)
+    with instrumentation.stage('apply_delta', input=frame_shape(df_delta)) as rec:
+        labels, drift, needs_refit = incremental.apply_delta(
+            df_delta, LOOKUP_DIR, UNSCALED_DIR, SCALED_DIR, LABELS_DIR,
+            storage_format=SPLIT_STORAGE_FORMAT, drift_threshold=drift_threshold, compact=COMPACT_FRAMES
         )
+        rec.update(output=frame_shape(labels), drift=drift, refit=needs_refit)
+
+    if needs_refit:
+        print("\nDrift exceeds the threshold. Refitting on the updated population.")
+        cache = StageCache(STAGE_CACHE_DIR, max_bytes=STAGE_CACHE_MAX_BYTES, enabled=USE_STAGE_CACHE)
+        state = incremental.load_state()
+        df_processed = data_split.load_table(LOOKUP_DIR, storage_format=SPLIT_STORAGE_FORMAT)
+        fit_pipeline(df_processed, state['raw_incomes'], state['reference_date'], cache)
+
+    if TRACE_ENABLED:
+        instrumentation.write_trace(TRACE_PATH, trace_format=TRACE_FORMAT)
+    print("\nIncremental update finished.")
+
+def load_processed():
+    """Returns what the `process` command stored: (df_processed, raw_incomes, reference_date)."""
+    if not os.path.exists(PROCESSING_STATE_PATH):
+        raise FileNotFoundError(f"No processed data found in '{SPLIT_DATA_DIR}'. Run `python main.py process` first.")
+    state = joblib.load(PROCESSING_STATE_PATH)
+    df_processed = data_split.load_table(LOOKUP_DIR, storage_format=SPLIT_STORAGE_FORMAT)
+    return df_processed, state['raw_incomes'], state['reference_date']
+
+def main(command='run', split_names=None, chunksize=PROCESSING_CHUNKSIZE):
+    """
+    Runs one pipeline command: 'run' (everything), 'process', 'eda', 'split' or
+    one of SPLIT_STEPS and OPTIONAL_SPLIT_STEPS. Each command reads what the previous
+    one stored on disk. `chunksize` streams the raw file through processing.
+    """
+    print(f"Starting Customer Personality Cluster Pipeline ({command})")
+    instrumentation.configure(enabled=TRACE_ENABLED)
+    
+    # Ensure all needed directories exist
+    os.makedirs(SPLIT_DATA_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR_EDA, exist_ok=True)
+    cache = StageCache(STAGE_CACHE_DIR, max_bytes=STAGE_CACHE_MAX_BYTES, enabled=USE_STAGE_CACHE)
+
+    if command in ('run', 'process'):
+        df_processed, raw_incomes, reference_date = run_processing(cache, chunksize=chunksize)
+    elif command == 'split' or (command == 'eda' and not SKETCH_EDA):
+        df_processed, raw_incomes, reference_date = load_processed()
+    else:
+        df_processed = None
+
+    if command in ('run', 'eda'):
+        run_eda(df_processed)
+    if command in ('run', 'split'):
+        run_split(df_processed, raw_incomes, reference_date, cache)
+    # The split steps read the stored tables, so the processed frame can go before the workers start
+    df_processed = None
+
+    if command == 'run':
+        run_split_steps()
+    elif command in SPLIT_STEPS + OPTIONAL_SPLIT_STEPS:
+        run_split_steps(split_names, steps=(command,))
+
+    if TRACE_ENABLED:
+        instrumentation.write_trace(TRACE_PATH, trace_format=TRACE_FORMAT)
+    print(f"\nPipeline command '{command}' finished.")
 
-    print("\nClustering pipeline and analysis finished for all groups.")
+def build_parser():
+    parser = argparse.ArgumentParser(description='Customer Personality Cluster Pipeline.')
+    parser.add_argument('--delta', help='Apply a file of new and changed customers instead of a full run.')
+    parser.add_argument('--drift-threshold', type=float, default=incremental.DRIFT_THRESHOLD)
+    parser.add_argument('--chunksize', type=int, default=PROCESSING_CHUNKSIZE,
+                        help='Stream the raw file through processing in chunks of this many rows (run, process).')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.add_parser('run', help='Run the whole pipeline (default).')
+    subparsers.add_parser('process', help='Load, check and process the raw data.')
+    subparsers.add_parser('eda', help='Draw the EDA charts of the processed data.')
+    subparsers.add_parser('split', help='Encode, scale and split the processed data into the 4Ps.')
+    for step, help_text in [
+        ('evaluate-k', 'Fit the PCA projection and evaluate k per split.'),
+        ('stability', 'Recommend k per split from the stability of subsample clusterings.'),
+        ('cluster', 'Cluster the splits and save the models and labels.'),
+        ('report', 'Write the cluster reports from the stored labels.'),
+    ]:
+        step_parser = subparsers.add_parser(step, help=help_text)
+        step_parser.add_argument('--splits', nargs='+', choices=list(COL_DEFINITIONS), help='Default: all splits.')
+    return parser
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = build_parser().parse_args()
+    if args.delta:
+        run_incremental(args.delta, drift_threshold=args.drift_threshold)
+    else:
+        main(args.command or 'run', split_names=getattr(args, 'splits', None), chunksize=args.chunksize)
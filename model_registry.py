@@ -0,0 +1,242 @@
+import argparse
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import data_loader
+import data_processing
+import data_split
+
+# Directory where the fitted preprocessing and per-split cluster models are stored
+REGISTRY_DIR = '04_models'
+PREPROCESSING_FILE = 'preprocessing.joblib'
+CATEGORICAL_COLS = ['Education', 'Living_With']
+
+
+def _split_model_path(registry_dir, split_name):
+    return os.path.join(registry_dir, f'{split_name}_model.joblib')
+
+
+def save_preprocessing(scaler, scaled_columns, feature_columns, income_median, reference_date=None,
+                       registry_dir=REGISTRY_DIR):
+    """
+    Saves the fitted StandardScaler together with everything needed to rebuild
+    the scaled feature frame for new customers.
+
+    Args:
+        scaler (StandardScaler): The scaler fitted in the pipeline.
+        scaled_columns (list): The columns the scaler was fitted on.
+        feature_columns (list): All columns of the one-hot encoded (unscaled) frame.
+        income_median (float): The 'Income' median used to fill missing values.
+        reference_date (pd.Timestamp): The date 'Age' and 'Days_Enrolled' were computed against.
+    """
+    import sklearn # Only for the version stamp; importing sklearn is slow
+
+    os.makedirs(registry_dir, exist_ok=True)
+    joblib.dump({
+        'scaler': scaler,
+        'scaled_columns': list(scaled_columns),
+        'feature_columns': list(feature_columns),
+        'income_median': float(income_median),
+        'reference_date': None if reference_date is None else pd.Timestamp(reference_date),
+        'sklearn_version': sklearn.__version__,
+        'created': datetime.now().isoformat(timespec='seconds')
+    }, os.path.join(registry_dir, PREPROCESSING_FILE))
+
+
+def save_split_model(split_name, models, registry_dir=REGISTRY_DIR, feature_weights=None):
+    """
+    Saves the PCA and clustering model of one split, as returned by
+    `data_clustering.cluster_with_pca(..., return_models=True)`, with the
+    feature weights the split's scaled columns were multiplied by.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    entry = dict(models)
+    entry['feature_weights'] = dict(feature_weights or {})
+    entry['cluster_sizes'] = np.asarray(entry['cluster_sizes'], dtype=np.int64)
+    entry['n_seen'] = int(entry['cluster_sizes'].sum())
+    entry['created'] = datetime.now().isoformat(timespec='seconds')
+    joblib.dump(entry, _split_model_path(registry_dir, split_name))
+    print(f"Saved '{split_name}' model to '{_split_model_path(registry_dir, split_name)}'.")
+
+
+def load_registry(registry_dir=REGISTRY_DIR):
+    """
+    Loads the preprocessing and all split models from the registry.
+
+    Returns:
+        dict: {'preprocessing': {...}, 'splits': {split_name: {...}}}
+    """
+    preprocessing_path = os.path.join(registry_dir, PREPROCESSING_FILE)
+    if not os.path.exists(preprocessing_path):
+        raise FileNotFoundError(f"No fitted models found in '{registry_dir}'. Run the pipeline first.")
+
+    splits = {}
+    for filename in sorted(os.listdir(registry_dir)):
+        if filename.endswith('_model.joblib'):
+            splits[filename[:-len('_model.joblib')]] = joblib.load(os.path.join(registry_dir, filename))
+    return {'preprocessing': joblib.load(preprocessing_path), 'splits': splits}
+
+
+def encode_features(df_processed, preprocessing):
+    """One-hot encodes processed rows into the (unscaled) training feature columns."""
+    # No drop_first here: a small batch may not contain the dropped baseline category.
+    # Reindexing to the training columns removes the baseline columns instead.
+    df = pd.get_dummies(df_processed, columns=CATEGORICAL_COLS)
+    return df.reindex(columns=preprocessing['feature_columns'], fill_value=False)
+
+
+def scale_features(df_encoded, preprocessing):
+    """Applies the stored scaler to a frame from `encode_features`."""
+    df = df_encoded.copy()
+    scaled_columns = preprocessing['scaled_columns']
+    if len(df): # e.g. a batch of outliers only
+        df[scaled_columns] = preprocessing['scaler'].transform(df[scaled_columns].astype(np.float64))
+    return df
+
+
+def prepare_features(df_raw, preprocessing):
+    """
+    Turns raw customer rows into the scaled feature frame the models were fitted on.
+    Uses the stored income median, reference date, one-hot columns and scaler, so a
+    batch is transformed exactly like the training data regardless of its size and
+    of when it is scored.
+    """
+    df = data_processing.processing(
+        df_raw, income_median=preprocessing['income_median'], verbose=False,
+        reference_date=preprocessing.get('reference_date') # None (now) for registries saved without one
+    )
+    return scale_features(encode_features(df, preprocessing), preprocessing)
+
+
+def predict_splits(df_scaled, registry):
+    """
+    Returns 'ID' plus the cluster label of every split for rows from `prepare_features`.
+    The index of `df_scaled` is kept, so labels line up with the input rows that survived processing.
+    """
+    labels = pd.DataFrame({'ID': df_scaled['ID'].to_numpy()}, index=df_scaled.index)
+    for split_name, entry in registry['splits'].items():
+        X = _split_features(df_scaled, entry)
+        labels[split_name] = _predict(entry, entry['pca'].transform(X)) if len(X) else np.empty(0, dtype=np.int64)
+    return labels
+
+
+def _model_dtype(entry):
+    """The float type a split's models were fitted in (float32 for compact split tables)."""
+    return entry['pca'].components_.dtype
+
+
+def _split_features(df_scaled, entry):
+    """A split's feature columns in its model dtype, with its feature weights applied."""
+    X = df_scaled[entry['feature_columns']].astype(_model_dtype(entry))
+    return data_split.apply_weights(X, entry.get('feature_weights'))
+
+
+def _uses_centroids(entry):
+    """
+    Whether a split's labels come from centroids `partial_fit` can move: the model's
+    own `cluster_centers_` (k-means) or the stored 'centroids' of models without
+    `predict`. Models such as Birch predict from internal state and are not updatable.
+    """
+    model = entry['model']
+    return hasattr(model, 'cluster_centers_') or not hasattr(model, 'predict')
+
+
+def _predict(entry, X):
+    """Assigns each row of X (already in PCA space) to the nearest stored centroid."""
+    model = entry['model']
+    if hasattr(model, 'predict'):
+        return model.predict(X)
+    centers = entry['centroids']
+    return np.argmin(((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+
+
+def score(df_raw, registry_dir=REGISTRY_DIR, registry=None):
+    """
+    Assigns cluster labels for every split to a batch of new customers.
+
+    Args:
+        df_raw (pd.DataFrame): New customers in the raw file format.
+        registry (dict): An already loaded registry, to avoid reloading it per batch.
+
+    Returns:
+        pd.DataFrame: 'ID' plus one label column per split. Rows removed by
+        `processing` (outliers) do not get a label.
+    """
+    registry = registry or load_registry(registry_dir)
+    return predict_splits(prepare_features(df_raw, registry['preprocessing']), registry)
+
+
+def partial_fit(df_raw, registry_dir=REGISTRY_DIR):
+    """
+    Updates the stored cluster centroids with a batch of new customers without
+    retraining on the full history.
+
+    Scaler and PCA stay fixed so that existing labels keep their meaning. Each
+    centroid moves to the running mean of all customers assigned to it, weighted
+    by the number of customers it has already seen.
+
+    Raises a ValueError, before anything is changed, if a split's model predicts
+    without using its centroids (e.g. Birch), since the update would not affect its labels.
+
+    Returns:
+        pd.DataFrame: The labels assigned to the batch (as `score`).
+    """
+    registry = load_registry(registry_dir)
+    fixed = [split_name for split_name, entry in registry['splits'].items() if not _uses_centroids(entry)]
+    if fixed:
+        models = sorted({type(registry['splits'][split_name]['model']).__name__ for split_name in fixed})
+        raise ValueError(
+            f"Cannot update the centroids of split(s) {fixed}: their models {models} predict without them. "
+            "Refit these splits or use a k-means backend."
+        )
+    df = prepare_features(df_raw, registry['preprocessing'])
+
+    labels = pd.DataFrame({'ID': df['ID'].to_numpy()})
+    for split_name, entry in registry['splits'].items():
+        X_pca = entry['pca'].transform(_split_features(df, entry))
+        assigned = _predict(entry, X_pca)
+        labels[split_name] = assigned
+
+        model = entry['model']
+        centers = model.cluster_centers_ if hasattr(model, 'cluster_centers_') else entry['centroids']
+        counts = entry['cluster_sizes'].astype(np.float64)
+        batch_counts = np.bincount(assigned, minlength=len(centers))
+        batch_sums = np.zeros_like(centers)
+        np.add.at(batch_sums, assigned, X_pca)
+
+        updated = batch_counts > 0
+        centers[updated] = (
+            centers[updated] * counts[updated, None] + batch_sums[updated]
+        ) / (counts[updated] + batch_counts[updated])[:, None]
+
+        entry['cluster_sizes'] = entry['cluster_sizes'] + batch_counts
+        entry['n_seen'] = int(entry['cluster_sizes'].sum())
+        joblib.dump(entry, _split_model_path(registry_dir, split_name))
+
+    print(f"Updated {len(registry['splits'])} split models with {len(df)} customers.")
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assign clusters to new customers with the stored models.')
+    parser.add_argument('input', help='CSV file with new customers in the raw (tab-separated) format.')
+    parser.add_argument('output', help='Where to write the cluster labels (CSV).')
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    parser.add_argument('--update', action='store_true', help='Also update the centroids with this batch.')
+    args = parser.parse_args()
+
+    df_raw = data_loader.load_raw_data(args.input)
+    if args.update:
+        labels = partial_fit(df_raw, registry_dir=args.registry_dir)
+    else:
+        labels = score(df_raw, registry_dir=args.registry_dir)
+    labels.to_csv(args.output, index=False)
+    print(f"Cluster labels for {len(labels)} customers saved to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
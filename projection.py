@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA, IncrementalPCA
+
+import data_split
+
+# Explained-variance reports of the per-split projections
+REPORTS_PCA_DIR = os.path.join('03_reports_and_results', 'pca')
+
+# PCA solvers: 'exact' is scikit-learn's automatic choice (a covariance
+# eigendecomposition for tall data), 'randomized' uses randomized SVD and
+# 'incremental' fits IncrementalPCA batch by batch. 'auto' picks 'exact' up to
+# RANDOMIZED_MIN_ROWS rows and 'randomized' above; for stored split tables it
+# fits out of core (`fit_projection_from_table`) above OUT_OF_CORE_MIN_ROWS rows.
+PCA_SOLVERS = ('auto', 'exact', 'randomized', 'incremental')
+RANDOMIZED_MIN_ROWS = 1_000_000
+OUT_OF_CORE_MIN_ROWS = 5_000_000
+# Rows per batch for IncrementalPCA and the out-of-core table projection
+BATCH_ROWS = 100_000
+
+
+def _feature_matrix(df):
+    """The numeric features of a split, as clustered: everything numeric except 'ID'."""
+    X = df.select_dtypes(include=np.number)
+    return X.drop(columns=['ID']) if 'ID' in X.columns else X
+
+
+def model_matrix(X):
+    """
+    Returns X as a C-contiguous matrix for the estimators. float32 data (the
+    compact split tables) stays float32, anything else becomes float64.
+    """
+    X = np.asarray(X)
+    return np.ascontiguousarray(X, dtype=np.float32 if X.dtype == np.float32 else np.float64)
+
+
+def _make_pca(n_components, solver, n_rows, batch_size=BATCH_ROWS, random_state=42):
+    if solver not in PCA_SOLVERS:
+        raise ValueError(f"Unknown PCA solver '{solver}'. Choose from {list(PCA_SOLVERS)}.")
+    if solver == 'auto':
+        solver = 'randomized' if n_rows > RANDOMIZED_MIN_ROWS else 'exact'
+    if solver == 'incremental':
+        return IncrementalPCA(n_components=n_components, batch_size=batch_size)
+    if solver == 'randomized':
+        return PCA(n_components=n_components, svd_solver='randomized', random_state=random_state)
+    return PCA(n_components=n_components, random_state=random_state)
+
+
+def report_explained_variance(projection, split_name, output_dir=REPORTS_PCA_DIR):
+    """Prints the explained variance of each component and saves it as CSV."""
+    ratios = projection['explained_variance_ratio']
+    report = pd.DataFrame({
+        'component': [f'PC{i + 1}' for i in range(len(ratios))],
+        'explained_variance_ratio': ratios,
+        'cumulative': np.cumsum(ratios),
+    })
+    os.makedirs(output_dir, exist_ok=True)
+    report.to_csv(os.path.join(output_dir, f'{split_name}_explained_variance.csv'), index=False)
+    summary = ', '.join(f"{row.component} {row.explained_variance_ratio:.1%}" for row in report.itertuples())
+    print(f"PCA for '{split_name}' explains {report['cumulative'].iloc[-1]:.1%} of the variance ({summary}).")
+
+
+def _projection(pca, X_pca, ids, feature_columns):
+    return {
+        'pca': pca, 'X_pca': X_pca, 'ids': ids, 'feature_columns': feature_columns,
+        'explained_variance_ratio': np.asarray(pca.explained_variance_ratio_)
+    }
+
+
+def fit_projection(df, split_name, n_components=2, solver='auto', report=True):
+    """
+    Fits PCA once for a split and projects it. The result is meant to be shared by
+    the k sweep, the final clustering and the plots instead of refitting PCA each time.
+
+    Returns:
+        dict: 'pca' (fitted), 'X_pca' (projected rows), 'ids' (the 'ID' of each row),
+        'feature_columns' and 'explained_variance_ratio'. None if the split has no
+        numeric features.
+    """
+    X = _feature_matrix(df)
+    if X.empty:
+        return None
+    pca = _make_pca(n_components, solver, len(X))
+    X_pca = pca.fit_transform(X)
+    projection = _projection(pca, X_pca, df['ID'].to_numpy(), X.columns.tolist())
+    if report:
+        report_explained_variance(projection, split_name)
+    return projection
+
+
+def fits_out_of_core(solver, n_rows):
+    """
+    Whether a stored split of `n_rows` rows is projected with `fit_projection_from_table`:
+    always for the 'incremental' solver, and for 'auto' above OUT_OF_CORE_MIN_ROWS rows.
+    """
+    return solver == 'incremental' or (solver == 'auto' and n_rows > OUT_OF_CORE_MIN_ROWS)
+
+
+def fit_projection_from_table(data_dir, split_name, n_components=2, batch_size=BATCH_ROWS,
+                              storage_format='arrow', weights=None, report=True):
+    """
+    Out-of-core version of `fit_projection` for splits that do not fit in memory.
+
+    IncrementalPCA is fitted with `partial_fit` over batches of the stored table,
+    then a second pass projects each batch. Only one batch of features is held in
+    memory at a time; the result holds just the projected columns. `weights` are
+    the split's feature weights, applied to every batch as `data_split.ColumnStore.view`
+    applies them to the whole split.
+    """
+    import pyarrow as pa
+
+    schema = data_split.table_schema(data_dir, storage_format)
+    feature_columns = [
+        col for col in data_split.split_columns(split_name, schema.names)
+        if col != 'ID' and (pa.types.is_integer(schema.field(col).type) or pa.types.is_floating(schema.field(col).type))
+    ]
+    if not feature_columns:
+        return None
+
+    pca = IncrementalPCA(n_components=n_components)
+    for batch in data_split.iter_table_batches(data_dir, feature_columns, batch_size, storage_format):
+        if len(batch) >= n_components: # partial_fit needs at least n_components rows
+            pca.partial_fit(model_matrix(data_split.apply_weights(batch, weights)))
+
+    X_pca, ids = [], []
+    for batch in data_split.iter_table_batches(data_dir, ['ID'] + feature_columns, batch_size, storage_format):
+        ids.append(batch['ID'].to_numpy())
+        X_pca.append(pca.transform(model_matrix(data_split.apply_weights(batch[feature_columns], weights))))
+    projection = _projection(pca, np.concatenate(X_pca), np.concatenate(ids), feature_columns)
+    if report:
+        report_explained_variance(projection, split_name)
+    return projection
@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Supported output formats for the cluster reports
+REPORT_FORMATS = ('xlsx', 'parquet', 'csv', 'json')
+# Name of the report that combines all splits
+CONSOLIDATED_NAME = 'all_splits'
+
+
+def report_path(base_name, output_dir, report_format='xlsx'):
+    """
+    Returns where the report for `base_name` is written: a workbook for 'xlsx',
+    otherwise a directory with one file per table.
+    """
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format '{report_format}'. Choose from {list(REPORT_FORMATS)}.")
+    if report_format == 'xlsx':
+        return os.path.join(output_dir, f'{base_name}_cluster_analysis.xlsx')
+    return os.path.join(output_dir, f'{base_name}_cluster_analysis')
+
+
+def _cell(value):
+    """Converts missing values for openpyxl, which cannot write NaN."""
+    if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+        return None
+    return value
+
+
+def _append_frame(ws, df, index=False):
+    """Streams a dataframe into a write-only worksheet row by row."""
+    header = ([None] if index else []) + [_cell(col) for col in df.columns]
+    ws.append(header)
+    for label, row in zip(df.index, df.itertuples(index=False, name=None)):
+        ws.append(([_cell(label)] if index else []) + [_cell(value) for value in row])
+
+
+def _table_name(sheet_name):
+    return sheet_name.lower()
+
+
+def _write_table(df, path_without_ext, report_format):
+    # Columnar formats need string column names (cluster ids are integers)
+    df = df.set_axis([str(col) for col in df.columns], axis=1)
+    if report_format == 'parquet':
+        df.to_parquet(f'{path_without_ext}.parquet', index=False)
+    elif report_format == 'csv':
+        df.to_csv(f'{path_without_ext}.csv', index=False)
+    else:
+        df.to_json(f'{path_without_ext}.json', orient='records')
+
+
+def _read_table(path_without_ext, report_format):
+    if report_format == 'parquet':
+        return pd.read_parquet(f'{path_without_ext}.parquet')
+    if report_format == 'csv':
+        return pd.read_csv(f'{path_without_ext}.csv')
+    return pd.read_json(f'{path_without_ext}.json', orient='records')
+
+
+def write_cluster_report(summary_table, samples, base_name, output_dir, report_format='xlsx'):
+    """
+    Writes the summary metrics and the per-cluster samples of one split.
+
+    'xlsx' streams rows into a write-only openpyxl workbook (one sheet per table),
+    so the workbook is never held in memory as a whole. 'parquet', 'csv' and 'json'
+    write one lightweight file per table into a new directory that replaces the
+    previous report, so files of clusters from an earlier run do not linger.
+
+    Args:
+        summary_table (pd.DataFrame): Summary metrics, one column per cluster.
+        samples (dict): Maps cluster id to its sample dataframe.
+
+    Returns:
+        str: The path of the written workbook or directory.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = report_path(base_name, output_dir, report_format)
+    tables = [('Summary_Metrics', summary_table, True)] + [
+        (f'Cluster_{cluster_id}_Samples', sample, False) for cluster_id, sample in samples.items()
+    ]
+
+    if report_format == 'xlsx':
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        for sheet_name, df, index in tables:
+            _append_frame(wb.create_sheet(sheet_name), df, index=index)
+        wb.save(path)
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}.', dir=output_dir)
+        try:
+            for sheet_name, df, index in tables:
+                df = df.rename_axis('Metric').reset_index() if index else df
+                _write_table(df, os.path.join(tmp_dir, _table_name(sheet_name)), report_format)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        # A directory can only replace an empty one
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_dir, path)
+    return path
+
+
+def consolidate_reports(split_names, output_dir, report_format='xlsx', name=CONSOLIDATED_NAME):
+    """
+    Combines the reports that the splits wrote independently (and possibly
+    concurrently) into one consolidated report.
+
+    For 'xlsx', the sheets of every split workbook are streamed into one
+    write-only workbook, prefixed with the split name. For the other formats the
+    summaries are stacked into one table with a 'Split' column and a manifest
+    lists the per-split files.
+
+    Returns:
+        str: The path of the consolidated report.
+    """
+    path = report_path(name, output_dir, report_format)
+
+    if report_format == 'xlsx':
+        from openpyxl import Workbook, load_workbook
+
+        consolidated = Workbook(write_only=True)
+        for split_name in split_names:
+            source = load_workbook(report_path(split_name, output_dir, report_format), read_only=True)
+            for ws in source.worksheets:
+                # Excel limits sheet names to 31 characters
+                target = consolidated.create_sheet(f'{split_name}_{ws.title}'[:31])
+                for row in ws.iter_rows(values_only=True):
+                    target.append(row)
+            source.close()
+        consolidated.save(path)
+        return path
+
+    os.makedirs(path, exist_ok=True)
+    summaries, manifest = [], {}
+    for split_name in split_names:
+        split_dir = report_path(split_name, output_dir, report_format)
+        manifest[split_name] = sorted(os.path.relpath(os.path.join(split_dir, f), output_dir) for f in os.listdir(split_dir))
+        summary = _read_table(os.path.join(split_dir, 'summary_metrics'), report_format)
+        summaries.append(summary.assign(Split=split_name))
+
+    _write_table(pd.concat(summaries, ignore_index=True), os.path.join(path, 'summary_metrics'), report_format)
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return path
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
+
+# Default number of worker processes for the per-split pipelines
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _init_worker(threads_per_worker):
+    """Uses the headless backend and limits BLAS/OpenMP threads in each worker."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads_per_worker)
+
+
+def _run_captured(task_fn, kwargs, trace):
+    """Runs one task and returns everything it printed and traced together with its result."""
+    instrumentation.configure(enabled=trace)
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        result = task_fn(**kwargs)
+    return buffer.getvalue(), result, instrumentation.collect()
+
+
+def run_split_tasks(task_fn, tasks, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Runs independent per-split tasks concurrently in a process pool.
+
+    The console output of each task is captured in the worker and printed in the
+    order of `tasks`, so logs look the same as a sequential run regardless of
+    which split finishes first. Stages the workers trace are merged into the
+    trace of this process.
+
+    Args:
+        task_fn (callable): A module-level function, called as `task_fn(**kwargs)`.
+        tasks (dict): Maps split name to the keyword arguments for that split.
+        max_workers (int): Number of worker processes. 1 runs everything in-process.
+
+    Returns:
+        dict: Maps split name to the value returned by `task_fn`.
+    """
+    if max_workers <= 1 or len(tasks) <= 1:
+        return {split_name: task_fn(**kwargs) for split_name, kwargs in tasks.items()}
+
+    n_workers = min(max_workers, len(tasks))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {
+            split_name: pool.submit(_run_captured, task_fn, kwargs, instrumentation.is_enabled())
+            for split_name, kwargs in tasks.items()
+        }
+        for split_name, future in futures.items():
+            output, results[split_name], events = future.result()
+            print(output, end='')
+            instrumentation.extend(events)
+
+    return results
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import model_registry
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+# Micro-batching: a batch is scored once it has MAX_BATCH_ROWS customers or its
+# oldest request has waited MAX_WAIT_MS milliseconds
+MAX_BATCH_ROWS = 1024
+MAX_WAIT_MS = 5
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+HTTP_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+# Errors of bad customer data; any other scoring error is the server's (500)
+INPUT_ERRORS = (KeyError, ValueError, TypeError)
+
+
+class BadRequest(ValueError):
+    """A request that is not valid HTTP (request line or headers)."""
+
+
+class MicroBatcher:
+    """
+    Collects the customers of concurrent requests and scores them in one
+    vectorized call, so per-call overhead (pandas, scaler, PCA) is paid per batch.
+    Scoring runs in a worker thread to keep the event loop responsive.
+    """
+
+    def __init__(self, registry, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.registry = registry
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.customers = 0
+
+    async def score(self, records):
+        """Queues one request's customers and returns their labels once its batch is scored."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            try:
+                results = await loop.run_in_executor(None, self._score_batch, [records for records, _ in batch])
+            except Exception as e:
+                # Answer every waiting request and keep serving, the batcher must not die
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.batches += 1
+            self.customers += n_rows
+
+    def _score_batch(self, requests):
+        """
+        Scores all requests together; if the batch fails, scores them one by one to
+        isolate the bad request. A request that fails on its own gets the exception.
+        """
+        try:
+            return self._split_labels(requests, self._predict([r for records in requests for r in records]))
+        except Exception as e:
+            if len(requests) == 1:
+                return [e]
+            return [self._score_batch([records])[0] for records in requests]
+
+    def _predict(self, records):
+        df_raw = pd.DataFrame.from_records(records)
+        df_scaled = model_registry.prepare_features(df_raw, self.registry['preprocessing'])
+        labels = model_registry.predict_splits(df_scaled, self.registry)
+        # Rows that processing removes as outliers get no label
+        return labels.reindex(range(len(df_raw)))
+
+    def _split_labels(self, requests, labels):
+        split_names = list(self.registry['splits'])
+        results, start = [], 0
+        for records in requests:
+            part = labels.iloc[start:start + len(records)]
+            results.append([
+                {'ID': record.get('ID'), **{
+                    split: None if np.isnan(value) else int(value) for split, value in zip(split_names, row)
+                }}
+                for record, row in zip(records, part[split_names].astype(float).itertuples(index=False, name=None))
+            ])
+            start += len(records)
+        return results
+
+
+def _response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (
+        f'HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+        f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+    )
+    return head.encode() + body
+
+
+async def _read_request(reader):
+    """
+    Reads one HTTP/1.1 request. Returns (method, path, headers, body), or None at end
+    of stream. Raises BadRequest for a malformed request line or Content-Length.
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise BadRequest(f'Malformed request line {lines[0][:100]!r}.') from None
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise BadRequest(f"Invalid Content-Length {headers['content-length'][:100]!r}.")
+    if length > MAX_BODY_BYTES:
+        return method, path, headers, None
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+async def _handle(batcher, reader, writer, stats):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except BadRequest as e:
+                # The rest of the stream cannot be framed, answer and close
+                writer.write(_response(400, {'error': str(e)}, keep_alive=False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            if path == '/health' and method == 'GET':
+                status, payload = 200, {
+                    'status': 'ok', 'splits': list(batcher.registry['splits']),
+                    'reference_date': str(batcher.registry['preprocessing'].get('reference_date')),
+                    'batches': batcher.batches, 'customers': batcher.customers,
+                    'uptime_s': round(time.monotonic() - stats['started'], 1)
+                }
+            elif path != '/score':
+                status, payload = 404, {'error': f"Unknown path '{path}'. Use POST /score or GET /health."}
+            elif method != 'POST':
+                status, payload = 405, {'error': 'Use POST /score.'}
+            elif body is None:
+                status, payload = 413, {'error': f'Request body exceeds {MAX_BODY_BYTES} bytes.'}
+                keep_alive = False
+            else:
+                status, payload = await _score_request(batcher, body)
+
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _score_request(batcher, body):
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return 400, {'error': 'Request body is not valid JSON.'}
+    # A single customer object or a list of them, in the raw file format
+    records = data if isinstance(data, list) else [data]
+    if not records or not all(isinstance(record, dict) for record in records):
+        return 400, {'error': 'Send a customer object or a non-empty list of customer objects.'}
+
+    result = await batcher.score(records)
+    if isinstance(result, INPUT_ERRORS):
+        return 400, {'error': f'Could not score customers: {result!r}'}
+    if isinstance(result, Exception):
+        return 500, {'error': f'Scoring failed: {result!r}'}
+    return 200, result if isinstance(data, list) else result[0]
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, registry_dir=model_registry.REGISTRY_DIR,
+                max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+    """
+    Serves cluster assignments over HTTP until cancelled.
+
+    POST /score takes one customer (or a list) in the raw file format and returns
+    'ID' plus the label of every 4P split (null for rows removed as outliers).
+    GET /health reports the loaded splits, the reference date and batching counters.
+    Customers are processed against the reference date of the training run, so
+    labels do not drift with the wall clock and agree with incremental updates.
+    """
+    registry = model_registry.load_registry(registry_dir) # Loaded once, shared by all requests
+    if registry['preprocessing'].get('reference_date') is None:
+        print("Warning: the registry has no reference date, 'Age' and 'Days_Enrolled' are computed "
+              "against the current date. Re-run the pipeline to store it.", flush=True)
+    batcher = MicroBatcher(registry, max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms)
+    stats = {'started': time.monotonic()}
+    batcher_task = asyncio.create_task(batcher.run())
+
+    server = await asyncio.start_server(lambda r, w: _handle(batcher, r, w, stats), host, port)
+    print(f"Scoring {list(registry['splits'])} on http://{host}:{port}/score "
+          f"(batches of up to {max_batch_rows} customers, {max_wait_ms} ms wait).", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP service that assigns customers to the stored 4P clusters.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--registry-dir', default=model_registry.REGISTRY_DIR)
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.registry_dir, args.max_batch_rows, args.max_wait_ms))
+    except KeyboardInterrupt:
+        print("Scoring server stopped.")
+
+
+if __name__ == "__main__":
+    main()
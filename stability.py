@@ -0,0 +1,221 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from joblib import Parallel, delayed
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+from data_clustering import CLUSTERING_BACKENDS, REPORTS_DIR
+from projection import model_matrix
+
+# Stability reports: per-k metrics (CSV), their plot and the consensus matrices
+REPORTS_STABILITY_DIR = os.path.join(REPORTS_DIR, 'stability')
+
+# Clusterings per k, each fitted on a random subsample (without replacement) of the rows
+STABILITY_RUNS = 20
+SUBSAMPLE_FRACTION = 0.8
+# Upper bound on the rows of one subsample, keeps a run's cost flat for millions of rows
+SUBSAMPLE_MAX_ROWS = 100_000
+# Every run labels the same evaluation rows, on which the runs are compared (ARI)
+EVALUATION_ROWS = 20_000
+# Rows of the consensus matrix (a subset of the evaluation rows). It is stored condensed:
+# the upper triangle as co-clustering counts, m*(m-1)/2 entries of one or two bytes.
+CONSENSUS_ROWS = 2_000
+# Pairs whose consensus lies in between count as ambiguous (PAC, Senbabaoglu et al., 2014)
+PAC_BOUNDS = (0.1, 0.9)
+# A k counts as stable when the lower end of its ARI confidence interval reaches this
+STABLE_ARI = 0.8
+# Percentile bootstrap over the runs for the confidence intervals
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_SAMPLES = 1000
+
+
+def _run_seed(random_state, k, run):
+    return int(np.random.SeedSequence([random_state, k, run]).generate_state(1)[0])
+
+
+def _subsample_run(X, eval_rows, k, method, fraction, seed):
+    """
+    Clusters one random subsample of X and labels the evaluation rows with the
+    fitted model (or, for models without `predict`, the nearest cluster mean).
+
+    Returns:
+        np.ndarray: int16 labels of the evaluation rows.
+    """
+    rng = np.random.default_rng(seed)
+    size = max(k, min(int(round(fraction * len(X))), SUBSAMPLE_MAX_ROWS))
+    sample = np.sort(rng.choice(len(X), size=min(size, len(X)), replace=False))
+    model = CLUSTERING_BACKENDS[method](X[sample], k, random_state=seed)
+    labels = model.fit_predict(X[sample])
+    if hasattr(model, 'predict'):
+        return model.predict(X[eval_rows]).astype(np.int16)
+    centers = np.vstack([X[sample][labels == c].mean(axis=0) for c in np.unique(labels[labels >= 0])])
+    distances = ((X[eval_rows][:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return distances.argmin(axis=1).astype(np.int16)
+
+
+def pairwise_ari(run_labels):
+    """Adjusted Rand index between every pair of runs (rows of `run_labels`), as a symmetric matrix."""
+    n_runs = len(run_labels)
+    ari = np.eye(n_runs)
+    for i in range(n_runs):
+        for j in range(i + 1, n_runs):
+            ari[i, j] = ari[j, i] = adjusted_rand_score(run_labels[i], run_labels[j])
+    return ari
+
+
+def consensus_counts(run_labels):
+    """
+    Counts for every pair of rows in how many runs they share a cluster.
+
+    Returns:
+        np.ndarray: The condensed upper triangle (the order of `scipy.spatial.distance.squareform`),
+        in the smallest unsigned type that holds the number of runs.
+    """
+    n_runs, m = run_labels.shape
+    rows, cols = np.triu_indices(m, k=1)
+    rows, cols = rows.astype(np.int32), cols.astype(np.int32)
+    counts = np.zeros(len(rows), dtype=np.min_scalar_type(n_runs))
+    for labels in run_labels:
+        counts += labels[rows] == labels[cols]
+    return counts
+
+
+def consensus_matrix(counts, n_runs):
+    """Expands condensed co-clustering counts into the square consensus matrix (fractions of runs)."""
+    from scipy.spatial.distance import squareform
+
+    matrix = squareform(counts.astype(np.float32) / n_runs, checks=False)
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+
+def _bootstrap_interval(statistic, n_runs, rng):
+    """Percentile interval of `statistic(runs)` over runs resampled with replacement."""
+    values = [statistic(rng.integers(0, n_runs, size=n_runs)) for _ in range(BOOTSTRAP_SAMPLES)]
+    alpha = (1 - CONFIDENCE_LEVEL) / 2
+    low, high = np.nanquantile(values, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def _mean_pairwise(ari, runs):
+    """Mean ARI over the pairs of distinct runs in a (resampled) set of runs."""
+    sub = ari[np.ix_(runs, runs)]
+    distinct = runs[:, None] != runs[None, :]
+    return sub[distinct].mean() if distinct.any() else np.nan
+
+
+def recommend_k(metrics_df, stable_ari=STABLE_ARI):
+    """
+    Among the ks whose ARI interval lies at or above `stable_ari`, picks the one with the
+    highest mean silhouette; if no k is that stable, the k with the highest mean ARI.
+    """
+    stable = metrics_df[metrics_df['ari_low'] >= stable_ari]
+    if stable.empty:
+        return int(metrics_df.loc[metrics_df['ari_mean'].idxmax(), 'k'])
+    return int(stable.loc[stable['silhouette_mean'].idxmax(), 'k'])
+
+
+def evaluate_stability(df, split_name, k_range=range(2, 11), method='kmeans', n_runs=STABILITY_RUNS,
+                       subsample_fraction=SUBSAMPLE_FRACTION, n_jobs=-1, random_state=42,
+                       return_metrics=False, projection=None, output_dir=REPORTS_STABILITY_DIR):
+    """
+    Measures how reproducible the clustering of a split is for each k. Every k is
+    clustered `n_runs` times on random subsamples in a process pool; each run labels
+    the same evaluation rows, and the runs are compared pairwise with the adjusted
+    Rand index. The mean silhouette of the runs and the share of ambiguous pairs in
+    the consensus matrix (PAC) are reported alongside, with bootstrap confidence
+    intervals over the runs.
+
+    Args:
+        method (str): One of data_clustering.CLUSTERING_BACKENDS that takes a number of clusters.
+        n_jobs (int): Worker processes for the runs (-1 uses all cores).
+        return_metrics (bool): Also return a dataframe with the per-k metrics.
+        projection (dict): A projection from `projection.fit_projection`. When given,
+            the runs cluster its projected rows, the space `cluster_with_pca` clusters in.
+
+    Returns:
+        int: The k from `recommend_k`, or (k, metrics) if `return_metrics`.
+    """
+    print(f"--- Evaluating cluster stability for '{split_name}' ({n_runs} runs per k, method '{method}')")
+    if projection is not None:
+        X = projection['X_pca']
+    else:
+        X = df.select_dtypes(include=np.number).drop(columns=['ID'], errors='ignore')
+    X = model_matrix(X)
+
+    rng = np.random.default_rng(random_state)
+    eval_rows = np.sort(rng.choice(len(X), size=min(len(X), EVALUATION_ROWS), replace=False))
+    consensus_rows = np.sort(rng.choice(len(eval_rows), size=min(len(eval_rows), CONSENSUS_ROWS), replace=False))
+
+    k_values = list(k_range)
+    runs = Parallel(n_jobs=n_jobs)(
+        delayed(_subsample_run)(X, eval_rows, k, method, subsample_fraction, _run_seed(random_state, k, run))
+        for k in k_values for run in range(n_runs)
+    )
+
+    results, consensus = [], {}
+    X_consensus = X[eval_rows[consensus_rows]]
+    for i, k in enumerate(k_values):
+        run_labels = np.vstack(runs[i * n_runs:(i + 1) * n_runs])
+        ari = pairwise_ari(run_labels)
+        silhouettes = np.array([
+            silhouette_score(X_consensus, labels[consensus_rows]) if len(np.unique(labels[consensus_rows])) > 1 else np.nan
+            for labels in run_labels
+        ])
+        counts = consensus_counts(run_labels[:, consensus_rows])
+        consensus[f'k{k}'] = counts
+        share = counts / n_runs
+        ari_low, ari_high = _bootstrap_interval(lambda r: _mean_pairwise(ari, r), n_runs, rng)
+        silhouette_low, silhouette_high = _bootstrap_interval(lambda r: np.nanmean(silhouettes[r]), n_runs, rng)
+        results.append({
+            'k': k, 'ari_mean': _mean_pairwise(ari, np.arange(n_runs)), 'ari_low': ari_low, 'ari_high': ari_high,
+            'silhouette_mean': np.nanmean(silhouettes), 'silhouette_low': silhouette_low,
+            'silhouette_high': silhouette_high,
+            'pac': float(((share > PAC_BOUNDS[0]) & (share < PAC_BOUNDS[1])).mean()) if len(share) else 0.0
+        })
+
+    metrics_df = pd.DataFrame(results)
+    recommended_k = recommend_k(metrics_df)
+
+    os.makedirs(output_dir, exist_ok=True)
+    metrics_df.to_csv(os.path.join(output_dir, f'{split_name}_stability.csv'), index=False)
+    # Row positions (in the split table) of the consensus rows, plus one condensed matrix per k
+    np.savez_compressed(
+        os.path.join(output_dir, f'{split_name}_consensus.npz'),
+        rows=eval_rows[consensus_rows], n_runs=n_runs, **consensus
+    )
+    _plot_stability(metrics_df, split_name, recommended_k, output_dir)
+
+    row = metrics_df.set_index('k').loc[recommended_k]
+    print(f"Stability for '{split_name}': recommended k = {recommended_k} "
+          f"(ARI {row['ari_mean']:.3f}, {CONFIDENCE_LEVEL:.0%} CI {row['ari_low']:.3f}-{row['ari_high']:.3f}; "
+          f"silhouette {row['silhouette_mean']:.3f}, CI {row['silhouette_low']:.3f}-{row['silhouette_high']:.3f})")
+    if return_metrics:
+        return recommended_k, metrics_df
+    return recommended_k
+
+
+def _plot_stability(metrics_df, split_name, recommended_k, output_dir):
+    """Plots mean ARI and silhouette per k with their confidence intervals."""
+    import seaborn as sns # Only the plot needs it
+
+    with sns.axes_style("whitegrid"):
+        plt.figure(figsize=(12, 5))
+        for position, (metric, label, color) in enumerate(
+            [('ari', 'Adjusted Rand Index', 'tab:blue'), ('silhouette', 'Silhouette Score', 'green')], start=1
+        ):
+            plt.subplot(1, 2, position)
+            mean = metrics_df[f'{metric}_mean']
+            errors = [mean - metrics_df[f'{metric}_low'], metrics_df[f'{metric}_high'] - mean]
+            plt.errorbar(metrics_df['k'], mean, yerr=errors, marker='o', linestyle='--', color=color, capsize=4)
+            plt.axvline(recommended_k, color='grey', linestyle=':', label=f'Recommended k = {recommended_k}')
+            if metric == 'ari':
+                plt.axhline(STABLE_ARI, color='red', linestyle=':', linewidth=1, label=f'Stable (ARI {STABLE_ARI})')
+            plt.title(f'{label} across subsamples for {split_name.capitalize()}')
+            plt.xlabel('Number of Clusters (k)')
+            plt.ylabel(label)
+            plt.legend()
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, f'{split_name}_stability.png'))
+        plt.close()
@@ -0,0 +1,216 @@
+import ast
+import functools
+import hashlib
+import inspect
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+# Default on-disk location and size budget of the stage cache
+CACHE_DIR = '.pipeline_cache'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Bump to invalidate every existing cache entry after a format change
+CACHE_FORMAT_VERSION = 1
+# Modules in this directory count as project code: their source is part of the cache key
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _update_hash(h, value):
+    """Feeds a (possibly nested) value into the hash in a type-aware, deterministic way."""
+    if isinstance(value, pd.DataFrame):
+        h.update(b'DataFrame')
+        h.update(repr(list(value.columns)).encode())
+        h.update(repr([str(dtype) for dtype in value.dtypes]).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        h.update(type(value).__name__.encode())
+        h.update(str(value.dtype).encode())
+        h.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(b'ndarray')
+        h.update(str(value.dtype).encode())
+        h.update(repr(value.shape).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b'dict')
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode())
+            _update_hash(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode())
+        for item in value:
+            _update_hash(h, item)
+    else:
+        h.update(repr(value).encode())
+
+
+def hash_value(value):
+    """Returns a hex digest that identifies the content of `value`."""
+    h = hashlib.sha256()
+    _update_hash(h, value)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _local_imports(path, mtime_ns):
+    """Project modules imported anywhere in a source file, including imports inside functions."""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split('.')[0])
+    candidates = [os.path.join(PROJECT_DIR, f'{name}.py') for name in names]
+    return tuple(sorted(candidate for candidate in candidates if os.path.exists(candidate)))
+
+
+def source_files(*objects):
+    """
+    Returns the source files that define the given functions or modules plus,
+    transitively, every project module they import.
+    """
+    pending = [os.path.abspath(inspect.getsourcefile(obj)) for obj in objects]
+    found = set()
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        if os.path.dirname(path) == PROJECT_DIR:
+            pending.extend(_local_imports(path, os.stat(path).st_mtime_ns))
+    return sorted(found)
+
+
+def code_version(*objects):
+    """
+    Returns a hash of the source files that define the given functions or modules
+    and of the project modules they (transitively) import, so that editing a
+    stage's module or anything it uses (e.g. report_writer under the cluster
+    analysis) invalidates its cache entries.
+    """
+    h = hashlib.sha256()
+    for path in source_files(*objects):
+        h.update(os.path.relpath(path, PROJECT_DIR).encode())
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed, on-disk cache for pipeline stage outputs.
+
+    Each entry is keyed on a hash of the stage name, its inputs, its parameters
+    and the source code of the modules implementing it. Entries are evicted in
+    least-recently-used order once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stage, inputs=None, params=None, code=(), salt=None):
+        return hash_value([CACHE_FORMAT_VERSION, stage, inputs or {}, params or {}, code_version(*code), salt])
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.joblib')
+
+    def get(self, key):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        path = self._path(key)
+        try:
+            value = joblib.load(path)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            # A truncated or unreadable entry (e.g. an interrupted write, or a pickle
+            # of a class that no longer exists) is a miss; drop it so it is recomputed
+            print(f"Warning: discarding unreadable cache entry {key}: {e!r}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return False, None
+        os.utime(path) # Mark as recently used for LRU eviction
+        return True, value
+
+    def put(self, key, value):
+        # Write to a temporary file first so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Removes least-recently-used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.joblib'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError: # Removed by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _outputs_current(self, key, outputs):
+        try:
+            stored = os.path.getmtime(self._path(key))
+            return all(os.path.getmtime(path) <= stored for path in outputs)
+        except FileNotFoundError:
+            return False
+
+    def run(self, stage, fn, inputs=None, params=None, code=(), outputs=(), salt=None):
+        """
+        Returns the cached result of `fn(**inputs, **params)` or computes and stores it.
+
+        Args:
+            stage (str): Name of the stage, used in log lines and the key.
+            fn (callable): The stage function.
+            inputs (dict): Data arguments, hashed by content.
+            params (dict): Parameter arguments.
+            code (tuple): Functions or modules whose source, with the project
+                modules they import, is part of the key. Defaults to the module of `fn`.
+            outputs (tuple): Files the stage writes. A cached entry only counts
+                as a hit if all of them still exist and none was modified after
+                the entry was stored (e.g. by an incremental update).
+            salt: Extra values that affect the result but are not passed to `fn`
+                (e.g. today's date for stages that depend on it).
+        """
+        inputs, params = inputs or {}, params or {}
+        if not self.enabled:
+            return fn(**inputs, **params)
+
+        key = self.key(stage, inputs, params, code or (fn,), salt)
+        if self._outputs_current(key, outputs):
+            hit, value = self.get(key)
+            if hit:
+                print(f"[cache] Reusing cached result for stage '{stage}'.")
+                instrumentation.annotate(cache='hit')
+                return value
+
+        instrumentation.annotate(cache='miss')
+        value = fn(**inputs, **params)
+        self.put(key, value)
+        return value
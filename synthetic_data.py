@@ -0,0 +1,122 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Column order of the raw marketing_campaign.csv file
+RAW_COLUMNS = [
+    'ID', 'Year_Birth', 'Education', 'Marital_Status', 'Income', 'Kidhome', 'Teenhome', 'Dt_Customer',
+    'Recency', 'MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts',
+    'MntGoldProds', 'NumDealsPurchases', 'NumWebPurchases', 'NumCatalogPurchases', 'NumStorePurchases',
+    'NumWebVisitsMonth', 'AcceptedCmp3', 'AcceptedCmp4', 'AcceptedCmp5', 'AcceptedCmp1', 'AcceptedCmp2',
+    'Complain', 'Z_CostContact', 'Z_Revenue', 'Response'
+]
+
+# Category frequencies observed in the original dataset
+EDUCATION_FREQ = {'Graduation': 0.5031, 'PhD': 0.2170, 'Master': 0.1652, '2n Cycle': 0.0906, 'Basic': 0.0241}
+MARITAL_FREQ = {
+    'Married': 0.3857, 'Together': 0.2589, 'Single': 0.2143, 'Divorced': 0.1036,
+    'Widow': 0.0344, 'Alone': 0.0013, 'Absurd': 0.0009, 'YOLO': 0.0009
+}
+# Average spend per product category in the original dataset
+MNT_MEANS = {
+    'MntWines': 304, 'MntFruits': 26, 'MntMeatProducts': 167,
+    'MntFishProducts': 37, 'MntSweetProducts': 27, 'MntGoldProds': 44
+}
+ENROLMENT_START, ENROLMENT_END = pd.Timestamp('2012-07-30'), pd.Timestamp('2014-06-29')
+
+
+def _choice(rng, freq, n):
+    labels = np.array(list(freq))
+    p = np.array(list(freq.values()))
+    return labels[rng.choice(len(labels), size=n, p=p / p.sum())]
+
+
+def generate_customers(n_rows, seed=42, id_offset=0):
+    """
+    Generates customers with the same schema and value formats as the raw file.
+
+    Distributions roughly follow the original data: spending and channel usage grow
+    with income and shrink with children, rare 'YOLO'/'Absurd' marital statuses,
+    about 1% missing incomes and a few age/income outliers are included.
+
+    Returns:
+        pd.DataFrame: `n_rows` customers in the raw column order, with
+        'Dt_Customer' as 'dd-mm-yyyy' strings.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_rows
+
+    year_birth = np.clip(rng.normal(1969, 12, n), 1940, 1996).round().astype(np.int64)
+    outlier_age = rng.random(n) < 0.0015
+    year_birth[outlier_age] = rng.integers(1893, 1901, outlier_age.sum())
+
+    kidhome = rng.choice(3, size=n, p=[0.577, 0.402, 0.021])
+    teenhome = rng.choice(3, size=n, p=[0.517, 0.460, 0.023])
+
+    income = np.clip(rng.normal(52000, 21000, n), 1730, 160000).round()
+    income[rng.random(n) < 0.0005] = 666666
+    wealth = np.clip((income - 15000) / 60000, 0.02, 2.0) * (1 - 0.25 * (kidhome + teenhome))
+    wealth = np.clip(wealth, 0.02, None)
+    wealth /= wealth.mean() # Average customer has wealth 1, so the means below match the original
+    income[rng.random(n) < 0.0107] = np.nan
+
+    enrolment_days = (ENROLMENT_END - ENROLMENT_START).days
+    dt_customer = ENROLMENT_START + pd.to_timedelta(rng.integers(0, enrolment_days + 1, n), unit='D')
+
+    df = pd.DataFrame({
+        'ID': np.arange(id_offset, id_offset + n),
+        'Year_Birth': year_birth,
+        'Education': _choice(rng, EDUCATION_FREQ, n),
+        'Marital_Status': _choice(rng, MARITAL_FREQ, n),
+        'Income': income,
+        'Kidhome': kidhome,
+        'Teenhome': teenhome,
+        'Dt_Customer': dt_customer.strftime('%d-%m-%Y'),
+        'Recency': rng.integers(0, 100, n),
+    })
+    for col, mean in MNT_MEANS.items():
+        df[col] = np.minimum(rng.gamma(1.2, mean * wealth / 1.2), mean * 6).round().astype(np.int64)
+
+    df['NumDealsPurchases'] = np.minimum(rng.poisson(2.3, n), 15)
+    df['NumWebPurchases'] = np.minimum(rng.poisson(1 + 3 * wealth), 27)
+    df['NumCatalogPurchases'] = np.minimum(rng.poisson(0.3 + 2.5 * wealth), 28)
+    df['NumStorePurchases'] = np.minimum(rng.poisson(2 + 4 * wealth), 13)
+    df['NumWebVisitsMonth'] = np.minimum(rng.poisson(np.clip(8 - 3 * wealth, 1, None)), 20)
+
+    for col, base in [('AcceptedCmp3', 0.049), ('AcceptedCmp4', 0.05), ('AcceptedCmp5', 0.049),
+                      ('AcceptedCmp1', 0.043), ('AcceptedCmp2', 0.009)]:
+        df[col] = (rng.random(n) < base * (0.5 + wealth)).astype(np.int64)
+    df['Complain'] = (rng.random(n) < 0.0094).astype(np.int64)
+    df['Z_CostContact'] = 3
+    df['Z_Revenue'] = 11
+    df['Response'] = (rng.random(n) < 0.15 * (0.5 + 0.5 * wealth)).astype(np.int64)
+    return df[RAW_COLUMNS]
+
+
+def write_synthetic_file(n_rows, output_path, seed=42, chunksize=1_000_000):
+    """
+    Writes `n_rows` synthetic customers to a tab-separated file like the raw data.
+    Rows are generated and written in chunks, so 10M-row files fit in memory easily.
+    """
+    written = 0
+    while written < n_rows:
+        n = min(chunksize, n_rows - written)
+        chunk = generate_customers(n, seed=seed + written, id_offset=written)
+        chunk.to_csv(output_path, sep='\t', index=False, mode='w' if written == 0 else 'a', header=written == 0)
+        written += n
+    print(f"Wrote {n_rows} synthetic customers to '{output_path}'.")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic customers in the raw data format.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    write_synthetic_file(args.rows, args.output, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
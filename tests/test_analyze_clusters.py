@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+import analyze_clusters
+
+
+def test_profile_matches_per_cluster_statistics():
+    rng = np.random.default_rng(0)
+    df_full = pd.DataFrame({'ID': np.arange(300), 'Income': rng.normal(50000, 1000, 300), 'Recency': rng.integers(0, 100, 300)})
+    df_split = pd.DataFrame({'ID': df_full['ID'], 'Cluster': rng.integers(0, 3, 300)})
+
+    profiles = analyze_clusters.profile_clusters(df_split, df_full, ['Income'])
+
+    for cluster_id, group in df_full.groupby(df_split['Cluster']):
+        assert profiles['sizes'][cluster_id] == len(group)
+        assert np.isclose(profiles['profile'].loc['Income', cluster_id], group['Income'].mean())
+        for q in (0.25, 0.5, 0.75):
+            assert np.isclose(profiles['quantiles'].loc[(cluster_id, q), 'Recency'], group['Recency'].quantile(q))
+        assert len(profiles['samples'][cluster_id]) == 15
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import DBSCAN, HDBSCAN
+
+import data_clustering
+
+
+@pytest.fixture
+def split_frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'ID': np.arange(200), 'a': rng.normal(size=200), 'b': rng.normal(size=200)})
+
+
+@pytest.mark.parametrize('method, backend, named', [
+    ('dbscan', lambda X, n_clusters, random_state: DBSCAN(eps=1e-9, min_samples=5), 'eps'),
+    ('hdbscan', lambda X, n_clusters, random_state: HDBSCAN(min_cluster_size=150, copy=True), 'min_cluster_size'),
+])
+def test_all_noise_raises_a_clear_error(split_frame, monkeypatch, tmp_path, method, backend, named):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(data_clustering.CLUSTERING_BACKENDS, method, backend)
+    with pytest.raises(ValueError, match=f"found no clusters.*{named}"):
+        data_clustering.cluster_with_pca(split_frame, 'test', 3, n_components=2, method=method, return_models=True)
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_loader
+import data_processing
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             '00_raw_data', 'marketing_campaign.csv')
+REFERENCE_DATE = pd.Timestamp('2026-01-01')
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_chunked_processing_equals_whole_frame(compact):
+    whole = data_processing.processing(
+        data_loader.load_raw_data(RAW_DATA_PATH, compact=compact), verbose=False,
+        reference_date=REFERENCE_DATE, compact=compact
+    )
+    chunked = pd.concat(data_processing.processing_in_chunks(
+        RAW_DATA_PATH, chunksize=300, reference_date=REFERENCE_DATE, compact=compact
+    ))
+    if compact:
+        chunked = data_processing.compact_frame(chunked)
+        pd.testing.assert_frame_equal(chunked, whole)
+    else:
+        # The chunks are read with the typed RAW_SCHEMA, the whole frame with default types
+        pd.testing.assert_frame_equal(chunked, whole, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_processing_matches_the_previous_implementation(compact):
+    import benchmark
+
+    sample = data_loader.load_raw_data(RAW_DATA_PATH)
+    expected = benchmark._reference_processing(sample.copy())
+    expected['Family_Size'] = expected['Family_Size'].astype('int64') # object dtype under pandas >= 3
+    result = data_processing.processing(data_loader.load_raw_data(RAW_DATA_PATH, compact=compact), verbose=False, compact=compact)
+    # Compact frames only change dtypes (int8/int16, categoricals), never values
+    pd.testing.assert_frame_equal(result, expected, check_dtype=not compact, check_categorical=False,
+                                  check_column_type=False)
+
+
+def test_compact_model_matrix_matches_the_default_one():
+    df = data_processing.processing(data_loader.load_raw_data(RAW_DATA_PATH), verbose=False, reference_date=REFERENCE_DATE)
+    _, default, _, _ = data_processing.encode_and_scale(df, compact=False)
+    _, compact, _, _ = data_processing.encode_and_scale(data_processing.compact_frame(df), compact=True)
+    assert list(compact.columns) == list(default.columns)
+    pd.testing.assert_frame_equal(compact, default, check_dtype=False, rtol=1e-5, atol=1e-6)
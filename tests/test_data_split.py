@@ -0,0 +1,42 @@
+import pytest
+
+import data_split
+
+VALID = """
+[splits.people]
+columns = ["Age", "Income"]
+k = 3
+weights = { Income = 2 }
+
+[splits.place]
+columns = ["ID", "NumWebPurchases"]
+"""
+
+
+def write_config(tmp_path, text):
+    path = tmp_path / 'splits.toml'
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_split_config_reads_splits_in_file_order(tmp_path):
+    splits = data_split.load_split_config(write_config(tmp_path, VALID))
+    assert list(splits) == ['people', 'place']
+    assert splits['people'] == {'columns': ['ID', 'Age', 'Income'], 'k': 3, 'method': 'kmeans', 'weights': {'Income': 2.0}}
+    assert splits['place']['columns'] == ['ID', 'NumWebPurchases']
+    assert splits['place']['k'] is None
+
+
+@pytest.mark.parametrize('text, message', [
+    ('[splits.people]\ncolumns = ["Age"]\nclusters = 3\n', "Unknown keys"),
+    ('[splits.people]\ncolumns = ["Age", "Incme"]\n', r"Unknown columns \['Incme'\]"),
+    ('[splits.people]\ncolumns = ["Age", "Income", "Age"]\n', r"Columns \['Age'\] are listed more than once"),
+    ('[splits.people]\ncolumns = ["Age"]\nk = 1\n', "must be a number >= 2"),
+    ('[splits.people]\ncolumns = ["Age"]\nweights = { Income = 2 }\n', "Weights for columns outside"),
+    ('[splits.people]\ncolumns = ["Age"]\n\n[splits.people]\ncolumns = ["Income"]\n', "people"),
+    ('# nothing here\n', "No splits defined"),
+])
+def test_load_split_config_rejects_invalid_splits(tmp_path, text, message):
+    # A split defined twice is rejected by the TOML parser (TOMLDecodeError is a ValueError)
+    with pytest.raises(ValueError, match=message):
+        data_split.load_split_config(write_config(tmp_path, text))
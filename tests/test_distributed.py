@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+import distributed
+
+
+@pytest.fixture(scope='module')
+def blobs():
+    X, _ = make_blobs(n_samples=3_000, centers=4, n_features=3, cluster_std=1.5, random_state=0)
+    return X
+
+
+def test_same_init_equals_sklearn(blobs):
+    init = blobs[np.random.default_rng(0).choice(len(blobs), 4, replace=False)]
+    reference = KMeans(n_clusters=4, init=init, n_init=1).fit(blobs)
+    model = distributed.DistributedKMeans(4, executor='serial', n_shards=3, init=init).fit(blobs)
+
+    np.testing.assert_array_equal(model.labels_, reference.labels_)
+    np.testing.assert_allclose(model.cluster_centers_, reference.cluster_centers_, atol=1e-8)
+    np.testing.assert_allclose(model.inertia_, reference.inertia_, rtol=1e-8)
+    np.testing.assert_array_equal(model.predict(blobs[:100]), reference.predict(blobs[:100]))
+
+
+def test_kmeans_parallel_init_finds_the_blobs(blobs):
+    reference = KMeans(n_clusters=4, n_init=10, random_state=0).fit(blobs)
+    model = distributed.DistributedKMeans(4, executor='local', n_workers=2).fit(blobs)
+
+    # One k-means|| initialization against the best of ten k-means++ runs
+    assert adjusted_rand_score(reference.labels_, model.labels_) > 0.99
+    assert model.inertia_ <= reference.inertia_ * 1.005
+
+
+@pytest.mark.parametrize('params, message', [
+    ({'init': 'k-means++'}, 'init must be'),
+    ({'init': np.zeros((3, 3))}, 'shape of the initial centers'),
+    ({'n_clusters': 0, 'init': np.zeros((0, 3))}, 'at least 1'),
+    ({'n_clusters': 5_000}, 'should be >= n_clusters'),
+])
+def test_invalid_parameters_raise(blobs, params, message):
+    params = {'n_clusters': 4, 'executor': 'serial', **params}
+    with pytest.raises(ValueError, match=message):
+        distributed.DistributedKMeans(**params).fit(blobs)
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_split
+import incremental
+
+
+def test_running_median_remove_and_add_equal_np_median():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 50, 1_001).astype(np.float64)  # many duplicates
+    median = incremental.RunningMedian(values)
+
+    removed = rng.choice(len(values), 300, replace=False)
+    added = rng.integers(0, 60, 150).astype(np.float64)
+    median.remove(values[removed])
+    median.add(added)
+
+    expected = np.concatenate([np.delete(values, removed), added])
+    np.testing.assert_array_equal(median.values, np.sort(expected))
+    assert median.median() == np.median(expected)
+
+
+def test_running_moments_equal_recomputed():
+    rng = np.random.default_rng(1)
+    X = rng.normal(50_000, 20_000, (1_000, 3))
+    moments = incremental.RunningMoments(X)
+
+    new_rows = rng.normal(60_000, 25_000, (200, 3))
+    moments.remove(X[:100])
+    moments.add(new_rows)
+
+    expected = np.vstack([X[100:], new_rows])
+    assert moments.n == len(expected)
+    np.testing.assert_allclose(moments.mean, expected.mean(axis=0), rtol=1e-10)
+    np.testing.assert_allclose(moments.var, expected.var(axis=0), rtol=1e-8)
+
+
+def make_table(n, rng):
+    return pd.DataFrame({
+        'ID': np.arange(n),
+        'Income': rng.random(n).astype(np.float32),
+        'Recency': rng.integers(0, 100, n).astype(np.int16),
+        'Education': pd.Categorical(rng.choice(['Basic', 'Master'], n)),
+    })
+
+
+def make_delta(n, rng, max_id):
+    # 30 IDs, of which the last 5 have no row (e.g. customers that became outliers)
+    ids = rng.choice(max_id, 30, replace=False)
+    rows = pd.DataFrame({
+        'ID': ids[:25],
+        'Income': rng.random(25),
+        'Recency': rng.integers(0, 100, 25),
+        'Education': rng.choice(['Basic', 'PhD'], 25),
+    })
+    return rows, ids
+
+
+def upsert(table, rows, ids):
+    return pd.concat([table[~table['ID'].isin(ids)], rows], ignore_index=True)
+
+
+@pytest.mark.parametrize('storage_format', ['arrow', 'parquet'])
+def test_delta_files_resolve_by_id(tmp_path, storage_format):
+    rng = np.random.default_rng(2)
+    expected = make_table(1_000, rng)
+    data_split.save_table(expected, tmp_path, storage_format)
+    for _ in range(3):
+        rows, ids = make_delta(1_000, rng, 1_050)
+        assert data_split.append_rows(rows, ids, tmp_path, storage_format) > 0
+        expected = upsert(expected, rows, ids)
+    assert len(data_split.delta_paths(tmp_path, storage_format)) == 3
+
+    stored = data_split.load_table(tmp_path, storage_format=storage_format)
+    pd.testing.assert_frame_equal(stored, expected.astype(stored.dtypes.to_dict()), check_categorical=False)
+    assert stored['Recency'].dtype == np.int16
+    assert data_split.table_num_rows(tmp_path, storage_format) == len(expected)
+
+    batches = data_split.iter_table_batches(tmp_path, ['Income'], batch_size=128, storage_format=storage_format)
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), stored[['Income']])
+
+    ids = rng.choice(1_050, 100, replace=False)
+    rows = data_split.load_rows(tmp_path, ids, ['ID', 'Income'], storage_format)
+    pd.testing.assert_frame_equal(
+        rows.sort_values('ID', ignore_index=True),
+        stored.loc[stored['ID'].isin(ids), ['ID', 'Income']].sort_values('ID', ignore_index=True)
+    )
+
+
+def test_deltas_are_merged_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_split, 'MAX_DELTA_FILES', 2)
+    rng = np.random.default_rng(3)
+    expected = make_table(1_000, rng)
+    data_split.save_table(expected, tmp_path)
+    for _ in range(3):
+        rows, ids = make_delta(1_000, rng, 1_000)
+        data_split.append_rows(rows, ids, tmp_path)
+        expected = upsert(expected, rows, ids)
+
+    assert data_split.delta_paths(tmp_path) == []
+    stored = data_split.load_table(tmp_path)
+    pd.testing.assert_frame_equal(stored, expected.astype(stored.dtypes.to_dict()), check_categorical=False)
+
+
+def test_rows_outside_a_compact_type_rewrite_the_table(tmp_path):
+    rng = np.random.default_rng(4)
+    data_split.save_table(make_table(1_000, rng), tmp_path)
+    rows = pd.DataFrame({'ID': [1], 'Income': [0.5], 'Recency': [40_000], 'Education': ['Basic']})
+
+    assert data_split.append_rows(rows, [1], tmp_path) == 0
+    assert data_split.delta_paths(tmp_path) == []
+    stored = data_split.load_table(tmp_path)
+    assert stored.loc[stored['ID'] == 1, 'Recency'].item() == 40_000
@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_clustering
+import data_loader
+import data_processing
+import data_split
+import model_registry
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             '00_raw_data', 'marketing_campaign.csv')
+REFERENCE_DATE = pd.Timestamp('2026-01-01')
+
+
+# Backends with a predict method; models without one are scored by their nearest cluster mean
+@pytest.mark.parametrize('method', ['kmeans', 'birch'])
+def test_scoring_the_training_data_reproduces_the_stored_labels(tmp_path, monkeypatch, method):
+    monkeypatch.chdir(tmp_path) # cluster_with_pca writes its plot and score into the working directory
+    registry_dir = str(tmp_path / 'models')
+    df_raw = data_loader.load_raw_data(RAW_DATA_PATH)
+    income_median = df_raw['Income'].median()
+
+    df_processed = data_processing.processing(df_raw, income_median=income_median, verbose=False, reference_date=REFERENCE_DATE)
+    df_unscaled, df_scaled, scaler, numeric_cols = data_processing.encode_and_scale(df_processed, compact=False)
+    model_registry.save_preprocessing(scaler, numeric_cols, df_unscaled.columns, income_median, REFERENCE_DATE,
+                                      registry_dir=registry_dir)
+
+    # The splits are read back as in the pipeline (one-hot columns included)
+    data_split.save_table(df_scaled, str(tmp_path / 'scaled'))
+    expected = {}
+    for split_name in ['people', 'products']:
+        df_split = data_split.load_split(str(tmp_path / 'scaled'), split_name)
+        labels, models = data_clustering.cluster_with_pca(df_split, split_name, 4, method=method, return_models=True)
+        model_registry.save_split_model(split_name, models, registry_dir=registry_dir)
+        expected[split_name] = labels.set_index('ID')['Cluster']
+
+    scored = model_registry.score(df_raw, registry_dir=registry_dir).set_index('ID')
+    assert len(scored) == len(df_processed)
+    for split_name, labels in expected.items():
+        pd.testing.assert_series_equal(scored[split_name].loc[labels.index], labels, check_names=False, check_dtype=False)
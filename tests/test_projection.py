@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+import data_processing
+import data_split
+import projection
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             '00_raw_data', 'marketing_campaign.csv')
+
+
+@pytest.fixture(scope='module')
+def scaled_dir(tmp_path_factory):
+    df = data_processing.processing(data_loader.load_raw_data(RAW_DATA_PATH), verbose=False,
+                                    reference_date=pd.Timestamp('2026-01-01'))
+    _, df_scaled, _, _ = data_processing.encode_and_scale(df, compact=False)
+    data_dir = str(tmp_path_factory.mktemp('scaled'))
+    data_split.save_table(df_scaled, data_dir)
+    return data_dir
+
+
+def _fit_both(scaled_dir, split_name, batch_size):
+    weights = data_split.SPLITS[split_name].get('weights')
+    in_memory = projection.fit_projection(
+        data_split.load_split(scaled_dir, split_name, weights=weights), split_name, n_components=3, solver='exact', report=False
+    )
+    out_of_core = projection.fit_projection_from_table(scaled_dir, split_name, n_components=3, batch_size=batch_size,
+                                                       weights=weights, report=False)
+    assert out_of_core['feature_columns'] == in_memory['feature_columns']
+    np.testing.assert_array_equal(out_of_core['ids'], in_memory['ids'])
+    # Components are only defined up to their sign
+    signs = np.sign((out_of_core['X_pca'] * in_memory['X_pca']).sum(axis=0))
+    return in_memory, out_of_core, out_of_core['X_pca'] * signs
+
+
+@pytest.mark.parametrize('split_name', ['people', 'products'])
+def test_single_batch_projection_equals_in_memory_pca(scaled_dir, split_name):
+    in_memory, out_of_core, X_pca = _fit_both(scaled_dir, split_name, batch_size=100_000)
+    np.testing.assert_allclose(out_of_core['explained_variance_ratio'], in_memory['explained_variance_ratio'], rtol=1e-6)
+    np.testing.assert_allclose(X_pca, in_memory['X_pca'], atol=1e-6)
+
+
+@pytest.mark.parametrize('split_name', ['people', 'products', 'promotion', 'place'])
+def test_batched_projection_is_close_to_in_memory_pca(scaled_dir, split_name):
+    # Several batches: IncrementalPCA only carries the leading components from batch to
+    # batch, so trailing components with close eigenvalues may come out rotated
+    in_memory, out_of_core, X_pca = _fit_both(scaled_dir, split_name, batch_size=500)
+    np.testing.assert_allclose(out_of_core['explained_variance_ratio'], in_memory['explained_variance_ratio'], atol=0.01)
+    scale = np.abs(in_memory['X_pca'][:, 0]).max()
+    np.testing.assert_allclose(X_pca[:, 0], in_memory['X_pca'][:, 0], atol=0.02 * scale)
@@ -0,0 +1,23 @@
+import os
+
+import pandas as pd
+import pytest
+
+import report_writer
+
+
+def _samples(n_clusters):
+    return {cluster_id: pd.DataFrame({'ID': [cluster_id], 'Income': [1000.0 * cluster_id]}) for cluster_id in range(n_clusters)}
+
+
+@pytest.mark.parametrize('report_format', ['parquet', 'csv', 'json'])
+def test_rewritten_report_drops_tables_of_an_earlier_run(tmp_path, report_format):
+    summary = pd.DataFrame({0: [10.0], 1: [20.0]}, index=['Number of Customers'])
+    report_writer.write_cluster_report(summary, _samples(4), 'split', tmp_path, report_format)
+    path = report_writer.write_cluster_report(summary, _samples(2), 'split', tmp_path, report_format)
+
+    assert sorted(os.listdir(path)) == sorted(
+        f'{name}.{report_format}' for name in ['summary_metrics', 'cluster_0_samples', 'cluster_1_samples']
+    )
+    # No temporary directories are left behind
+    assert os.listdir(tmp_path) == ['split_cluster_analysis']
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+import scoring_server
+
+# A registry without fitted models: every customer fails in `prepare_features`
+EMPTY_REGISTRY = {'preprocessing': {}, 'splits': {}}
+
+
+async def _exchange(batcher, requests):
+    """Sends raw requests on one connection each and returns (status, payload) per request."""
+    stats = {'started': 0.0}
+    server = await asyncio.start_server(lambda r, w: scoring_server._handle(batcher, r, w, stats), '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    task = asyncio.create_task(batcher.run())
+    responses = []
+    try:
+        for request in requests:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+            status = int(head.split(b' ', 2)[1])
+            length = int(next(line.split(b':')[1] for line in head.split(b'\r\n') if line.lower().startswith(b'content-length')))
+            responses.append((status, json.loads(await reader.readexactly(length))))
+            writer.close()
+    finally:
+        task.cancel()
+        server.close()
+    return responses
+
+
+def _post(body):
+    body = body.encode()
+    return b'POST /score HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body
+
+
+@pytest.mark.parametrize('request_bytes', [
+    b'garbage\r\n\r\n',
+    b'POST /score HTTP/1.1\r\nContent-Length: abc\r\n\r\n',
+    b'POST /score HTTP/1.1\r\nContent-Length: -5\r\n\r\n',
+])
+def test_malformed_http_returns_400(request_bytes):
+    batcher = scoring_server.MicroBatcher(EMPTY_REGISTRY)
+    [(status, payload)] = asyncio.run(_exchange(batcher, [request_bytes]))
+    assert status == 400
+    assert 'error' in payload
+
+
+@pytest.mark.parametrize('body', ['{not json', '[]', '[1, 2]', '{"ID": 1}'])
+def test_invalid_customers_return_400(body):
+    batcher = scoring_server.MicroBatcher(EMPTY_REGISTRY)
+    [(status, _)] = asyncio.run(_exchange(batcher, [_post(body)]))
+    assert status == 400
+
+
+def test_batcher_survives_unexpected_errors(monkeypatch):
+    def fail(self, requests):
+        raise RuntimeError('scoring backend failed')
+
+    monkeypatch.setattr(scoring_server.MicroBatcher, '_score_batch', fail)
+    batcher = scoring_server.MicroBatcher(EMPTY_REGISTRY)
+    responses = asyncio.run(_exchange(batcher, [_post('{"ID": 1}'), _post('{"ID": 2}')]))
+    assert [status for status, _ in responses] == [500, 500]
+    assert batcher.batches == 2
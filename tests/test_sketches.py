@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sketches
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        'income': rng.lognormal(10, 0.5, n),
+        'recency': rng.integers(0, 100, n).astype(np.float64),
+        'education': rng.choice(['Basic', 'Graduation', 'Master', 'PhD'], n),
+    })
+    df.loc[rng.choice(n, 200, replace=False), 'income'] = np.nan
+    return df
+
+
+def chunks(df, size=3_000):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def test_merged_chunks_equal_single_pass(frame):
+    single = sketches.FrameSketch().update(frame)
+    merged = sketches.sketch_frames(chunks(frame))
+
+    assert merged.rows == single.rows
+    np.testing.assert_array_equal(merged.missing, single.missing)
+    np.testing.assert_array_equal(merged.moments.n, single.moments.n)
+    np.testing.assert_allclose(merged.moments.mean, single.moments.mean, rtol=1e-12)
+    np.testing.assert_allclose(merged.moments.std, single.moments.std, rtol=1e-10)
+    np.testing.assert_array_equal(merged.moments.min, single.moments.min)
+    np.testing.assert_array_equal(merged.moments.max, single.moments.max)
+    pd.testing.assert_frame_equal(merged.corr(), single.corr(), rtol=1e-10)
+    pd.testing.assert_series_equal(merged.value_counts('education'), single.value_counts('education'))
+
+
+def test_exact_statistics_match_pandas(frame):
+    sketch = sketches.sketch_frames(chunks(frame))
+    numeric = frame[['income', 'recency']]
+
+    np.testing.assert_allclose(sketch.moments.mean, numeric.mean(), rtol=1e-12)
+    np.testing.assert_allclose(sketch.moments.std, numeric.std(), rtol=1e-10)
+    pd.testing.assert_frame_equal(sketch.corr(), numeric.corr(), rtol=1e-10)
+    pd.testing.assert_series_equal(
+        sketch.value_counts('education'), frame['education'].value_counts(), check_index_type=False
+    )
+
+
+def test_quantile_rank_error_is_bounded(frame):
+    values = frame['income'].dropna().to_numpy()
+    sketch = sketches.sketch_frames(chunks(frame)).quantiles['income']
+
+    q = np.linspace(0.05, 0.95, 19)
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    assert np.abs(ranks - q).max() < 0.01
+
+
+def test_distinct_count_error_is_bounded():
+    values = np.random.default_rng(1).integers(0, 50_000, 200_000)
+    parts = [sketches.DistinctSketch() for _ in range(4)]
+    for part, chunk in zip(parts, np.array_split(values, 4)):
+        part.update(chunk)
+    merged = parts[0].merge(parts[1]).merge(parts[2]).merge(parts[3])
+
+    exact = len(np.unique(values))
+    assert abs(merged.count() - exact) / exact < 0.05
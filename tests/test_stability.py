@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import stability
+
+
+def test_recommend_k_prefers_the_best_silhouette_among_stable_ks():
+    metrics_df = pd.DataFrame({
+        'k': [2, 3, 4, 5],
+        'ari_mean': [0.95, 0.9, 0.7, 0.85],
+        'ari_low': [0.9, 0.85, 0.5, 0.82],
+        'silhouette_mean': [0.3, 0.4, 0.6, 0.35],
+    })
+    assert stability.recommend_k(metrics_df) == 3
+    # No k is stable: the one with the highest mean ARI
+    assert stability.recommend_k(metrics_df, stable_ari=0.95) == 2
+
+
+def test_consensus_counts_are_the_condensed_co_clustering_matrix():
+    rng = np.random.default_rng(0)
+    run_labels = rng.integers(0, 3, (7, 40)).astype(np.int16)
+
+    counts = stability.consensus_counts(run_labels)
+    assert counts.shape == (40 * 39 // 2,)
+    assert counts.dtype == np.uint8
+
+    matrix = stability.consensus_matrix(counts, n_runs=7)
+    expected = (run_labels[:, :, None] == run_labels[:, None, :]).mean(axis=0)
+    assert matrix.shape == (40, 40)
+    np.testing.assert_allclose(matrix, expected, rtol=1e-6)
+
+
+def test_evaluate_stability_finds_separated_clusters(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = np.array([[0, 0], [10, 0], [0, 10]])
+    X = np.vstack([center + rng.normal(size=(100, 2)) for center in centers])
+    df = pd.DataFrame({'ID': np.arange(len(X)), 'a': X[:, 0], 'b': X[:, 1]})
+
+    k, metrics_df = stability.evaluate_stability(df, 'blobs', k_range=range(2, 5), n_runs=5, n_jobs=1,
+                                                 return_metrics=True, output_dir=str(tmp_path))
+    assert k == 3
+    assert metrics_df['k'].tolist() == [2, 3, 4]
+    assert (metrics_df['ari_low'] <= metrics_df['ari_mean']).all() and (metrics_df['ari_mean'] <= metrics_df['ari_high']).all()
+
+    consensus = np.load(os.path.join(tmp_path, 'blobs_consensus.npz'))
+    assert len(consensus['rows']) == len(X)
+    assert {f'k{k}' for k in range(2, 5)} <= set(consensus.files)
+    assert consensus['k3'].shape == (len(X) * (len(X) - 1) // 2,)
+    assert sorted(os.listdir(tmp_path)) == ['blobs_consensus.npz', 'blobs_stability.csv', 'blobs_stability.png']
@@ -0,0 +1,79 @@
+import importlib
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+import stage_cache
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project with a stage module that imports a helper module inside its function."""
+    (tmp_path / 'cached_stage.py').write_text(
+        "calls = []\n\n\n"
+        "def stage(df):\n"
+        "    import cached_helper\n"
+        "    calls.append(len(df))\n"
+        "    return cached_helper.double(df)\n"
+    )
+    (tmp_path / 'cached_helper.py').write_text("def double(df):\n    return df * 2\n")
+    monkeypatch.setattr(stage_cache, 'PROJECT_DIR', str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    importlib.invalidate_caches()
+    yield tmp_path, importlib.import_module('cached_stage')
+    for name in ('cached_stage', 'cached_helper'):
+        sys.modules.pop(name, None)
+
+
+def edit(path, source):
+    stat = os.stat(path)
+    path.write_text(source)
+    # Make sure the modification time moves even on coarse-grained file systems
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_source_files_follow_project_imports(project):
+    project_dir, module = project
+    assert stage_cache.source_files(module.stage) == sorted(
+        [str(project_dir / 'cached_helper.py'), str(project_dir / 'cached_stage.py')]
+    )
+
+
+def test_dependency_edit_invalidates_the_key(project):
+    project_dir, module = project
+    before = stage_cache.code_version(module.stage)
+    assert stage_cache.code_version(module.stage) == before
+
+    edit(project_dir / 'cached_helper.py', "def double(df):\n    return df + df\n")
+    assert stage_cache.code_version(module.stage) != before
+
+
+def test_run_reuses_until_a_dependency_changes(project, tmp_path_factory):
+    project_dir, module = project
+    cache = stage_cache.StageCache(str(tmp_path_factory.mktemp('cache')))
+    df = pd.DataFrame({'x': [1, 2, 3]})
+
+    first = cache.run('double', module.stage, inputs={'df': df})
+    second = cache.run('double', module.stage, inputs={'df': df})
+    pd.testing.assert_frame_equal(first, second)
+    assert module.calls == [3]
+
+    edit(project_dir / 'cached_helper.py', "def double(df):\n    return df + df\n")
+    cache.run('double', module.stage, inputs={'df': df})
+    assert module.calls == [3, 3]
+
+
+def test_unreadable_entry_is_a_miss_and_removed(tmp_path):
+    cache = stage_cache.StageCache(str(tmp_path))
+    key = cache.key('stage', params={'k': 4})
+    cache.put(key, pd.DataFrame({'x': range(1000)}))
+    path = cache._path(key)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    assert cache.get(key) == (False, None)
+    assert not os.path.exists(path)
+    cache.put(key, 42)
+    assert cache.get(key) == (True, 42)